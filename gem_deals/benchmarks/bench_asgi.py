@@ -0,0 +1,323 @@
+"""Сравнение пропускной способности и задержек GET-запроса списка клиентов
+при большом количестве одновременных запросов: синхронное представление под WSGI
+(пул из --wsgi-workers потоков, по умолчанию 1 - как uWSGI с настройками проекта)
+и асинхронное представление под ASGI (один процесс с циклом событий).
+Приложения вызываются напрямую (без HTTP-сервера), ограничения частоты
+запросов отключены. Задержки сетевых обращений к общему кэшу и к БД моделируются
+параметрами --cache-latency и --db-latency (для реальных Redis и PostgreSQL -
+--settings=gem_deals.settings.prod --cache-latency 0 --db-latency 0).
+
+Сценарии: l1 - ответ из кэша в памяти процесса, l2 - из общего кэша (кэш в памяти
+процесса отключён), mixed - доля --miss-ratio запросов с уникальными параметрами
+(ответ формируется по данным БД), остальные - из кэша в памяти процесса.
+
+    python benchmarks/bench_asgi.py
+    python benchmarks/bench_asgi.py --concurrency 1 50 200 --scenario mixed
+"""
+import asyncio
+import io
+import itertools
+import statistics
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from datetime import date, timedelta
+from queue import Queue
+from typing import Callable, Iterator, List, Tuple
+from unittest import mock
+
+from bench_loaders import generate_blocks
+from common import benchmark_database, get_argument_parser, setup_django
+
+SCENARIOS = ("l1", "l2", "mixed")
+
+
+def iter_queries(scenario: str, miss_ratio: float) -> Iterator[str]:
+    """Генерирует строки запроса: для сценария mixed каждый 1 / miss_ratio запрос
+    содержит уникальную комбинацию параметров (limit, date_from)."""
+
+    step = round(1 / miss_ratio) if scenario == "mixed" and miss_ratio else 0
+    for number in itertools.count():
+        if step and number % step == 0:
+            unique = number // step
+            day = date(2018, 12, 14) + timedelta(days=unique // 1000 % 365)
+            yield f"limit={unique % 1000 + 1}&date_from={day}"
+        else:
+            yield ""
+
+
+def run_wsgi(
+    application, path: str, queries: List[str], concurrency: int, workers: int
+) -> Tuple[List[float], int]:
+    """Выполняет запросы queries к WSGI-приложению: concurrency клиентов
+    отправляют запросы один за другим, обрабатывают их workers потоков.
+    Returns:
+        Tuple[List[float], int]: Задержки запросов (мс) и количество ошибок.
+    """
+
+    from django.db import connections
+
+    jobs: Queue = Queue()
+    pending = iter(queries)
+    lock = threading.Lock()
+    latencies: List[float] = []
+    errors = [0]
+
+    def worker() -> None:
+        try:
+            while (job := jobs.get()) is not None:
+                query, result, done = job
+                statuses = []
+                environ = {
+                    "REQUEST_METHOD": "GET",
+                    "PATH_INFO": path,
+                    "QUERY_STRING": query,
+                    "SERVER_NAME": "testserver",
+                    "SERVER_PORT": "80",
+                    "SERVER_PROTOCOL": "HTTP/1.1",
+                    "REMOTE_ADDR": "127.0.0.1",
+                    "wsgi.version": (1, 0),
+                    "wsgi.url_scheme": "http",
+                    "wsgi.input": io.BytesIO(),
+                    "wsgi.errors": sys.stderr,
+                    "wsgi.multithread": True,
+                    "wsgi.multiprocess": False,
+                    "wsgi.run_once": False,
+                }
+                response = application(
+                    environ, lambda status, headers: statuses.append(status)
+                )
+                b"".join(response)
+                response.close()
+                result.append(statuses[0].startswith("200"))
+                done.set()
+        finally:
+            connections.close_all()
+
+    def client() -> None:
+        while True:
+            with lock:
+                query = next(pending, None)
+            if query is None:
+                return
+            result: List[bool] = []
+            done = threading.Event()
+            started = time.perf_counter()
+            jobs.put((query, result, done))
+            done.wait()
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors[0] += not result[0]
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads + clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def run_asgi(
+    application, path: str, queries: List[str], concurrency: int
+) -> Tuple[List[float], int]:
+    """Выполняет запросы queries к ASGI-приложению в одном цикле событий:
+    concurrency клиентов отправляют запросы один за другим.
+    Returns:
+        Tuple[List[float], int]: Задержки запросов (мс) и количество ошибок.
+    """
+
+    latencies: List[float] = []
+    errors = 0
+
+    async def request(query: str) -> bool:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        disconnected = asyncio.Event()
+        statuses = []
+
+        async def receive() -> dict:
+            if not statuses:
+                statuses.append(None)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await application(scope, receive, send)
+        return statuses[-1] == 200
+
+    async def client(pending: Iterator[str]) -> None:
+        nonlocal errors
+        for query in pending:
+            started = time.perf_counter()
+            ok = await request(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += not ok
+
+    async def main() -> None:
+        pending = iter(queries)
+        await asyncio.gather(*(client(pending) for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return latencies, errors
+
+
+def add_latency(method: Callable, seconds: float) -> Callable:
+    """Возвращает method с задержкой seconds перед каждым вызовом."""
+
+    def delayed(*args, **kwargs):
+        time.sleep(seconds)
+        return method(*args, **kwargs)
+
+    return delayed
+
+
+def format_result(
+    scenario: str,
+    server: str,
+    concurrency: int,
+    latencies: List[float],
+    errors: int,
+    elapsed: float,
+) -> str:
+    """Возвращает строку отчёта."""
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return (
+        f"{scenario:>8} {server:>5} {concurrency:>11} {len(latencies) / elapsed:>8.0f} "
+        f"{percentiles[49]:>8.2f} {percentiles[98]:>8.2f} {errors:>6}"
+    )
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--block-size", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 200])
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--miss-ratio", type=float, default=0.05)
+    parser.add_argument("--wsgi-workers", type=int, default=1)
+    parser.add_argument(
+        "--cache-latency",
+        type=float,
+        default=0.5,
+        help="Задержка обращения к общему кэшу (мс).",
+    )
+    parser.add_argument(
+        "--db-latency", type=float, default=1.0, help="Задержка запроса к БД (мс)."
+    )
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.conf import settings
+    from django.core.cache import cache, caches
+    from django.core.handlers.asgi import ASGIHandler
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db.backends.utils import CursorWrapper
+    from django.test import override_settings
+
+    from deal_api.caching import clear_local_cache
+    from deal_api.services import save_deal_columns_in_db
+    from deal_api.views import AsyncDealAPIView, DealAPIView
+
+    with benchmark_database(), ExitStack() as stack:
+        save_deal_columns_in_db(
+            generate_blocks(args.rows, args.customers, args.seed, args.block_size)
+        )
+        for view in (DealAPIView, AsyncDealAPIView):
+            stack.enter_context(mock.patch.object(view, "throttle_classes", []))
+        cache_class = type(caches["default"])
+        for name in ("get", "set", "add", "delete", "delete_many"):
+            stack.enter_context(
+                mock.patch.object(
+                    cache_class,
+                    name,
+                    add_latency(getattr(cache_class, name), args.cache_latency / 1000),
+                )
+            )
+        stack.enter_context(
+            mock.patch.object(
+                CursorWrapper,
+                "execute",
+                add_latency(CursorWrapper.execute, args.db_latency / 1000),
+            )
+        )
+        servers = [
+            ("wsgi", "/api/v1/", WSGIHandler()),
+            ("asgi", "/api/v1/async/", ASGIHandler()),
+        ]
+
+        print(
+            f"cache latency {args.cache_latency} ms, DB latency {args.db_latency} ms, "
+            f"WSGI workers {args.wsgi_workers}, {args.requests} requests"
+        )
+        print(
+            f"{'scenario':>8} {'server':>5} {'concurrency':>11} {'req/s':>8} "
+            f"{'p50, ms':>8} {'p99, ms':>8} {'errors':>6}"
+        )
+        for scenario in args.scenario:
+            l1_max_bytes = 0 if scenario == "l2" else settings.CACHE_L1_MAX_BYTES
+            with override_settings(CACHE_L1_MAX_BYTES=l1_max_bytes):
+                for concurrency in args.concurrency:
+                    for server, path, application in servers:
+                        cache.clear()
+                        clear_local_cache()
+                        queries = list(
+                            itertools.islice(
+                                iter_queries(scenario, args.miss_ratio),
+                                args.requests,
+                            )
+                        )
+                        # Прогрев: ответ на запрос без параметров попадает в кэш
+                        run_wsgi(servers[0][2], "/api/v1/", [""], 1, 1)
+                        started = time.perf_counter()
+                        if server == "wsgi":
+                            latencies, errors = run_wsgi(
+                                application,
+                                path,
+                                queries,
+                                concurrency,
+                                args.wsgi_workers,
+                            )
+                        else:
+                            latencies, errors = run_asgi(
+                                application, path, queries, concurrency
+                            )
+                        elapsed = time.perf_counter() - started
+                        print(
+                            format_result(
+                                scenario,
+                                server,
+                                concurrency,
+                                latencies,
+                                errors,
+                                elapsed,
+                            )
+                        )
+
+
+if __name__ == "__main__":
+    main()
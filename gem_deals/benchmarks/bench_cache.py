@@ -0,0 +1,98 @@
+"""Сравнение задержки получения ответа со списком клиентов
+(get_top_customers_payload) при попадании в кэш в памяти процесса (L1),
+при попадании в общий кэш (L2, например Redis) и при промахе (ответ формируется
+по данным БД).
+
+    python benchmarks/bench_cache.py
+    python benchmarks/bench_cache.py --settings=gem_deals.settings.prod --repeat 10000
+"""
+import time
+from typing import Callable
+
+from bench_loaders import generate_blocks
+from common import benchmark_database, get_argument_parser, setup_django
+
+
+def measure_calls(
+    function: Callable[[], object], prepare: Callable[[], object], repeat: int
+) -> float:
+    """Возвращает среднее время вызова function (в микросекундах),
+    перед каждым вызовом выполняя prepare (не замеряется)."""
+
+    elapsed = 0.0
+    for _ in range(repeat):
+        prepare()
+        started = time.perf_counter()
+        function()
+        elapsed += time.perf_counter() - started
+    return elapsed / repeat * 1e6
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.conf import settings
+    from django.core.cache import cache
+
+    from deal_api.caching import (
+        cache_stats,
+        get_top_customers_cache_key,
+        get_top_customers_payload,
+        local_cache,
+    )
+    from deal_api.services import save_deal_columns_in_db
+
+    with benchmark_database():
+        print(f"L2 cache backend: {settings.CACHES['default']['BACKEND']}")
+        save_deal_columns_in_db(
+            generate_blocks(args.rows, args.customers, args.seed, 10_000)
+        )
+        get_top_customers_payload()
+        cache_stats.reset()
+
+        def drop_shared_entry() -> None:
+            local_cache.clear()
+            cache.delete(get_top_customers_cache_key())
+
+        timings = [
+            (
+                "L1 hit",
+                measure_calls(get_top_customers_payload, lambda: None, args.repeat),
+            ),
+            (
+                "L2 hit",
+                measure_calls(
+                    get_top_customers_payload, local_cache.clear, args.repeat
+                ),
+            ),
+            (
+                "miss",
+                measure_calls(
+                    get_top_customers_payload,
+                    drop_shared_entry,
+                    max(args.repeat // 10, 1),
+                ),
+            ),
+        ]
+        print(f"{'outcome':>8} {'us/call':>10}")
+        for name, microseconds in timings:
+            print(f"{name:>8} {microseconds:>10.1f}")
+        stats = cache_stats.snapshot()
+        print(
+            "counters: "
+            + ", ".join(
+                f"{outcome} {count} ({stats['seconds'][outcome] / count * 1e6:.1f} us)"
+                for outcome, count in stats["counts"].items()
+                if count
+            )
+            + f"; hit ratio {stats['hit_ratio']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
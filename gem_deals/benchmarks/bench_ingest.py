@@ -0,0 +1,76 @@
+"""Сравнение скорости сохранения сделок: построчный get_or_create и пакетная загрузка.
+
+    python benchmarks/bench_ingest.py --rows 768 10000 100000
+    python benchmarks/bench_ingest.py --settings=gem_deals.settings.prod
+"""
+from common import (
+    clear_db_data,
+    generate_deals,
+    get_argument_parser,
+    measure,
+    setup_django,
+    benchmark_database,
+)
+
+
+def save_data_in_db_per_row(deals) -> None:
+    """Прежний (построчный) вариант save_data_in_db, сохранён для сравнения."""
+
+    from django.db import transaction
+
+    from deal_api.models import Customer, Deal, Gem
+    from deal_api.services import get_current_generation_id
+
+    with transaction.atomic():
+        clear_db_data()
+        generation = get_current_generation_id()
+        for deal in deals:
+            customer, _ = Customer.objects.get_or_create(username=deal["customer"])
+            gem, _ = Gem.objects.get_or_create(name=deal["item"])
+            Deal.objects.create(
+                generation_id=generation,
+                customer=customer,
+                item=gem,
+                total=deal["total"],
+                quantity=deal["quantity"],
+                date=deal["date"],
+            )
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[768, 10000, 100000])
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument(
+        "--per-row-limit",
+        type=int,
+        default=100000,
+        help="Не замерять построчный вариант на файлах больше этого размера.",
+    )
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.db import connection
+
+    from deal_api.services import save_data_in_db
+
+    with benchmark_database():
+        print(f"DB vendor: {connection.vendor}")
+        print(
+            f"{'rows':>10} {'per-row, rows/s':>18} {'bulk, rows/s':>15} {'speedup':>8}"
+        )
+        for rows in args.rows:
+            deals = generate_deals(rows, customers=args.customers, seed=args.seed)
+            bulk = measure(lambda: save_data_in_db(deals))
+            if rows <= args.per_row_limit:
+                per_row = measure(lambda: save_data_in_db_per_row(deals))
+                print(
+                    f"{rows:>10} {rows / per_row:>18.0f} {rows / bulk:>15.0f} "
+                    f"{per_row / bulk:>7.1f}x"
+                )
+            else:
+                print(f"{rows:>10} {'-':>18} {rows / bulk:>15.0f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Сравнение скорости сохранения сделок загрузчиками OrmDealLoader (bulk_create)
+и CopyDealLoader (COPY FROM STDIN + INSERT ... SELECT, только PostgreSQL).
+Замеряется save_deal_columns_in_db целиком (в режиме замены данных)
+вместе с удалением заменённого поколения набора данных.
+Для СУБД, отличных от PostgreSQL, замеряется только OrmDealLoader.
+
+    python benchmarks/bench_loaders.py --settings=gem_deals.settings.prod
+    python benchmarks/bench_loaders.py --rows 10000 100000 1000000
+"""
+from itertools import islice
+
+from common import (
+    benchmark_database,
+    get_argument_parser,
+    iter_deals,
+    measure,
+    setup_django,
+)
+
+
+def generate_blocks(rows: int, customers: int, seed: int, block_size: int):
+    """Генерирует блоки сделок (DealColumns) с общими словарями имён."""
+
+    from deal_api.services import DealColumns, NameDictionary
+
+    deals = iter_deals(rows, customers=customers, seed=seed)
+    customer_names, item_names = NameDictionary(), NameDictionary()
+    return [
+        DealColumns.from_dicts(batch, customer_names, item_names)
+        for batch in iter(lambda: list(islice(deals, block_size)), [])
+    ]
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.db import connection
+    from django.test import override_settings
+
+    from deal_api.services import delete_retired_generations, save_deal_columns_in_db
+
+    def save(blocks, copy_loader: bool) -> None:
+        with override_settings(INGEST_COPY_LOADER=copy_loader):
+            save_deal_columns_in_db(blocks)
+        # Заменённое поколение удаляется сразу, чтобы замеры не влияли друг на друга
+        with override_settings(DATASET_RETENTION_SECONDS=0):
+            delete_retired_generations()
+
+    with benchmark_database():
+        copy_available = connection.vendor == "postgresql"
+        print(f"DB vendor: {connection.vendor}")
+        if not copy_available:
+            print("COPY loader is available only for PostgreSQL, measuring ORM only.")
+        print(f"{'rows':>10} {'orm, rows/s':>12} {'copy, rows/s':>13} {'speedup':>8}")
+        for rows in args.rows:
+            blocks = generate_blocks(rows, args.customers, args.seed, args.block_size)
+            orm = measure(lambda: save(blocks, False), args.repeat)
+            if copy_available:
+                copy = measure(lambda: save(blocks, True), args.repeat)
+                print(
+                    f"{rows:>10} {rows / orm:>12.0f} {rows / copy:>13.0f} "
+                    f"{orm / copy:>7.1f}x"
+                )
+            else:
+                print(f"{rows:>10} {rows / orm:>12.0f} {'-':>13} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Сравнение скорости разбора csv-файла (строк в секунду, без записи в БД):
+построчный (словари, get_data_stream_from_file; без преобразования типов и с
+преобразованием значений полями модели, как при bulk_create из словарей) и колоночный
+(блоки DealColumns с типизированными столбцами, get_deal_columns_stream_from_file)
+с NumPy и без него, а также памяти, занимаемой файлом, разобранным целиком
+(так файлы разбираются в пуле процессов при загрузке нескольких файлов).
+
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py --rows 1000000 --repeat 3
+"""
+import csv
+import io
+import tracemalloc
+from typing import Callable
+from unittest import mock
+
+from common import get_argument_parser, iter_deals, measure, setup_django
+
+
+def generate_csv(rows: int, seed: int) -> bytes:
+    """Генерирует содержимое csv-файла с синтетическими сделками."""
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(
+        buffer, fieldnames=["customer", "item", "total", "quantity", "date"]
+    )
+    writer.writeheader()
+    writer.writerows(iter_deals(rows, seed=seed))
+    return buffer.getvalue().encode()
+
+
+def parse_rows(content: bytes) -> int:
+    """Построчный разбор (прежний путь загрузки)."""
+
+    from deal_api.services import get_data_stream_from_file
+
+    return sum(1 for _ in get_data_stream_from_file("deals.csv", [content]))
+
+
+def parse_rows_typed(content: bytes) -> int:
+    """Построчный разбор с преобразованием значений в типы полей Deal
+    (прежде это выполнялось при bulk_create)."""
+
+    from django.utils import timezone
+
+    from deal_api.models import Deal
+    from deal_api.services import get_data_stream_from_file
+
+    fields = {name: Deal._meta.get_field(name) for name in ("total", "quantity")}
+    date_field = Deal._meta.get_field("date")
+    default_timezone = timezone.get_default_timezone()
+    rows = 0
+    for deal in get_data_stream_from_file("deals.csv", [content]):
+        for name, field in fields.items():
+            field.to_python(deal[name])
+        deal_date = date_field.to_python(deal["date"])
+        if timezone.is_naive(deal_date):
+            timezone.make_aware(deal_date, default_timezone)
+        rows += 1
+    return rows
+
+
+def parse_columns(content: bytes) -> int:
+    """Колоночный разбор (текущий путь загрузки)."""
+
+    from deal_api.services import get_deal_columns_stream_from_file
+
+    return sum(
+        len(block)
+        for block in get_deal_columns_stream_from_file("deals.csv", [content])
+    )
+
+
+def measure_retained(load: Callable[[], object]) -> int:
+    """Возвращает объём памяти (в байтах), занимаемой результатом load()."""
+
+    tracemalloc.start()
+    try:
+        result = load()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from deal_api import services
+
+    content = generate_csv(args.rows, args.seed)
+    variants = [
+        ("rows (dict)", lambda: parse_rows(content), services.np),
+        ("rows (typed)", lambda: parse_rows_typed(content), services.np),
+    ]
+    if services.np is not None:
+        variants.append(
+            ("columns (numpy)", lambda: parse_columns(content), services.np)
+        )
+    variants.append(("columns (python)", lambda: parse_columns(content), None))
+
+    print(f"{'parser':>17} {'seconds':>8} {'rows/s':>10}")
+    for name, function, numpy_module in variants:
+        with mock.patch.object(services, "np", numpy_module):
+            assert function() == args.rows
+            elapsed = measure(function, args.repeat)
+        print(f"{name:>17} {elapsed:>8.2f} {args.rows / elapsed:>10.0f}")
+
+    rows_size = measure_retained(
+        lambda: list(services.get_data_stream_from_file("deals.csv", [content]))
+    )
+    blocks_size = measure_retained(
+        lambda: list(services.get_deal_columns_stream_from_file("deals.csv", [content]))
+    )
+    print(
+        f"retained: rows {rows_size / 2**20:.1f} MB, "
+        f"columns {blocks_size / 2**20:.1f} MB ({rows_size / blocks_size:.1f}x less)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Сравнение затрат на формирование ответа со списком клиентов (без запросов к БД):
+CustomerSerializer (is_valid/save) + JSONRenderer и словари + ORJSONRenderer.
+
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --limits 5 100 1000 --repeat 1000
+"""
+import random
+
+from common import (
+    get_argument_parser,
+    get_customer_serializer_class,
+    measure,
+    setup_django,
+)
+
+
+def generate_customers(limit, gems=25, seed=42):
+    """Генерирует данные клиентов в том виде, в котором их возвращают сервисы."""
+
+    rnd = random.Random(seed)
+    return [
+        {
+            "customer": customer_id,
+            "customer__username": f"customer{customer_id}",
+            "spent_money": rnd.randint(1000, 1000000),
+            "gems": [f"gem{gem}" for gem in rnd.sample(range(gems), rnd.randint(0, 5))],
+        }
+        for customer_id in range(limit)
+    ]
+
+
+def render_with_serializer(customers) -> bytes:
+    """Прежний вариант формирования ответа, сохранён для сравнения."""
+
+    from rest_framework.renderers import JSONRenderer
+
+    serializer = get_customer_serializer_class()(data=customers, many=True)
+    if serializer.is_valid():
+        serializer.save()
+    return JSONRenderer().render({"response": serializer.data})
+
+
+def render_directly(customers) -> bytes:
+    """Текущий вариант формирования ответа (как в build_top_customers_payload)."""
+
+    from deal_api.renderers import ORJSONRenderer
+
+    return ORJSONRenderer().render(
+        {
+            "response": [
+                {
+                    "username": customer["customer__username"],
+                    "spent_money": customer["spent_money"],
+                    "gems": customer["gems"],
+                }
+                for customer in customers
+            ]
+        }
+    )
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--limits", type=int, nargs="+", default=[5, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    print(f"{'limit':>6} {'serializer, us':>15} {'direct, us':>11} {'speedup':>8}")
+    for limit in args.limits:
+        customers = generate_customers(limit, seed=args.seed)
+        assert render_with_serializer(customers) == render_directly(customers)
+        serializer = measure(lambda: render_with_serializer(customers), args.repeat)
+        direct = measure(lambda: render_directly(customers), args.repeat)
+        print(
+            f"{limit:>6} {serializer * 1e6:>15.0f} {direct * 1e6:>11.0f} "
+            f"{serializer / direct:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
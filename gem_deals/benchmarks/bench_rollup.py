@@ -0,0 +1,85 @@
+"""Сравнение скорости запросов клиентов, потративших наибольшую сумму за период:
+агрегирование сделок (Deal) и агрегированной по дням статистики (DailyDealStats).
+
+    python benchmarks/bench_rollup.py
+    python benchmarks/bench_rollup.py --rows 1000000 --settings=gem_deals.settings.prod
+"""
+from datetime import timedelta
+
+from common import (
+    DEALS_START,
+    benchmark_database,
+    filter_deals,
+    get_argument_parser,
+    iter_deals,
+    measure,
+    setup_django,
+)
+
+
+def get_largest_amount_customers_from_deals(limit, date_from, date_to, item=None):
+    """Вариант get_largest_amount_customers, агрегирующий сделки (для сравнения)."""
+
+    from django.db.models import Sum
+
+    from deal_api.models import Deal
+
+    return list(
+        filter_deals(Deal.objects.all(), date_from, date_to, item)
+        .values("customer", "customer__username")
+        .annotate(spent_money=Sum("total"))
+        .order_by("-spent_money", "customer")[:limit]
+    )
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.db import connection
+
+    from deal_api.models import DailyDealStats
+    from deal_api.services import get_largest_amount_customers, save_data_in_db
+
+    with benchmark_database():
+        print(f"DB vendor: {connection.vendor}")
+        load = measure(
+            lambda: save_data_in_db(
+                iter_deals(args.rows, customers=args.customers, seed=args.seed),
+                batch_size=5000,
+            )
+        )
+        print(
+            f"Загружено {args.rows} сделок за {load:.1f} с, "
+            f"строк статистики по дням: {DailyDealStats.objects.count()}"
+        )
+        print(f"{'window':>16} {'deals, ms':>10} {'rollup, ms':>11} {'speedup':>8}")
+        date_from = DEALS_START.date()
+        for days, item in ((1, None), (7, None), (30, None), (365, None), (30, "gem0")):
+            date_to = date_from + timedelta(days=days - 1)
+            raw = measure(
+                lambda: get_largest_amount_customers_from_deals(
+                    args.limit, date_from, date_to, item
+                ),
+                args.repeat,
+            )
+            rollup = measure(
+                lambda: get_largest_amount_customers(
+                    args.limit, date_from, date_to, item
+                ),
+                args.repeat,
+            )
+            window = f"{days}d" + (f" {item}" if item else "")
+            print(
+                f"{window:>16} {raw * 1000:>10.1f} {rollup * 1000:>11.1f} "
+                f"{raw / rollup:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Время определения диалекта csv в зависимости от размера файла:
+прежний вариант (Sniffer по repr всего файла) и по ограниченному началу файла.
+
+    python benchmarks/bench_sniff.py --sizes 16384 65536 262144 1048576
+"""
+import csv
+
+from common import generate_deals, get_argument_parser, measure, setup_django
+
+
+def make_csv(size: int, seed: int) -> bytes:
+    """Возвращает csv-файл размером не менее size байт."""
+
+    deals = generate_deals(size // 40 + 1, seed=seed)
+    lines = ["customer,item,total,quantity,date"]
+    lines += [",".join(deal.values()) for deal in deals]
+    return "\r\n".join(lines).encode("utf-8")[:size]
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[16384, 65536, 262144, 1048576]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.conf import settings
+
+    from deal_api.services import CsvReader
+
+    print(f"CSV_SNIFF_SAMPLE_SIZE: {settings.CSV_SNIFF_SAMPLE_SIZE}")
+    print(f"{'bytes':>10} {'full repr, ms':>15} {'sample, ms':>12}")
+    for size in args.sizes:
+        content = make_csv(size, args.seed)
+        full = measure(
+            lambda: csv.Sniffer().sniff(str(content), delimiters=";,|"), args.repeat
+        )
+        sample = measure(
+            lambda: csv.Sniffer().sniff(
+                CsvReader._get_sample(
+                    content.decode("utf-8"), settings.CSV_SNIFF_SAMPLE_SIZE
+                ),
+                delimiters=";,|",
+            ),
+            args.repeat,
+        )
+        print(f"{size:>10} {full * 1000:>15.1f} {sample * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Задержка чтения списка клиентов (build_top_customers_payload, без кэша) до и во
+время загрузки сделок в режиме замены: загрузка сохраняет сделки в новое поколение
+набора данных, не блокируя запросы к текущему.
+В SQLite запись блокирует таблицы, поэтому замер выполняется только для PostgreSQL.
+
+    python benchmarks/bench_swap.py --settings=gem_deals.settings.prod
+    python benchmarks/bench_swap.py --rows 1000000
+"""
+import statistics
+import threading
+import time
+from typing import Callable, List
+
+from bench_loaders import generate_blocks
+from common import benchmark_database, get_argument_parser, setup_django
+
+
+def sample_latencies(
+    read: Callable[[], object], until: Callable[[], bool], minimum: int
+) -> List[float]:
+    """Замеряет задержки read() (в миллисекундах), пока until() не вернёт True
+    (но не меньше minimum замеров)."""
+
+    latencies = []
+    while len(latencies) < minimum or not until():
+        started = time.perf_counter()
+        read()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def format_latencies(name: str, latencies: List[float]) -> str:
+    """Возвращает строку отчёта с перцентилями задержек."""
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return (
+        f"{name:>13} {len(latencies):>8} {percentiles[49]:>8.2f} "
+        f"{percentiles[98]:>8.2f} {max(latencies):>8.2f}"
+    )
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--block-size", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+    setup_django(args.settings)
+
+    from django.db import connection, connections
+
+    from deal_api.caching import build_top_customers_payload
+    from deal_api.services import save_deal_columns_in_db
+
+    if connection.vendor == "sqlite":
+        parser.error(
+            "замер требует PostgreSQL (например, --settings=gem_deals.settings.prod)"
+        )
+    with benchmark_database():
+        print(f"DB vendor: {connection.vendor}")
+        save_deal_columns_in_db(
+            generate_blocks(args.rows, args.customers, args.seed, args.block_size)
+        )
+        blocks = generate_blocks(
+            args.rows, args.customers, args.seed + 1, args.block_size
+        )
+        idle = sample_latencies(build_top_customers_payload, lambda: True, args.samples)
+
+        loaded = threading.Event()
+        errors: List[BaseException] = []
+
+        def load() -> None:
+            try:
+                save_deal_columns_in_db(blocks)
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+                loaded.set()
+
+        started = time.perf_counter()
+        loader = threading.Thread(target=load)
+        loader.start()
+        during = sample_latencies(build_top_customers_payload, loaded.is_set, 1)
+        loader.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            # Замена не выполнена: замеры не имеют смысла
+            raise errors[0]
+
+        print(f"replace of {args.rows} rows took {elapsed:.1f} s")
+        print(
+            f"{'reads':>13} {'samples':>8} {'p50, ms':>8} {'p99, ms':>8} {'max, ms':>8}"
+        )
+        print(format_latencies("idle", idle))
+        print(format_latencies("during load", during))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Общие утилиты для скриптов замера производительности.
+
+Скрипты запускаются из каталога gem_deals, например:
+    python benchmarks/bench_ingest.py --settings=gem_deals.settings.local
+
+Замеры выполняются на отдельной тестовой БД (как в Django test suite),
+рабочая БД проекта не затрагивается.
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+DEALS_START = datetime(2018, 12, 14)
+
+
+def get_argument_parser(description: str) -> argparse.ArgumentParser:
+    """Возвращает парсер аргументов командной строки с общими параметрами.
+    Args:
+        description (str): Описание скрипта.
+    Returns:
+        argparse.ArgumentParser: Парсер аргументов.
+    """
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--settings",
+        default="gem_deals.settings.local",
+        help="Модуль настроек Django (для PostgreSQL - gem_deals.settings.prod).",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора данных.")
+    return parser
+
+
+def setup_django(settings_module: str) -> None:
+    """Инициализирует Django с указанным модулем настроек.
+    Args:
+        settings_module (str): Модуль настроек Django.
+    Returns:
+    """
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ["DJANGO_SETTINGS_MODULE"] = settings_module
+    import django
+
+    django.setup()
+
+
+@contextlib.contextmanager
+def benchmark_database() -> Iterator[None]:
+    """Контекстный менеджер, создающий тестовую БД на время замеров."""
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def generate_deals(
+    rows: int, customers: int = 1000, gems: int = 25, seed: int = 42
+) -> List[Dict[str, str]]:
+    """Генерирует синтетические сделки в формате, который возвращает get_data_from_reader.
+    Args:
+        rows (int): Количество сделок.
+        customers (int): Количество различных клиентов.
+        gems (int): Количество различных драгоценных камней.
+        seed (int): Seed генератора случайных чисел.
+    Returns:
+        List[Dict[str, str]]: Список сделок.
+    """
+
+    return list(iter_deals(rows, customers, gems, seed))
+
+
+def iter_deals(
+    rows: int, customers: int = 1000, gems: int = 25, seed: int = 42
+) -> Iterator[Dict[str, str]]:
+    """Генератор синтетических сделок (для наборов, не помещающихся в память списком).
+    Сделки равномерно распределены по году, начиная с DEALS_START.
+    Args:
+        rows (int): Количество сделок.
+        customers (int): Количество различных клиентов.
+        gems (int): Количество различных драгоценных камней.
+        seed (int): Seed генератора случайных чисел.
+    Returns:
+        Iterator[Dict[str, str]]: Сделки.
+    """
+
+    rnd = random.Random(seed)
+    for _ in range(rows):
+        yield {
+            "customer": f"customer{rnd.randrange(customers)}",
+            "item": f"gem{rnd.randrange(gems)}",
+            "total": str(rnd.randint(100, 10000)),
+            "quantity": str(rnd.randint(1, 10)),
+            "date": str(
+                DEALS_START + timedelta(seconds=rnd.randrange(365 * 24 * 3600))
+            ),
+        }
+
+
+def clear_db_data() -> None:
+    """Очищает содержимое базы данных (сделки и статистика удаляются вместе
+    с клиентами и драгоценными камнями)."""
+
+    from deal_api.models import Customer, Gem
+
+    Customer.objects.all().delete()
+    Gem.objects.all().delete()
+
+
+def filter_deals(
+    deals: Any,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    item: str | None = None,
+) -> Any:
+    """Отбирает сделки, совершённые в период с date_from по date_to (включительно,
+    дни считаются в текущем часовом поясе) и (или) по драгоценному камню item
+    (для сравнения с запросами к агрегированной по дням статистике).
+    Args:
+        deals (QuerySet): Набор сделок.
+        date_from (date | None): Первый день периода.
+        date_to (date | None): Последний день периода.
+        item (str | None): Название драгоценного камня.
+    Returns:
+        QuerySet: Отфильтрованный набор сделок.
+    """
+
+    from django.utils import timezone
+
+    def get_day_start(day: date) -> datetime:
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    if date_from is not None:
+        deals = deals.filter(date__gte=get_day_start(date_from))
+    if date_to is not None:
+        deals = deals.filter(date__lt=get_day_start(date_to + timedelta(days=1)))
+    if item is not None:
+        deals = deals.filter(item__name=item)
+    return deals
+
+
+@lru_cache(maxsize=None)
+def get_customer_serializer_class() -> type:
+    """Возвращает прежний сериализатор клиентов с дополнительной информацией
+    (количество потраченных денег и список драгоценностей), сохранён для сравнения.
+    Класс создаётся после setup_django: DRF обращается к настройкам Django при импорте.
+    """
+
+    from rest_framework import serializers
+
+    class CustomerSerializer(serializers.Serializer):
+        username = serializers.CharField(max_length=255, source="customer__username")
+        spent_money = serializers.IntegerField()
+        gems = serializers.ListField(child=serializers.CharField(), allow_empty=True)
+
+    return CustomerSerializer
+
+
+def measure(function: Callable[[], object], repeat: int = 1) -> float:
+    """Возвращает минимальное время выполнения function (в секундах).
+    Args:
+        function (Callable[[], object]): Замеряемая функция.
+        repeat (int): Количество повторов.
+    Returns:
+        float: Минимальное время выполнения.
+    """
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
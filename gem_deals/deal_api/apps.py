@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class DealApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "deal_api"
+
+    def ready(self) -> None:
+        from .metrics import install_db_query_wrapper
+
+        # Запросы к БД учитываются в показателях обрабатываемого HTTP-запроса
+        connection_created.connect(install_db_query_wrapper)
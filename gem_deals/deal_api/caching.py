@@ -0,0 +1,643 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+from .metrics import record_cache_lookup
+from .renderers import ORJSONRenderer
+from .services import (
+    aadd_gems_field_to_customers_data,
+    add_gems_field_to_customers_data,
+    aget_current_generation_id,
+    aget_largest_amount_customers,
+    get_current_generation_id,
+    get_largest_amount_customers,
+)
+
+
+class LocalPayloadCache:
+    """LRU-кэш готовых ответов в памяти процесса (L1) перед общим кэшем (L2).
+    Суммарный размер ответов ограничен settings.CACHE_L1_MAX_BYTES (0 - кэш
+    не используется), при превышении вытесняются давно не запрошенные ответы.
+    Запись хранится не дольше settings.CACHE_L1_TTL_SECONDS и не дольше, чем ответ
+    актуален в общем кэше.
+    """
+
+    def __init__(self) -> None:
+        self.entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        """Возвращает актуальный ответ по ключу key или None."""
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry[0]:
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, payload: bytes, fresh_until: float) -> None:
+        """Сохраняет ответ payload, актуальный до fresh_until (время в секундах)."""
+
+        max_bytes = settings.CACHE_L1_MAX_BYTES
+        if len(payload) > max_bytes:
+            return
+        expires_at = min(fresh_until, time.time() + settings.CACHE_L1_TTL_SECONDS)
+        with self.lock:
+            self._pop(key)
+            self.entries[key] = (expires_at, payload)
+            self.size += len(payload)
+            while self.size > max_bytes:
+                self._pop(next(iter(self.entries)))
+
+    def clear(self) -> None:
+        """Удаляет все ответы."""
+
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key: str) -> None:
+        """Удаляет ответ по ключу key (вызывается при захваченной блокировке)."""
+
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class CacheStats:
+    """Счётчики обращений к кэшу ответов и их суммарной длительности
+    по результату: l1_hit - ответ из памяти процесса, l2_hit - из общего кэша,
+    miss - ответ сформирован заново (или получен после ожидания пересчёта).
+    """
+
+    outcomes = ("l1_hit", "l2_hit", "miss")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def record(self, outcome: str, started: float) -> None:
+        """Учитывает обращение, начатое в started (time.perf_counter()),
+        в счётчиках и в метриках (см. metrics.record_cache_lookup)."""
+
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.counts[outcome] += 1
+            self.seconds[outcome] += elapsed
+        record_cache_lookup(outcome, elapsed)
+
+    def reset(self) -> None:
+        """Обнуляет счётчики."""
+
+        with self.lock:
+            self.counts = dict.fromkeys(self.outcomes, 0)
+            self.seconds = dict.fromkeys(self.outcomes, 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Возвращает значения счётчиков: количество обращений и их суммарную
+        длительность (в секундах) по результату, а также доли попаданий в кэш."""
+
+        with self.lock:
+            counts, seconds = dict(self.counts), dict(self.seconds)
+        total = sum(counts.values())
+        return {
+            "counts": counts,
+            "seconds": seconds,
+            "l1_hit_ratio": counts["l1_hit"] / total if total else 0.0,
+            "hit_ratio": (counts["l1_hit"] + counts["l2_hit"]) / total
+            if total
+            else 0.0,
+        }
+
+
+local_cache = LocalPayloadCache()
+cache_stats = CacheStats()
+# Версия данных, известная процессу, и время (time.monotonic()) её проверки
+_local_data_version: Tuple[int | None, float] = (None, 0.0)
+
+
+def get_local_data_version() -> int:
+    """Возвращает версию данных (см. get_data_version), обращаясь к общему кэшу
+    не чаще, чем раз в settings.CACHE_L1_DATA_VERSION_CHECK_SECONDS (загрузка сделок
+    в другом процессе становится видна процессу с такой задержкой, в этом - сразу).
+    При смене версии ответы прежних версий удаляются из памяти процесса.
+    Args:
+    Returns:
+        int: Версия данных.
+    """
+
+    data_version = _get_checked_local_data_version()
+    if data_version is None:
+        data_version = get_data_version()
+        _set_local_data_version(data_version)
+    return data_version
+
+
+async def aget_local_data_version() -> int:
+    """Асинхронный вариант get_local_data_version."""
+
+    data_version = _get_checked_local_data_version()
+    if data_version is None:
+        data_version = await aget_data_version()
+        _set_local_data_version(data_version)
+    return data_version
+
+
+def _get_checked_local_data_version() -> int | None:
+    """Возвращает известную процессу версию данных или None, если её
+    пора сверить с общим кэшем."""
+
+    data_version, checked_at = _local_data_version
+    if (
+        data_version is not None
+        and time.monotonic() - checked_at < settings.CACHE_L1_DATA_VERSION_CHECK_SECONDS
+    ):
+        return data_version
+    return None
+
+
+def _set_local_data_version(data_version: int) -> None:
+    """Запоминает версию данных, сверенную с общим кэшем
+    (при смене версии удаляет ответы прежних версий из памяти процесса)."""
+
+    global _local_data_version
+    if data_version != _local_data_version[0]:
+        local_cache.clear()
+    _local_data_version = (data_version, time.monotonic())
+
+
+def clear_local_cache() -> None:
+    """Очищает кэш ответов в памяти процесса и известную процессу версию данных."""
+
+    global _local_data_version
+    _local_data_version = (None, 0.0)
+    local_cache.clear()
+
+
+def get_data_version() -> int:
+    """Возвращает текущую версию данных - время (в наносекундах) последней загрузки
+    сделок, которое хранится в общем кэше и входит в ключи закэшированных ответов.
+    В отличие от поколения набора сделок в БД (DatasetGeneration), которое создаётся
+    только загрузкой в режиме замены, версия меняется при каждой загрузке.
+    Если значение отсутствует в кэше (например, вытеснено), создаётся новая версия,
+    поэтому записи, закэшированные для прежних версий, не используются.
+    Args:
+    Returns:
+        int: Версия данных.
+    """
+
+    data_version_key = _get_data_version_cache_key()
+    data_version = cache.get(data_version_key)
+    if data_version is None:
+        cache.add(data_version_key, time.time_ns(), None)
+        data_version = cache.get(data_version_key)
+    return data_version
+
+
+async def aget_data_version() -> int:
+    """Асинхронный вариант get_data_version."""
+
+    data_version_key = _get_data_version_cache_key()
+    data_version = await acache(cache.get)(data_version_key)
+    if data_version is None:
+        await acache(cache.add)(data_version_key, time.time_ns(), None)
+        data_version = await acache(cache.get)(data_version_key)
+    return data_version
+
+
+def acache(method):
+    """Возвращает асинхронную обёртку метода общего кэша, выполняющую его в пуле
+    потоков. Асинхронный API кэша Django (cache.aget и т. п.) выполняет все обращения
+    в одном общем потоке, и ожидания ответов кэша разных запросов выстраиваются
+    в очередь; клиенты кэша потокобезопасны, поэтому общий поток не нужен.
+    Args:
+        method (Callable): Метод кэша (например, cache.get).
+    Returns:
+        Callable: Асинхронная функция.
+    """
+
+    return sync_to_async(method, thread_sensitive=False)
+
+
+def bump_data_version() -> int:
+    """Начинает новую версию данных: записи кэша прежних версий
+    перестают использоваться и удаляются из кэша по истечении их времени жизни.
+    Args:
+    Returns:
+        int: Новая версия данных.
+    """
+
+    global _local_data_version
+    data_version = time.time_ns()
+    cache.set(_get_data_version_cache_key(), data_version, None)
+    local_cache.clear()
+    _local_data_version = (data_version, time.monotonic())
+    return data_version
+
+
+def _get_data_version_cache_key() -> str:
+    """Возвращает ключ кэша для версии данных."""
+
+    return f"{settings.CACHE_PREFIX}:data_version"
+
+
+def get_top_customers_cache_key(
+    data_version: int | None = None, params: Dict[str, Any] | None = None
+) -> str:
+    """Возвращает ключ кэша для готового ответа со списком клиентов.
+    Ключ содержит версию формата ответа (settings.CACHE_PAYLOAD_VERSION) и версию
+    данных, поэтому после изменения формата или загрузки новых сделок
+    старые записи кэша не используются. Для запроса с параметрами к ключу добавляется
+    хэш их канонической записи.
+    Args:
+        data_version (int | None): Версия данных (по умолчанию - текущая).
+        params (Dict[str, Any] | None): Параметры запроса (limit, date_from, date_to, item).
+    Returns:
+        str: Ключ кэша.
+    """
+
+    if data_version is None:
+        data_version = get_data_version()
+    cache_key = (
+        f"{settings.CACHE_PREFIX}:payload:v{settings.CACHE_PAYLOAD_VERSION}"
+        f":d{data_version}"
+    )
+    query = canonicalize_query(params)
+    if query:
+        cache_key += f":q{hashlib.md5(query.encode()).hexdigest()}"
+    return cache_key
+
+
+def get_top_customers_etag(
+    data_version: int, params: Dict[str, Any] | None = None
+) -> str:
+    """Возвращает строгий ETag ответа со списком клиентов. ETag вычисляется по ключу
+    кэша ответа (версия формата, версия данных, параметры запроса),
+    поэтому для его проверки не нужны ни ответ, ни запросы к БД.
+    Args:
+        data_version (int): Версия данных.
+        params (Dict[str, Any] | None): Параметры запроса (limit, date_from, date_to, item).
+    Returns:
+        str: ETag (в кавычках).
+    """
+
+    cache_key = get_top_customers_cache_key(data_version, params)
+    return quote_etag(hashlib.md5(cache_key.encode()).hexdigest())
+
+
+def canonicalize_query(params: Dict[str, Any] | None) -> str:
+    """Возвращает каноническую запись параметров запроса: параметры упорядочены
+    по имени, отсутствующие параметры и limit по умолчанию (settings.GET_ROWS_LIMIT)
+    не учитываются. Для запроса без параметров возвращается пустая строка.
+    Args:
+        params (Dict[str, Any] | None): Параметры запроса.
+    Returns:
+        str: Каноническая запись параметров.
+    """
+
+    return urlencode(
+        sorted(
+            (name, str(value))
+            for name, value in (params or {}).items()
+            if value is not None
+            and not (name == "limit" and value == settings.GET_ROWS_LIMIT)
+        )
+    )
+
+
+def invalidate_top_customers_cache() -> None:
+    """Делает неактуальными закэшированные ответы (без очистки всего кэша) и после
+    фиксации текущей транзакции заранее формирует ответ для новой версии данных.
+    Args:
+    Returns:
+    """
+
+    data_version = bump_data_version()
+    transaction.on_commit(lambda: prewarm_top_customers_cache(data_version))
+
+
+def prewarm_top_customers_cache(data_version: int) -> None:
+    """Формирует и кэширует ответ со списком клиентов для версии данных data_version.
+    Args:
+        data_version (int): Версия данных.
+    Returns:
+    """
+
+    _set_top_customers_payload(
+        get_top_customers_cache_key(data_version), build_top_customers_payload()
+    )
+
+
+def get_top_customers_payload(
+    params: Dict[str, Any] | None = None, data_version: int | None = None
+) -> bytes:
+    """Возвращает готовый (сериализованный в JSON) ответ со списком клиентов,
+    потративших наибольшую сумму за весь период (или за период и по камню,
+    заданным в params). При попадании в кэш к БД не обращается, а при попадании
+    в кэш в памяти процесса (см. LocalPayloadCache) - и к общему кэшу.
+    Ответ пересчитывает только один процесс (захвативший блокировку в кэше):
+    пока он это делает, остальные отдают устаревший ответ (в течение
+    settings.CACHE_STALE_SECONDS после истечения его актуальности) или, если ответа
+    в кэше нет, ждут появления нового.
+    Args:
+        params (Dict[str, Any] | None): Параметры запроса (limit, date_from, date_to, item).
+        data_version (int | None): Версия данных (по умолчанию - текущая).
+    Returns:
+        bytes: Тело ответа в формате JSON.
+    """
+
+    started = time.perf_counter()
+    if data_version is None:
+        data_version = get_local_data_version()
+    cache_key = get_top_customers_cache_key(data_version, params)
+    payload = local_cache.get(cache_key)
+    if payload is not None:
+        cache_stats.record("l1_hit", started)
+        return payload
+    entry = cache.get(cache_key)
+    if entry is not None:
+        fresh_until, payload = entry
+        if time.time() < fresh_until:
+            local_cache.set(cache_key, payload, fresh_until)
+            cache_stats.record("l2_hit", started)
+            return payload
+    payload = _get_expired_top_customers_payload(cache_key, data_version, params, entry)
+    cache_stats.record("miss", started)
+    return payload
+
+
+async def aget_top_customers_payload(
+    params: Dict[str, Any] | None = None, data_version: int | None = None
+) -> bytes:
+    """Асинхронный вариант get_top_customers_payload: ответ из памяти процесса
+    отдаётся без переключения потоков, к общему кэшу и к БД обращается через
+    асинхронный API Django, ожидание пересчёта ответа не блокирует цикл событий.
+    Args:
+        params (Dict[str, Any] | None): Параметры запроса (limit, date_from, date_to, item).
+        data_version (int | None): Версия данных (по умолчанию - текущая).
+    Returns:
+        bytes: Тело ответа в формате JSON.
+    """
+
+    started = time.perf_counter()
+    if data_version is None:
+        data_version = await aget_local_data_version()
+    cache_key = get_top_customers_cache_key(data_version, params)
+    payload = local_cache.get(cache_key)
+    if payload is not None:
+        cache_stats.record("l1_hit", started)
+        return payload
+    entry = await acache(cache.get)(cache_key)
+    if entry is not None:
+        fresh_until, payload = entry
+        if time.time() < fresh_until:
+            local_cache.set(cache_key, payload, fresh_until)
+            cache_stats.record("l2_hit", started)
+            return payload
+    payload = await _aget_expired_top_customers_payload(
+        cache_key, data_version, params, entry
+    )
+    cache_stats.record("miss", started)
+    return payload
+
+
+def _get_expired_top_customers_payload(
+    cache_key: str,
+    data_version: int,
+    params: Dict[str, Any] | None,
+    entry: Tuple[float, bytes] | None,
+) -> bytes:
+    """Возвращает ответ, если в общем кэше нет актуального: пересчитывает его,
+    если удалось захватить блокировку пересчёта, иначе отдаёт устаревший ответ
+    или ждёт ответа, пересчитываемого другим процессом.
+    Args:
+        cache_key (str): Ключ записи кэша.
+        data_version (int): Версия данных.
+        params (Dict[str, Any] | None): Параметры запроса.
+        entry (Tuple[float, bytes] | None): Устаревшая запись кэша (если есть).
+    Returns:
+        bytes: Тело ответа в формате JSON.
+    """
+
+    if entry is not None:
+        if not _acquire_rebuild_lock(cache_key):
+            return entry[1]
+        return _rebuild_top_customers_payload(cache_key, data_version, params)
+    wait_until = time.monotonic() + settings.CACHE_REBUILD_WAIT_SECONDS
+    while not _acquire_rebuild_lock(cache_key):
+        time.sleep(settings.CACHE_REBUILD_POLL_SECONDS)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return entry[1]
+        if time.monotonic() >= wait_until:
+            return build_top_customers_payload(params)
+    return _rebuild_top_customers_payload(cache_key, data_version, params)
+
+
+async def _aget_expired_top_customers_payload(
+    cache_key: str,
+    data_version: int,
+    params: Dict[str, Any] | None,
+    entry: Tuple[float, bytes] | None,
+) -> bytes:
+    """Асинхронный вариант _get_expired_top_customers_payload."""
+
+    if entry is not None:
+        if not await _aacquire_rebuild_lock(cache_key):
+            return entry[1]
+        return await _arebuild_top_customers_payload(cache_key, data_version, params)
+    wait_until = time.monotonic() + settings.CACHE_REBUILD_WAIT_SECONDS
+    while not await _aacquire_rebuild_lock(cache_key):
+        await asyncio.sleep(settings.CACHE_REBUILD_POLL_SECONDS)
+        entry = await acache(cache.get)(cache_key)
+        if entry is not None:
+            return entry[1]
+        if time.monotonic() >= wait_until:
+            return await abuild_top_customers_payload(params)
+    return await _arebuild_top_customers_payload(cache_key, data_version, params)
+
+
+def _acquire_rebuild_lock(cache_key: str) -> bool:
+    """Пытается захватить блокировку пересчёта записи кэша cache_key.
+    Блокировка снимается автоматически через settings.CACHE_REBUILD_LOCK_SECONDS.
+    Args:
+        cache_key (str): Ключ записи кэша.
+    Returns:
+        bool: True, если блокировка захвачена.
+    """
+
+    return cache.add(f"{cache_key}:lock", True, settings.CACHE_REBUILD_LOCK_SECONDS)
+
+
+async def _aacquire_rebuild_lock(cache_key: str) -> bool:
+    """Асинхронный вариант _acquire_rebuild_lock."""
+
+    return await acache(cache.add)(
+        f"{cache_key}:lock", True, settings.CACHE_REBUILD_LOCK_SECONDS
+    )
+
+
+def _rebuild_top_customers_payload(
+    cache_key: str, data_version: int, params: Dict[str, Any] | None = None
+) -> bytes:
+    """Пересчитывает и кэширует ответ (вызывается при захваченной блокировке пересчёта).
+    Args:
+        cache_key (str): Ключ записи кэша.
+        data_version (int): Версия данных.
+        params (Dict[str, Any] | None): Параметры запроса.
+    Returns:
+        bytes: Тело ответа в формате JSON.
+    """
+
+    try:
+        payload = build_top_customers_payload(params)
+        _set_top_customers_payload(cache_key, payload)
+        if canonicalize_query(params):
+            _register_cached_query(cache_key, data_version)
+    finally:
+        cache.delete(f"{cache_key}:lock")
+    return payload
+
+
+async def _arebuild_top_customers_payload(
+    cache_key: str, data_version: int, params: Dict[str, Any] | None = None
+) -> bytes:
+    """Асинхронный вариант _rebuild_top_customers_payload."""
+
+    try:
+        payload = await abuild_top_customers_payload(params)
+        await _aset_top_customers_payload(cache_key, payload)
+        if canonicalize_query(params):
+            await acache(_register_cached_query)(cache_key, data_version)
+    finally:
+        await acache(cache.delete)(f"{cache_key}:lock")
+    return payload
+
+
+def _register_cached_query(cache_key: str, data_version: int) -> None:
+    """Переносит ключ ответа на запрос с параметрами в конец реестра версии данных
+    data_version и удаляет из кэша ответы, пересчитанные раньше остальных, если их
+    больше settings.CACHE_MAX_QUERIES. Часто запрашиваемые ответы пересчитываются
+    каждые settings.CACHE_TTL_SECONDS, поэтому вытесняются редко запрашиваемые.
+    Реестр обновляется без блокировки: при одновременном пересчёте нескольких ответов
+    ключ может выпасть из реестра, тогда его запись просто истечёт по времени.
+    Args:
+        cache_key (str): Ключ записи кэша.
+        data_version (int): Версия данных.
+    Returns:
+    """
+
+    registry_key = (
+        f"{settings.CACHE_PREFIX}:queries:v{settings.CACHE_PAYLOAD_VERSION}"
+        f":d{data_version}"
+    )
+    cache_keys = [key for key in cache.get(registry_key, []) if key != cache_key]
+    cache_keys.append(cache_key)
+    evicted_count = max(len(cache_keys) - settings.CACHE_MAX_QUERIES, 0)
+    if evicted_count:
+        cache.delete_many(cache_keys[:evicted_count])
+    cache.set(
+        registry_key,
+        cache_keys[evicted_count:],
+        settings.CACHE_TTL_SECONDS + settings.CACHE_STALE_SECONDS,
+    )
+
+
+def _set_top_customers_payload(cache_key: str, payload: bytes) -> None:
+    """Кэширует ответ (в общем кэше и в памяти процесса) вместе со временем окончания
+    его актуальности. Запись общего кэша хранится ещё settings.CACHE_STALE_SECONDS
+    после этого времени, чтобы её можно было отдавать, пока ответ пересчитывается.
+    Args:
+        cache_key (str): Ключ записи кэша.
+        payload (bytes): Тело ответа в формате JSON.
+    Returns:
+    """
+
+    fresh_until = time.time() + settings.CACHE_TTL_SECONDS
+    cache.set(
+        cache_key,
+        (fresh_until, payload),
+        settings.CACHE_TTL_SECONDS + settings.CACHE_STALE_SECONDS,
+    )
+    local_cache.set(cache_key, payload, fresh_until)
+
+
+async def _aset_top_customers_payload(cache_key: str, payload: bytes) -> None:
+    """Асинхронный вариант _set_top_customers_payload."""
+
+    fresh_until = time.time() + settings.CACHE_TTL_SECONDS
+    await acache(cache.set)(
+        cache_key,
+        (fresh_until, payload),
+        settings.CACHE_TTL_SECONDS + settings.CACHE_STALE_SECONDS,
+    )
+    local_cache.set(cache_key, payload, fresh_until)
+
+
+def build_top_customers_payload(params: Dict[str, Any] | None = None) -> bytes:
+    """Формирует ответ со списком клиентов, потративших наибольшую сумму за весь период
+    (или за период и по камню, заданным в params).
+    Данные берутся из БД уже в нужном виде, поэтому ответ строится из них напрямую,
+    без валидации сериализатором.
+    Оба запроса читают одно и то же поколение набора сделок, даже если загрузка
+    в режиме замены опубликует новое между ними.
+    Args:
+        params (Dict[str, Any] | None): Параметры запроса (limit, date_from, date_to, item).
+    Returns:
+        bytes: Тело ответа в формате JSON.
+    """
+
+    params = params or {}
+    filters = {name: params.get(name) for name in ("date_from", "date_to", "item")}
+    filters["generation"] = get_current_generation_id()
+    customers = get_largest_amount_customers(
+        params.get("limit", settings.GET_ROWS_LIMIT), **filters
+    )
+    add_gems_field_to_customers_data(customers, **filters)
+    return _render_top_customers_payload(customers)
+
+
+async def abuild_top_customers_payload(params: Dict[str, Any] | None = None) -> bytes:
+    """Асинхронный вариант build_top_customers_payload (запросы к БД выполняются
+    через асинхронный API ORM)."""
+
+    params = params or {}
+    filters = {name: params.get(name) for name in ("date_from", "date_to", "item")}
+    filters["generation"] = await aget_current_generation_id()
+    customers = await aget_largest_amount_customers(
+        params.get("limit", settings.GET_ROWS_LIMIT), **filters
+    )
+    await aadd_gems_field_to_customers_data(customers, **filters)
+    return _render_top_customers_payload(customers)
+
+
+def _render_top_customers_payload(customers: List[Dict[str, Any]]) -> bytes:
+    """Сериализует список клиентов (с камнями) в тело ответа в формате JSON."""
+
+    return ORJSONRenderer().render(
+        {
+            "response": [
+                {
+                    "username": customer["customer__username"],
+                    "spent_money": customer["spent_money"],
+                    "gems": customer["gems"],
+                }
+                for customer in customers
+            ]
+        }
+    )
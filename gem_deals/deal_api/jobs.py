@@ -0,0 +1,601 @@
+import contextlib
+import csv
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+import django
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import invalidate_top_customers_cache
+from .metrics import observe_ingest_job
+from .models import IngestFile, IngestJob, IngestJobStatus, IngestMode
+from .services import (
+    DealColumns,
+    _get_file_extension,
+    delete_retired_generations,
+    get_deal_columns_stream_from_file,
+    save_deal_columns_in_db,
+)
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_parse_executor: ProcessPoolExecutor | None = None
+_parse_executor_lock = threading.Lock()
+
+STALE_JOB_ERROR = (
+    "Задача загрузки прервана: процесс, выполнявший её, был перезапущен. "
+    "Загрузите файлы повторно."
+)
+
+
+class IngestError(Exception):
+    """Ошибка обработки загруженного файла."""
+
+
+class JobProgress:
+    """Прогресс выполнения задачи загрузки.
+    Хранится в кэше, т.к. изменения в БД не видны до завершения транзакции загрузки.
+    Также накапливает длительность этапов задачи (для метрик).
+    """
+
+    def __init__(self, job_id: int) -> None:
+        self.job_id = job_id
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.phase_seconds: Dict[str, float] = {}
+
+    def count_parsed(self, blocks: Iterable[DealColumns]) -> Iterator[DealColumns]:
+        """Возвращает блоки сделок blocks, подсчитывая количество прочитанных строк
+        и время их чтения (этап parse)."""
+
+        blocks = iter(blocks)
+        while True:
+            with self.measure("parse"):
+                block = next(blocks, None)
+            if block is None:
+                return
+            self.rows_parsed += len(block)
+            yield block
+
+    def add_written(self, rows: int) -> None:
+        """Учитывает сохранённый пакет из rows сделок и публикует прогресс."""
+
+        self.rows_written += rows
+        cache.set(
+            get_job_progress_cache_key(self.job_id),
+            {"rows_parsed": self.rows_parsed, "rows_written": self.rows_written},
+            settings.INGEST_PROGRESS_TTL_SECONDS,
+        )
+
+    @contextlib.contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """Контекстный менеджер, добавляющий время выполнения блока
+        к длительности этапа phase."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[phase] = (
+                self.phase_seconds.get(phase, 0.0) + time.perf_counter() - started
+            )
+
+    def get_phase_seconds(self) -> Dict[str, float]:
+        """Возвращает длительность этапов задачи: parse - чтение файлов, save -
+        сохранение сделок в БД (время сохранения файлов за вычетом их чтения),
+        invalidate_cache, cleanup и total - всей задачи."""
+
+        phase_seconds = dict(self.phase_seconds)
+        if "ingest" in phase_seconds:
+            phase_seconds["save"] = max(
+                phase_seconds.pop("ingest") - phase_seconds.get("parse", 0.0), 0.0
+            )
+        return phase_seconds
+
+
+def get_job_progress_cache_key(job_id: int) -> str:
+    """Возвращает ключ кэша для прогресса выполнения задачи загрузки."""
+
+    return f"{settings.CACHE_PREFIX}:job:{job_id}"
+
+
+def get_job_progress(job: IngestJob) -> Dict[str, int]:
+    """Возвращает количество прочитанных и сохранённых строк задачи загрузки.
+    Для выполняющейся задачи данные берутся из кэша.
+    Args:
+        job (IngestJob): Задача загрузки.
+    Returns:
+        Dict[str, int]: Словарь с ключами rows_parsed, rows_written.
+    """
+
+    progress = {"rows_parsed": job.rows_parsed, "rows_written": job.rows_written}
+    if job.status == IngestJobStatus.RUNNING:
+        progress.update(cache.get(get_job_progress_cache_key(job.id)) or {})
+    return progress
+
+
+def create_ingest_job(
+    files: Iterable[UploadedFile], mode: str, delimiter: str | None = None
+) -> IngestJob:
+    """Сохраняет загруженные файлы на диск и создаёт задачу для их обработки.
+    Args:
+        files (Iterable[UploadedFile]): Загруженные файлы.
+        mode (str): Режим загрузки (IngestMode).
+        delimiter (str | None): Разделитель полей csv.
+    Returns:
+        IngestJob: Созданная задача загрузки.
+    """
+
+    upload_dir = Path(settings.INGEST_UPLOAD_DIR)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    with transaction.atomic():
+        job = IngestJob.objects.create(mode=mode, delimiter=delimiter or "")
+        for file in files:
+            file_path = (
+                upload_dir / f"{uuid.uuid4().hex}{_get_file_extension(file.name)}"
+            )
+            with open(file_path, "wb") as destination:
+                for chunk in file.chunks(settings.CSV_READ_CHUNK_SIZE):
+                    destination.write(chunk)
+            IngestFile.objects.create(
+                job=job, file_name=file.name, file_path=str(file_path)
+            )
+    return job
+
+
+def create_ingest_job_for_file(
+    file_name: str, file_path: str, mode: str, delimiter: str | None = None
+) -> IngestJob:
+    """Создаёт задачу для обработки уже сохранённого на диск файла
+    (файл удаляется после выполнения задачи).
+    Args:
+        file_name (str): Исходное название файла.
+        file_path (str): Путь до сохранённого файла.
+        mode (str): Режим загрузки (IngestMode).
+        delimiter (str | None): Разделитель полей csv.
+    Returns:
+        IngestJob: Созданная задача загрузки.
+    """
+
+    with transaction.atomic():
+        job = IngestJob.objects.create(mode=mode, delimiter=delimiter or "")
+        IngestFile.objects.create(job=job, file_name=file_name, file_path=file_path)
+    return job
+
+
+def submit_ingest_job(job: IngestJob) -> None:
+    """Ставит задачу загрузки в очередь фоновой обработки (после фиксации транзакции)
+    или, если фоновая обработка отключена (settings.INGEST_BACKGROUND), выполняет её сразу.
+    Args:
+        job (IngestJob): Задача загрузки.
+    Returns:
+    """
+
+    if settings.INGEST_BACKGROUND:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run_ingest_job_in_background, job.id)
+        )
+    else:
+        run_ingest_job(job.id)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Возвращает пул потоков фоновой обработки (создаётся при первом обращении,
+    т.е. уже после fork рабочего процесса uWSGI).
+    """
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest"
+        )
+    return _executor
+
+
+def _run_ingest_job_in_background(job_id: int) -> None:
+    """Выполняет задачу загрузки в потоке пула и закрывает соединения потока с БД."""
+
+    try:
+        run_ingest_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def run_ingest_job(job_id: int) -> IngestJob:
+    """Выполняет задачу загрузки: сохраняет сделки из всех её файлов в БД
+    одной транзакцией (при ошибке в любом из файлов не сохраняется ничего).
+    Args:
+        job_id (int): ID задачи загрузки.
+    Returns:
+        IngestJob: Задача загрузки с итоговым статусом.
+    """
+
+    # Задача выполняется один раз: повторно поставленная в очередь или уже
+    # завершённая командой recover_ingest_jobs задача пропускается
+    claimed = IngestJob.objects.filter(
+        id=job_id, status=IngestJobStatus.PENDING
+    ).update(
+        status=IngestJobStatus.RUNNING,
+        started_at=timezone.now(),
+        worker=_get_worker_name(),
+    )
+    job = IngestJob.objects.get(id=job_id)
+    if not claimed:
+        logger.warning(f"Задача загрузки #{job.id} уже выполнялась, пропущена.")
+        return job
+    ingest_files = list(job.files.order_by("id"))
+    progress = JobProgress(job.id)
+    started = time.perf_counter()
+    try:
+        with progress.measure("ingest"):
+            _ingest_files(job, ingest_files, progress)
+    except Exception as error:
+        if not isinstance(error, IngestError):
+            logger.exception(f"Ошибка выполнения задачи загрузки #{job.id}.")
+        job.status = IngestJobStatus.FAILED
+        job.error = str(error)
+    else:
+        job.status = IngestJobStatus.DONE
+        with progress.measure("invalidate_cache"):
+            _invalidate_top_customers_cache()
+        with progress.measure("cleanup"):
+            _delete_retired_generations()
+        if job.mode == IngestMode.REPLACE and settings.INGEST_BACKGROUND:
+            _schedule_retired_generations_cleanup()
+    finally:
+        for ingest_file in ingest_files:
+            Path(ingest_file.file_path).unlink(missing_ok=True)
+    IngestFile.objects.bulk_update(
+        ingest_files, ["rows_parsed", "rows_written", "error"]
+    )
+    job.rows_parsed = progress.rows_parsed
+    # Транзакция загрузки с ошибкой откатывается: сделки не сохранены
+    job.rows_written = (
+        progress.rows_written if job.status == IngestJobStatus.DONE else 0
+    )
+    job.finished_at = timezone.now()
+    job.save()
+    progress.phase_seconds["total"] = time.perf_counter() - started
+    observe_ingest_job(
+        job.mode,
+        job.status,
+        job.rows_parsed,
+        job.rows_written,
+        progress.get_phase_seconds(),
+    )
+    return job
+
+
+def _invalidate_top_customers_cache() -> None:
+    """Делает неактуальными закэшированные ответы (ошибка обращения к кэшу
+    не влияет на результат задачи загрузки: сделки уже сохранены)."""
+
+    try:
+        invalidate_top_customers_cache()
+    except Exception:
+        logger.exception("Ошибка сброса закэшированных ответов.")
+
+
+def _schedule_retired_generations_cleanup() -> None:
+    """Планирует удаление поколения, заменённого задачей загрузки, в пуле потоков
+    фоновой обработки по истечении settings.DATASET_RETENTION_SECONDS.
+    Запланированное удаление теряется при перезапуске процесса, поэтому заменённые
+    поколения также удаляются периодически (cron в настройках uWSGI).
+    """
+
+    timer = threading.Timer(
+        settings.DATASET_RETENTION_SECONDS + 1,
+        lambda: _get_executor().submit(_delete_retired_generations_in_background),
+    )
+    timer.daemon = True
+    timer.start()
+
+
+def _delete_retired_generations_in_background() -> None:
+    """Удаляет заменённые поколения в потоке пула и закрывает соединения потока с БД."""
+
+    try:
+        _delete_retired_generations()
+    finally:
+        connections.close_all()
+
+
+def _delete_retired_generations() -> None:
+    """Удаляет заменённые поколения набора сделок (ошибка удаления не влияет
+    на результат задачи загрузки, удаление повторится после следующей загрузки)."""
+
+    try:
+        delete_retired_generations()
+    except Exception:
+        logger.exception("Ошибка удаления заменённых поколений набора сделок.")
+
+
+def _ingest_files(
+    job: IngestJob, ingest_files: List[IngestFile], progress: JobProgress
+) -> None:
+    """Сохраняет в БД сделки из всех файлов задачи загрузки одним вызовом
+    save_deal_columns_in_db. Файлы разбираются поблочно в колоночное представление.
+    Если файлов несколько, они сначала разбираются параллельно в отдельных процессах
+    (разбор csv ограничен скоростью процессора), единственный файл читается потоково,
+    как и все файлы, если пул процессов недоступен (см. _get_parse_executor).
+    Args:
+        job (IngestJob): Задача загрузки.
+        ingest_files (List[IngestFile]): Файлы задачи (количество прочитанных
+        и сохранённых строк и ошибки записываются в них).
+        progress (JobProgress): Прогресс выполнения задачи.
+    Returns:
+    Raises:
+        IngestError: Если какой-либо из файлов не является валидным csv.
+    """
+
+    delimiter = job.delimiter or None
+    executor = None
+    if len(ingest_files) > 1 and settings.INGEST_PARSE_WORKERS > 1:
+        executor = _get_parse_executor()
+    if executor is not None:
+        with progress.measure("parse"):
+            files_blocks = _parse_files_in_processes(executor, ingest_files, delimiter)
+    else:
+        files_blocks = [
+            _iter_file_blocks(ingest_file.file_name, ingest_file.file_path, delimiter)
+            for ingest_file in ingest_files
+        ]
+
+    def blocks() -> Iterator[DealColumns]:
+        for ingest_file, file_blocks in zip(ingest_files, files_blocks):
+            rows_parsed = progress.rows_parsed
+            try:
+                yield from progress.count_parsed(file_blocks)
+            except IngestError as error:
+                ingest_file.error = str(error)
+                raise
+            finally:
+                ingest_file.rows_parsed = progress.rows_parsed - rows_parsed
+        # Строка задачи блокируется до фиксации транзакции загрузки: задача,
+        # завершённая за это время командой recover_ingest_jobs, не сохраняет сделки
+        if not (
+            IngestJob.objects.select_for_update()
+            .filter(id=job.id, status=IngestJobStatus.RUNNING)
+            .exists()
+        ):
+            raise IngestError(STALE_JOB_ERROR)
+
+    save_deal_columns_in_db(
+        blocks(), mode=job.mode, on_batch_saved=progress.add_written
+    )
+    for ingest_file in ingest_files:
+        ingest_file.rows_written = ingest_file.rows_parsed
+
+
+def recover_stale_ingest_jobs() -> int:
+    """Завершает с ошибкой потерянные задачи загрузки: задачи пула потоков
+    (см. _get_executor) теряются при перезапуске рабочего процесса uWSGI.
+    Потерянными считаются выполняющиеся задачи, процесс которых завершился
+    (проверяется для процессов того же хоста), а также выполняющиеся и ожидающие
+    задачи, не завершённые за settings.INGEST_JOB_TIMEOUT_SECONDS.
+    Файлы потерянных задач удаляются.
+    Args:
+    Returns:
+        int: Количество завершённых задач.
+    """
+
+    deadline = timezone.now() - timedelta(seconds=settings.INGEST_JOB_TIMEOUT_SECONDS)
+    stale_ids = set(
+        IngestJob.objects.filter(
+            Q(status=IngestJobStatus.PENDING, created_at__lt=deadline)
+            | Q(status=IngestJobStatus.RUNNING, started_at__lt=deadline)
+        ).values_list("id", flat=True)
+    )
+    for job_id, worker in IngestJob.objects.filter(
+        status=IngestJobStatus.RUNNING
+    ).values_list("id", "worker"):
+        if not _is_worker_alive(worker):
+            stale_ids.add(job_id)
+    recovered = 0
+    for job_id in sorted(stale_ids):
+        with transaction.atomic():
+            job = (
+                IngestJob.objects.select_for_update()
+                .filter(
+                    id=job_id,
+                    status__in=[IngestJobStatus.PENDING, IngestJobStatus.RUNNING],
+                )
+                .first()
+            )
+            if job is None:
+                continue
+            job.status = IngestJobStatus.FAILED
+            job.error = STALE_JOB_ERROR
+            job.rows_written = 0
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "rows_written", "finished_at"])
+        for file_path in job.files.values_list("file_path", flat=True):
+            Path(file_path).unlink(missing_ok=True)
+        logger.warning(f"Задача загрузки #{job.id} завершена как потерянная.")
+        recovered += 1
+    return recovered
+
+
+def _get_worker_name() -> str:
+    """Возвращает имя текущего процесса для задачи загрузки (хост:PID)."""
+
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _is_worker_alive(worker: str) -> bool:
+    """Проверяет, работает ли процесс worker (хост:PID). Процессы других хостов
+    считаются работающими: их задачи завершаются по истечении
+    settings.INGEST_JOB_TIMEOUT_SECONDS.
+    Args:
+        worker (str): Имя процесса.
+    Returns:
+        bool: False, если процесс того же хоста завершился.
+    """
+
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _get_parse_executor() -> ProcessPoolExecutor | None:
+    """Возвращает пул процессов разбора файлов. Пул создаётся при первом обращении
+    и используется всеми задачами процесса: запуск процесса с импортом Django
+    занимает заметное время. Под uWSGI sys.executable указывает на бинарный файл
+    uwsgi, а не на интерпретатор Python, поэтому без settings.INGEST_PARSE_EXECUTABLE
+    процессы не запускаются и файлы разбираются в потоке задачи.
+    Returns:
+        ProcessPoolExecutor | None: Пул процессов или None, если он недоступен.
+    """
+
+    global _parse_executor
+    executable = settings.INGEST_PARSE_EXECUTABLE
+    if not executable and _is_running_under_uwsgi():
+        return None
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            # Процессы запускаются через spawn: обработка идёт в потоке рабочего
+            # процесса, а fork многопоточного процесса небезопасен
+            context = multiprocessing.get_context("spawn")
+            context.set_executable(executable or sys.executable)
+            _parse_executor = ProcessPoolExecutor(
+                max_workers=settings.INGEST_PARSE_WORKERS,
+                mp_context=context,
+                initializer=django.setup,
+            )
+        return _parse_executor
+
+
+def _is_running_under_uwsgi() -> bool:
+    """Проверяет, выполняется ли код в процессе uWSGI
+    (модуль uwsgi доступен только внутри сервера)."""
+
+    try:
+        import uwsgi  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _parse_files_in_processes(
+    executor: ProcessPoolExecutor,
+    ingest_files: List[IngestFile],
+    delimiter: str | None,
+) -> List[List[DealColumns]]:
+    """Параллельно разбирает файлы задачи загрузки в пуле процессов.
+    Ошибки разбора записываются в соответствующие файлы задачи.
+    Args:
+        executor (ProcessPoolExecutor): Пул процессов разбора файлов.
+        ingest_files (List[IngestFile]): Файлы задачи.
+        delimiter (str | None): Разделитель полей csv.
+    Returns:
+        List[List[DealColumns]]: Блоки сделок каждого из файлов.
+    Raises:
+        IngestError: Если какой-либо из файлов не является валидным csv.
+    """
+
+    try:
+        futures = [
+            executor.submit(
+                _parse_file, ingest_file.file_name, ingest_file.file_path, delimiter
+            )
+            for ingest_file in ingest_files
+        ]
+        wait(futures)
+    except BrokenProcessPool:
+        _discard_parse_executor(executor)
+        raise
+    errors = []
+    for ingest_file, future in zip(ingest_files, futures):
+        error = future.exception()
+        if error is None:
+            continue
+        if isinstance(error, BrokenProcessPool):
+            _discard_parse_executor(executor)
+        if not isinstance(error, IngestError):
+            raise error
+        ingest_file.error = str(error)
+        errors.append(ingest_file.error)
+    if errors:
+        raise IngestError("; ".join(errors))
+    return [future.result() for future in futures]
+
+
+def _discard_parse_executor(executor: ProcessPoolExecutor) -> None:
+    """Отказывается от пула процессов, процесс которого завершился аварийно
+    (следующая задача загрузки создаст новый пул)."""
+
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is executor:
+            _parse_executor = None
+
+
+def _parse_file(
+    file_name: str, file_path: str, delimiter: str | None
+) -> List[DealColumns]:
+    """Возвращает все блоки сделок из файла (выполняется в процессе пула разбора файлов)."""
+
+    return list(_iter_file_blocks(file_name, file_path, delimiter))
+
+
+def _iter_file_blocks(
+    file_name: str, file_path: str, delimiter: str | None
+) -> Iterator[DealColumns]:
+    """Поблочно читает сделки из сохранённого на диск загруженного файла.
+    Args:
+        file_name (str): Исходное название файла.
+        file_path (str): Путь до сохранённого файла.
+        delimiter (str | None): Разделитель полей csv.
+    Returns:
+        Iterator[DealColumns]: Генератор блоков сделок.
+    Raises:
+        IngestError: Если файл не является валидным csv.
+    """
+
+    with open(file_path, "rb") as file:
+        blocks = get_deal_columns_stream_from_file(
+            filename=file_name,
+            chunks=iter(partial(file.read, settings.CSV_READ_CHUNK_SIZE), b""),
+            delimiter=delimiter,
+        )
+        if blocks is None:
+            raise IngestError(
+                f"{file_name}: расширение файла не csv либо содержимое "
+                "файла не является валидным csv."
+            )
+        rows = 0
+        try:
+            for block in blocks:
+                yield block
+                rows += len(block)
+        except (csv.Error, UnicodeDecodeError) as error:
+            raise IngestError(
+                f"{file_name}: содержимое файла не является валидным csv "
+                f"(после строки {rows}): {error}"
+            ) from error
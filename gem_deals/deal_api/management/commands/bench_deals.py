@@ -0,0 +1,353 @@
+import contextlib
+import csv
+import io
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterator, List
+from unittest import mock
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from deal_api.caching import bump_data_version, clear_local_cache
+from deal_api.services import (
+    _get_reader_file_descriptor,
+    get_data_from_reader,
+    save_data_in_db,
+)
+from deal_api.views import DealAPIView
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Версия формата файла результатов
+RESULTS_VERSION = 1
+# Кэш на время замеров: кэш проекта (например, общий Redis) не затрагивается
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench_deals",
+    }
+}
+DEALS_START = datetime(2018, 12, 14)
+
+
+def generate_deals_csv(
+    rows: int, customers: int, gems: int, days: int, zipf: float, seed: int
+) -> bytes:
+    """Генерирует csv-файл с синтетическими сделками. Клиенты выбираются
+    по закону Ципфа (клиент с номером k - с вероятностью, пропорциональной
+    1 / k ** zipf; при zipf = 0 - равномерно), камни - равномерно, даты сделок
+    равномерно распределены по days дням, начиная с DEALS_START.
+    Args:
+        rows (int): Количество сделок.
+        customers (int): Количество различных клиентов.
+        gems (int): Количество различных драгоценных камней.
+        days (int): Количество дней, по которым распределены сделки.
+        zipf (float): Показатель распределения Ципфа для клиентов.
+        seed (int): Seed генератора случайных чисел.
+    Returns:
+        bytes: Содержимое csv-файла.
+    """
+
+    rnd = random.Random(seed)
+    cum_weights = list(accumulate(1 / k**zipf for k in range(1, customers + 1)))
+    customer_ids = rnd.choices(range(customers), cum_weights=cum_weights, k=rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["customer", "item", "total", "quantity", "date"])
+    seconds = days * 24 * 3600
+    writer.writerows(
+        (
+            f"customer{customer_id}",
+            f"gem{rnd.randrange(gems)}",
+            rnd.randint(100, 10000),
+            rnd.randint(1, 10),
+            DEALS_START + timedelta(seconds=rnd.randrange(seconds)),
+        )
+        for customer_id in customer_ids
+    )
+    return buffer.getvalue().encode()
+
+
+@contextlib.contextmanager
+def benchmark_database() -> Iterator[None]:
+    """Контекстный менеджер, создающий тестовую БД на время замеров
+    (рабочая БД проекта не затрагивается)."""
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextlib.contextmanager
+def benchmark_cache() -> Iterator[None]:
+    """Контекстный менеджер, подменяющий кэш проекта кэшем в памяти процесса
+    на время замеров (закэшированные ответы и версия данных в кэше проекта
+    не затрагиваются, внешние сервисы не нужны)."""
+
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        clear_local_cache()
+        try:
+            yield
+        finally:
+            clear_local_cache()
+
+
+def get_peak_rss_mb() -> float | None:
+    """Возвращает пиковый объём резидентной памяти процесса (МБ)
+    или None, если он недоступен на этой платформе."""
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает значение в килобайтах, macOS - в байтах
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def compare_results(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+    min_seconds: float,
+) -> List[str]:
+    """Сравнивает результаты замеров с базовыми и возвращает описания регрессий:
+    этап стал медленнее более чем в (1 + threshold) раз (и более чем на min_seconds)
+    или выполняет больше запросов к БД.
+    Args:
+        results (Dict[str, Any]): Результаты замеров.
+        baseline (Dict[str, Any]): Базовые результаты.
+        threshold (float): Допустимое относительное замедление.
+        min_seconds (float): Замедление (в секундах), меньше которого не учитывается.
+    Returns:
+        List[str]: Описания регрессий.
+    """
+
+    regressions = []
+    for phase, measured in results["phases"].items():
+        base = baseline["phases"].get(phase)
+        if base is None:
+            continue
+        seconds, base_seconds = measured["seconds"], base["seconds"]
+        if (
+            seconds > base_seconds * (1 + threshold)
+            and seconds - base_seconds > min_seconds
+        ):
+            regressions.append(
+                f"{phase}: {base_seconds:.4f} s -> {seconds:.4f} s "
+                f"(+{(seconds / base_seconds - 1) * 100:.0f}%)"
+            )
+        if measured["queries"] > base["queries"]:
+            regressions.append(
+                f"{phase}: запросов к БД {base['queries']} -> {measured['queries']}"
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    """Команда для замера производительности на синтетических данных."""
+
+    help = (
+        "Генерирует csv-файл с синтетическими сделками и замеряет этапы обработки: "
+        "определение диалекта (sniff), разбор (parse), сохранение в БД (save), "
+        "GET-запрос без кэша (cold_get) и из кэша (warm_get). Для каждого этапа "
+        "записываются время, количество запросов к БД и пиковый объём памяти "
+        "процесса. Замеры выполняются на отдельной тестовой БД и с кэшем "
+        "в памяти процесса."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--customers", type=int, default=10_000)
+        parser.add_argument("--gems", type=int, default=25)
+        parser.add_argument(
+            "--days", type=int, default=365, help="Период дат сделок (в днях)."
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Показатель распределения Ципфа для клиентов (0 - равномерно).",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--warm-requests",
+            type=int,
+            default=200,
+            help="Количество GET-запросов при замере ответа из кэша.",
+        )
+        parser.add_argument(
+            "--output", help="Файл, в который записываются результаты (JSON)."
+        )
+        parser.add_argument(
+            "--csv-path", help="Файл, в который сохраняются сгенерированные сделки."
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="BASELINE",
+            help="Файл с базовыми результатами: при регрессии команда "
+            "завершается с ошибкой.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимое относительное замедление этапа при сравнении.",
+        )
+        parser.add_argument(
+            "--min-seconds",
+            type=float,
+            default=0.01,
+            help="Замедление этапа (в секундах), которое не считается регрессией.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        params = {
+            name: options[name]
+            for name in ("rows", "customers", "gems", "days", "zipf", "seed")
+        }
+        phases: Dict[str, Dict[str, Any]] = {}
+        content = self.measure(phases, "generate", lambda: generate_deals_csv(**params))
+        if options["csv_path"]:
+            with open(options["csv_path"], "wb") as file:
+                file.write(content)
+        with benchmark_database(), benchmark_cache():
+            reader = self.measure(
+                phases,
+                "sniff",
+                lambda: _get_reader_file_descriptor("deals.csv", content),
+            )
+            deals = self.measure(phases, "parse", lambda: get_data_from_reader(reader))
+            self.measure(phases, "save", lambda: save_data_in_db(deals))
+            del deals, reader
+            # Ограничение частоты запросов не замеряется
+            with mock.patch.object(DealAPIView, "throttle_classes", []):
+                client = Client()
+                bump_data_version()
+                clear_local_cache()
+                self.measure(phases, "cold_get", lambda: self.get(client))
+                self.measure(
+                    phases,
+                    "warm_get",
+                    lambda: [self.get(client) for _ in range(options["warm_requests"])],
+                    repeat=options["warm_requests"],
+                )
+        results = {
+            "version": RESULTS_VERSION,
+            "params": params,
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cache": BENCHMARK_CACHES["default"]["BACKEND"],
+            },
+            "phases": phases,
+            "rows_per_second": {
+                phase: params["rows"] / phases[phase]["seconds"]
+                for phase in ("parse", "save")
+                if phases[phase]["seconds"]
+            },
+        }
+        self.write_results(results)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+        if options["compare"]:
+            self.compare(results, options)
+
+    def measure(
+        self,
+        phases: Dict[str, Dict[str, Any]],
+        phase: str,
+        function: Callable[[], Any],
+        repeat: int = 1,
+    ) -> Any:
+        """Выполняет function и записывает в phases[phase] время выполнения
+        (среднее на одно из repeat повторений), количество запросов к БД
+        (на одно повторение) и пиковый объём памяти процесса после этапа.
+        Args:
+            phases (Dict[str, Dict[str, Any]]): Результаты этапов.
+            phase (str): Название этапа.
+            function (Callable[[], Any]): Замеряемая функция.
+            repeat (int): Количество повторений, выполняемых function.
+        Returns:
+            Any: Результат function.
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - started
+        phases[phase] = {
+            "seconds": elapsed / repeat,
+            "queries": len(queries) // repeat,
+            "peak_rss_mb": get_peak_rss_mb(),
+        }
+        return result
+
+    @staticmethod
+    def get(client: Client) -> None:
+        """Выполняет GET-запрос списка клиентов."""
+
+        response = client.get("/api/v1/")
+        if response.status_code != 200:
+            raise CommandError(
+                f"GET-запрос завершился статусом {response.status_code}."
+            )
+
+    def write_results(self, results: Dict[str, Any]) -> None:
+        """Выводит результаты замеров таблицей."""
+
+        self.stdout.write(
+            f"{'phase':>10} {'seconds':>10} {'queries':>8} {'peak RSS, MB':>13}"
+        )
+        for phase, measured in results["phases"].items():
+            peak_rss = measured["peak_rss_mb"]
+            self.stdout.write(
+                f"{phase:>10} {measured['seconds']:>10.4f} {measured['queries']:>8} "
+                f"{'-' if peak_rss is None else f'{peak_rss:.1f}':>13}"
+            )
+        for phase, rows_per_second in results["rows_per_second"].items():
+            self.stdout.write(f"{phase}: {rows_per_second:.0f} rows/s")
+
+    def compare(self, results: Dict[str, Any], options: Dict[str, Any]) -> None:
+        """Сравнивает результаты с базовыми из файла options["compare"].
+        Raises:
+            CommandError: Если обнаружены регрессии.
+        """
+
+        with open(options["compare"], encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("params") != results["params"]:
+            self.stderr.write(
+                "Параметры замеров отличаются от базовых: "
+                f"{baseline.get('params')} -> {results['params']}"
+            )
+        regressions = compare_results(
+            results, baseline, options["threshold"], options["min_seconds"]
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f"Обнаружены регрессии ({len(regressions)}).")
+        self.stdout.write(self.style.SUCCESS("Регрессий не обнаружено."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from deal_api.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    """Команда для удаления незавершённых загрузок файлов частями."""
+
+    help = (
+        "Удаляет незавершённые загрузки файлов частями, не изменявшиеся дольше "
+        "settings.CHUNKED_UPLOAD_TTL_SECONDS, вместе с их временными файлами."
+    )
+
+    def handle(self, *args, **options) -> None:
+        deleted = delete_expired_uploads()
+        self.stdout.write(f"Удалено незавершённых загрузок: {deleted}.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from deal_api.services import delete_retired_generations
+
+
+class Command(BaseCommand):
+    """Команда для удаления заменённых поколений набора сделок."""
+
+    help = (
+        "Удаляет поколения набора сделок, заменённые загрузкой в режиме замены раньше, "
+        "чем settings.DATASET_RETENTION_SECONDS назад, вместе с их сделками "
+        "и статистикой."
+    )
+
+    def handle(self, *args, **options) -> None:
+        deleted = delete_retired_generations()
+        self.stdout.write(f"Удалено заменённых поколений набора сделок: {deleted}.")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from deal_api.services import (
+    check_customer_stats,
+    refresh_customer_stats,
+    refresh_daily_stats,
+)
+
+
+class Command(BaseCommand):
+    """Команда для перестроения и проверки агрегированной статистики клиентов."""
+
+    help = (
+        "Перестраивает статистику клиентов (CustomerStats) и статистику по дням "
+        "(DailyDealStats) по сохранённым сделкам и проверяет согласованность "
+        "статистики клиентов."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить статистику, не перестраивая её.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if not options["check"]:
+            with transaction.atomic():
+                refresh_customer_stats()
+                refresh_daily_stats()
+            self.stdout.write("Статистика клиентов и статистика по дням перестроены.")
+        mismatches = check_customer_stats()
+        for mismatch in mismatches:
+            self.stderr.write(
+                f"Клиент {mismatch['customer']}: ожидается {mismatch['expected']}, "
+                f"сохранено {mismatch['stored']}"
+            )
+        if mismatches:
+            raise CommandError(
+                f"Статистика клиентов не согласована ({len(mismatches)} расхождений)."
+            )
+        self.stdout.write(self.style.SUCCESS("Статистика клиентов согласована."))
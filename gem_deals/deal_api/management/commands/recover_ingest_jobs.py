@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from deal_api.jobs import recover_stale_ingest_jobs
+
+
+class Command(BaseCommand):
+    """Команда для завершения потерянных задач загрузки."""
+
+    help = (
+        "Завершает с ошибкой задачи загрузки, потерянные при перезапуске рабочих "
+        "процессов или не завершённые за settings.INGEST_JOB_TIMEOUT_SECONDS, "
+        "и удаляет их файлы."
+    )
+
+    def handle(self, *args, **options) -> None:
+        recovered = recover_stale_ingest_jobs()
+        self.stdout.write(f"Завершено потерянных задач загрузки: {recovered}.")
@@ -0,0 +1,519 @@
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from django.conf import settings
+
+# Границы интервалов гистограмм длительности (секунды)
+DURATION_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+# Границы интервалов гистограммы количества запросов к БД
+DB_QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Границы интервалов гистограммы длительности этапов загрузки сделок (секунды)
+INGEST_DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# Тип содержимого текстового формата метрик Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    """Метрика в формате Prometheus: значения по наборам значений меток labelnames.
+    Значения хранятся в памяти процесса; если задан
+    settings.METRICS_MULTIPROCESS_DIR, метрики выдаются суммарно по всем процессам
+    (см. render_metrics).
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], Any] = {}
+
+    def reset(self) -> None:
+        """Удаляет все значения метрики."""
+
+        with self.lock:
+            self.values = {}
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        """Возвращает копию значений метрики."""
+
+        with self.lock:
+            return {key: self._copy_value(value) for key, value in self.values.items()}
+
+    def merge(
+        self, values: Dict[Tuple[str, ...], Any], other: Dict[Tuple[str, ...], Any]
+    ) -> None:
+        """Добавляет к значениям values значения other (другого процесса)."""
+
+        for key, value in other.items():
+            values[key] = (
+                self._merge_value(values[key], value) if key in values else value
+            )
+
+    def render(self, values: Dict[Tuple[str, ...], Any] | None = None) -> Iterator[str]:
+        """Возвращает строки метрики в текстовом формате Prometheus
+        (values - значения метрики, по умолчанию - значения процесса)."""
+
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        if values is None:
+            values = self.snapshot()
+        for key, value in sorted(values.items()):
+            yield from self._render_value(list(zip(self.labelnames, key)), value)
+
+    def _get_key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Возвращает ключ значения метрики по значениям меток."""
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _copy_value(self, value: Any) -> Any:
+        """Возвращает копию значения (вызывается при захваченной блокировке)."""
+
+        return value
+
+    def _merge_value(self, value: Any, other: Any) -> Any:
+        """Возвращает сумму значений двух процессов."""
+
+        return value + other
+
+    def _render_value(self, labels: List[Tuple[str, str]], value: Any) -> Iterator[str]:
+        """Возвращает строки значения метрики с метками labels."""
+
+        yield f"{self.name}{_format_labels(labels)} {_format_number(value)}"
+
+
+class Counter(Metric):
+    """Счётчик (значение только увеличивается)."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Увеличивает значение счётчика с метками labels на amount."""
+
+        key = self._get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Текущее значение (хранится вместе со временем установки: из значений
+    нескольких процессов выдаётся установленное последним)."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        """Устанавливает значение с метками labels."""
+
+        key = self._get_key(labels)
+        with self.lock:
+            self.values[key] = (value, time.time())
+
+    def _merge_value(
+        self, value: Tuple[float, float], other: Tuple[float, float]
+    ) -> Tuple[float, float]:
+        return max(value, other, key=lambda item: item[1])
+
+    def _render_value(
+        self, labels: List[Tuple[str, str]], value: Tuple[float, float]
+    ) -> Iterator[str]:
+        yield from super()._render_value(labels, value[0])
+
+
+class Histogram(Metric):
+    """Гистограмма: количество наблюдений в интервалах buckets (накопительно),
+    их сумма и количество.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Tuple[float, ...],
+        labelnames: Tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Учитывает наблюдение value с метками labels."""
+
+        key = self._get_key(labels)
+        # Индекс первого интервала, верхняя граница которого не меньше value
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def _copy_value(self, value: Tuple[List[int], float]) -> Tuple[List[int], float]:
+        return list(value[0]), value[1]
+
+    def _merge_value(
+        self, value: Tuple[List[int], float], other: Tuple[List[int], float]
+    ) -> Tuple[List[int], float]:
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def _render_value(
+        self, labels: List[Tuple[str, str]], value: Tuple[List[int], float]
+    ) -> Iterator[str]:
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            bucket_labels = _format_labels(labels + [("le", _format_number(bound))])
+            yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(labels)} {_format_number(total)}"
+        yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    """Возвращает запись меток метрики ({name="value",...})."""
+
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels)
+        + "}"
+    )
+
+
+def _escape_label_value(value: str) -> str:
+    """Экранирует значение метки (обратная косая черта, кавычки, перевод строки)."""
+
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    """Возвращает запись числа в текстовом формате Prometheus."""
+
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+http_request_duration = Histogram(
+    "gem_deals_http_request_duration_seconds",
+    "Время обработки HTTP-запроса.",
+    DURATION_BUCKETS,
+    ("view", "method", "status"),
+)
+http_request_db_queries = Histogram(
+    "gem_deals_http_request_db_queries",
+    "Количество запросов к БД при обработке HTTP-запроса.",
+    DB_QUERIES_BUCKETS,
+    ("view",),
+)
+http_request_db_duration = Histogram(
+    "gem_deals_http_request_db_duration_seconds",
+    "Время выполнения запросов к БД при обработке HTTP-запроса.",
+    DURATION_BUCKETS,
+    ("view",),
+)
+http_request_serialization_duration = Histogram(
+    "gem_deals_http_request_serialization_duration_seconds",
+    "Время сериализации ответов в JSON при обработке HTTP-запроса.",
+    DURATION_BUCKETS,
+    ("view",),
+)
+payload_cache_lookup_duration = Histogram(
+    "gem_deals_payload_cache_lookup_duration_seconds",
+    "Время получения ответа со списком клиентов по результату обращения к кэшу "
+    "(l1_hit - из памяти процесса, l2_hit - из общего кэша, miss - сформирован "
+    "заново).",
+    DURATION_BUCKETS,
+    ("outcome",),
+)
+ingest_jobs = Counter(
+    "gem_deals_ingest_jobs_total",
+    "Количество выполненных задач загрузки сделок.",
+    ("mode", "status"),
+)
+ingest_rows = Counter(
+    "gem_deals_ingest_rows_total",
+    "Количество прочитанных (parsed) и сохранённых (written) строк задач загрузки.",
+    ("stage",),
+)
+ingest_phase_duration = Histogram(
+    "gem_deals_ingest_phase_duration_seconds",
+    "Длительность этапов задач загрузки сделок.",
+    INGEST_DURATION_BUCKETS,
+    ("phase",),
+)
+ingest_rows_per_second = Gauge(
+    "gem_deals_ingest_last_rows_per_second",
+    "Скорость сохранения сделок (строк в секунду) последней успешной задачей загрузки.",
+)
+
+METRICS = [
+    http_request_duration,
+    http_request_db_queries,
+    http_request_db_duration,
+    http_request_serialization_duration,
+    payload_cache_lookup_duration,
+    ingest_jobs,
+    ingest_rows,
+    ingest_phase_duration,
+    ingest_rows_per_second,
+]
+
+# Время (time.monotonic()) последней записи метрик процесса в общий каталог
+_last_dump = 0.0
+# PID процесса и имя его файла метрик: имя уникально, т.к. PID завершившегося
+# процесса может достаться новому (например, после перезапуска контейнера)
+_dump_file: Tuple[int, str] = (0, "")
+_dump_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Показатели обрабатываемого HTTP-запроса: количество и время запросов к БД,
+    результаты и время обращений к кэшу ответов и время сериализации ответов в JSON.
+    """
+
+    def __init__(self) -> None:
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache_outcomes: List[str] = []
+        self.cache_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+    def get_server_timing(self, seconds: float) -> str:
+        """Возвращает значение заголовка Server-Timing (длительности в миллисекундах).
+        Args:
+            seconds (float): Время обработки запроса.
+        Returns:
+            str: Значение заголовка.
+        """
+
+        metrics = [
+            f"total;dur={seconds * 1000:.3f}",
+            f'db;dur={self.db_seconds * 1000:.3f};desc="{self.db_queries} queries"',
+        ]
+        if self.cache_outcomes:
+            metrics.append(
+                f"cache;dur={self.cache_seconds * 1000:.3f};"
+                f'desc="{",".join(self.cache_outcomes)}"'
+            )
+        metrics.append(f"serialization;dur={self.serialization_seconds * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+_request_metrics: ContextVar[RequestMetrics | None] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+def start_request_metrics() -> Tuple[RequestMetrics, Any]:
+    """Начинает сбор показателей HTTP-запроса в текущем контексте.
+    Args:
+    Returns:
+        Tuple[RequestMetrics, Any]: Показатели запроса и маркер для
+        finish_request_metrics.
+    """
+
+    request_metrics = RequestMetrics()
+    return request_metrics, _request_metrics.set(request_metrics)
+
+
+def finish_request_metrics(token: Any) -> None:
+    """Завершает сбор показателей HTTP-запроса, начатый start_request_metrics."""
+
+    _request_metrics.reset(token)
+
+
+def record_db_query(execute, sql, params, many, context):
+    """Обёртка выполнения запросов к БД (см. connection.execute_wrapper), учитывающая
+    количество и время запросов в показателях обрабатываемого HTTP-запроса.
+    Показатели берутся из контекста, поэтому учитываются и запросы асинхронных
+    представлений, выполняемые в другом потоке (sync_to_async копирует контекст).
+    """
+
+    request_metrics = _request_metrics.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.db_queries += 1
+        request_metrics.db_seconds += time.perf_counter() - started
+
+
+def install_db_query_wrapper(sender, connection, **kwargs) -> None:
+    """Обработчик сигнала connection_created: добавляет record_db_query
+    к обёрткам выполнения запросов соединения с БД."""
+
+    if record_db_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_db_query)
+
+
+def observe_request(
+    view: str, method: str, status: int, request_metrics: RequestMetrics, seconds: float
+) -> None:
+    """Учитывает показатели обработанного HTTP-запроса в гистограммах.
+    Args:
+        view (str): Название представления (метки с ограниченным набором значений).
+        method (str): HTTP-метод запроса.
+        status (int): Статус ответа.
+        request_metrics (RequestMetrics): Показатели запроса.
+        seconds (float): Время обработки запроса.
+    Returns:
+    """
+
+    http_request_duration.observe(seconds, view=view, method=method, status=status)
+    http_request_db_queries.observe(request_metrics.db_queries, view=view)
+    http_request_db_duration.observe(request_metrics.db_seconds, view=view)
+    http_request_serialization_duration.observe(
+        request_metrics.serialization_seconds, view=view
+    )
+    dump_metrics()
+
+
+def record_cache_lookup(outcome: str, seconds: float) -> None:
+    """Учитывает обращение к кэшу ответов с результатом outcome длительностью seconds."""
+
+    payload_cache_lookup_duration.observe(seconds, outcome=outcome)
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.cache_outcomes.append(outcome)
+        request_metrics.cache_seconds += seconds
+
+
+def record_serialization(seconds: float) -> None:
+    """Учитывает время сериализации ответа в обрабатываемом HTTP-запросе."""
+
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.serialization_seconds += seconds
+
+
+def observe_ingest_job(
+    mode: str,
+    status: str,
+    rows_parsed: int,
+    rows_written: int,
+    phase_seconds: Dict[str, float],
+) -> None:
+    """Учитывает выполненную задачу загрузки сделок.
+    Args:
+        mode (str): Режим загрузки.
+        status (str): Итоговый статус задачи.
+        rows_parsed (int): Количество прочитанных строк.
+        rows_written (int): Количество сохранённых строк.
+        phase_seconds (Dict[str, float]): Длительность этапов задачи (total - всей задачи).
+    Returns:
+    """
+
+    ingest_jobs.inc(mode=mode, status=status)
+    ingest_rows.inc(rows_parsed, stage="parsed")
+    ingest_rows.inc(rows_written, stage="written")
+    for phase, seconds in phase_seconds.items():
+        ingest_phase_duration.observe(seconds, phase=phase)
+    if rows_written and phase_seconds.get("total"):
+        ingest_rows_per_second.set(rows_written / phase_seconds["total"])
+    dump_metrics(force=True)
+
+
+def dump_metrics(force: bool = False) -> None:
+    """Записывает значения метрик процесса в файл в settings.METRICS_MULTIPROCESS_DIR
+    (не чаще раза в settings.METRICS_DUMP_INTERVAL_SECONDS, если не force).
+    Файлы завершившихся процессов не удаляются: суммарные счётчики не уменьшаются.
+    Args:
+        force (bool): Записать независимо от времени предыдущей записи.
+    Returns:
+    """
+
+    global _last_dump, _dump_file
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_dump < settings.METRICS_DUMP_INTERVAL_SECONDS:
+        return
+    with _dump_lock:
+        _last_dump = now
+        content = json.dumps(
+            {
+                metric.name: [[key, value] for key, value in metric.snapshot().items()]
+                for metric in METRICS
+            }
+        )
+        if _dump_file[0] != os.getpid():
+            _dump_file = (os.getpid(), f"metrics-{os.getpid()}-{uuid.uuid4().hex}")
+        path = Path(directory) / f"{_dump_file[1]}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_text(content, encoding="utf-8")
+        os.replace(temporary_path, path)
+
+
+def _collect_metrics() -> List[Dict[Tuple[str, ...], Any]]:
+    """Возвращает значения метрик (в порядке METRICS), просуммированные
+    по файлам всех процессов в settings.METRICS_MULTIPROCESS_DIR."""
+
+    dump_metrics(force=True)
+    collected: List[Dict[Tuple[str, ...], Any]] = [{} for _ in METRICS]
+    for path in sorted(Path(settings.METRICS_MULTIPROCESS_DIR).glob("metrics-*.json")):
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for metric, values in zip(METRICS, collected):
+            metric.merge(
+                values,
+                {tuple(key): value for key, value in content.get(metric.name, [])},
+            )
+    return collected
+
+
+def render_metrics() -> str:
+    """Возвращает все метрики в текстовом формате Prometheus: метрики процесса
+    или, если задан settings.METRICS_MULTIPROCESS_DIR, всех процессов.
+    """
+
+    if settings.METRICS_MULTIPROCESS_DIR:
+        collected = _collect_metrics()
+    else:
+        collected = [None] * len(METRICS)
+    lines = (
+        line
+        for metric, values in zip(METRICS, collected)
+        for line in metric.render(values)
+    )
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """Удаляет значения всех метрик."""
+
+    for metric in METRICS:
+        metric.reset()
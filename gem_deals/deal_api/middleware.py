@@ -0,0 +1,84 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from .metrics import (
+    RequestMetrics,
+    finish_request_metrics,
+    observe_request,
+    start_request_metrics,
+)
+from .permissions import is_internal_request
+
+
+class RequestMetricsMiddleware:
+    """Middleware, собирающее показатели обработки каждого запроса: время обработки,
+    количество и время запросов к БД, результаты обращений к кэшу ответов и время
+    сериализации ответа. Показатели учитываются в гистограммах метрик (см. metrics)
+    и, если включено settings.METRICS_SERVER_TIMING, передаются в заголовке
+    Server-Timing клиентам из внутренней сети (как и метрики, см. IsInternalNetwork).
+    Должно быть первым в settings.MIDDLEWARE.
+    Поддерживает как синхронную, так и асинхронную обработку запросов (под ASGI
+    асинхронные представления не переключаются на отдельный поток).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        request_metrics, token = start_request_metrics()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request_metrics(token)
+        return self.process_response(request, response, request_metrics, started)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        request_metrics, token = start_request_metrics()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request_metrics(token)
+        return self.process_response(request, response, request_metrics, started)
+
+    def process_response(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        request_metrics: RequestMetrics,
+        started: float,
+    ) -> HttpResponse:
+        """Учитывает показатели обработанного запроса и добавляет в ответ
+        заголовок Server-Timing (только для клиентов из внутренней сети).
+        Args:
+            request (HttpRequest): Запрос.
+            response (HttpResponse): Ответ.
+            request_metrics (RequestMetrics): Показатели запроса.
+            started (float): Время начала обработки запроса (time.perf_counter()).
+        Returns:
+            HttpResponse: Ответ.
+        """
+
+        seconds = time.perf_counter() - started
+        resolver_match = request.resolver_match
+        observe_request(
+            resolver_match.view_name if resolver_match else "unresolved",
+            request.method,
+            response.status_code,
+            request_metrics,
+            seconds,
+        )
+        if settings.METRICS_SERVER_TIMING and is_internal_request(request):
+            response["Server-Timing"] = request_metrics.get_server_timing(seconds)
+        return response
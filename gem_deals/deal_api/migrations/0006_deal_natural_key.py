@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0005_alter_deal_total"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["customer", "item", "date", "total"],
+                name="deal_api_deal_natural_key_idx",
+            ),
+        ),
+    ]
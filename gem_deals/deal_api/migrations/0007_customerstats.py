@@ -0,0 +1,76 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def fill_customer_stats(apps, schema_editor):
+    """Заполняет статистику клиентов по уже сохранённым сделкам."""
+
+    CustomerStats = apps.get_model("deal_api", "CustomerStats")
+    Deal = apps.get_model("deal_api", "Deal")
+    stats = (
+        Deal.objects.values("customer")
+        .annotate(spent_money=Sum("total"), deals_count=Count("id"))
+        .order_by()
+    )
+    CustomerStats.objects.bulk_create(
+        [
+            CustomerStats(
+                customer_id=row["customer"],
+                spent_money=row["spent_money"],
+                deals_count=row["deals_count"],
+            )
+            for row in stats.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0006_deal_natural_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "spent_money",
+                    models.BigIntegerField(verbose_name="Сумма всех сделок клиента"),
+                ),
+                (
+                    "deals_count",
+                    models.IntegerField(verbose_name="Количество сделок клиента"),
+                ),
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats",
+                        to="deal_api.customer",
+                        verbose_name="Клиент",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-spent_money"], name="deal_api_stats_spent_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_customer_stats, migrations.RunPython.noop),
+    ]
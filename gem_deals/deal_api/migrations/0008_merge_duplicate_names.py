@@ -0,0 +1,69 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:24
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def _merge_duplicates(apps, model_name, field, deal_field):
+    """Объединяет объекты model_name с одинаковым значением field: сделки дубликатов
+    переносятся на самый ранний объект, после чего дубликаты удаляются.
+    Возвращает ID объектов, к которым были перенесены сделки.
+    """
+
+    Model = apps.get_model("deal_api", model_name)
+    Deal = apps.get_model("deal_api", "Deal")
+    kept_ids = []
+    duplicates = (
+        Model.objects.values(field)
+        .annotate(kept_id=Min("id"), objects_count=Count("id"))
+        .filter(objects_count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        duplicate_ids = list(
+            Model.objects.filter(**{field: duplicate[field]})
+            .exclude(id=duplicate["kept_id"])
+            .values_list("id", flat=True)
+        )
+        Deal.objects.filter(**{f"{deal_field}__in": duplicate_ids}).update(
+            **{deal_field: duplicate["kept_id"]}
+        )
+        Model.objects.filter(id__in=duplicate_ids).delete()
+        kept_ids.append(duplicate["kept_id"])
+    return kept_ids
+
+
+def merge_duplicate_customers_and_gems(apps, schema_editor):
+    """Удаляет дубликаты клиентов и драгоценных камней (могли появиться
+    при параллельных загрузках) и пересчитывает статистику затронутых клиентов.
+    """
+
+    CustomerStats = apps.get_model("deal_api", "CustomerStats")
+    Deal = apps.get_model("deal_api", "Deal")
+    customers_ids = _merge_duplicates(apps, "Customer", "username", "customer")
+    _merge_duplicates(apps, "Gem", "name", "item")
+    stats = (
+        Deal.objects.filter(customer__in=customers_ids)
+        .values("customer")
+        .annotate(spent_money=Sum("total"), deals_count=Count("id"))
+        .order_by()
+    )
+    for row in stats:
+        CustomerStats.objects.update_or_create(
+            customer_id=row["customer"],
+            defaults={
+                "spent_money": row["spent_money"],
+                "deals_count": row["deals_count"],
+            },
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0007_customerstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_customers_and_gems, migrations.RunPython.noop
+        ),
+    ]
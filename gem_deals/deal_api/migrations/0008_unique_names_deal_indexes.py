@@ -0,0 +1,37 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Дубликаты удаляются отдельной миграцией: в PostgreSQL изменение строк
+    # и ALTER TABLE одной таблицы нельзя выполнить в одной транзакции
+    dependencies = [
+        ("deal_api", "0008_merge_duplicate_names"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customer",
+            name="username",
+            field=models.CharField(
+                max_length=255, unique=True, verbose_name="Логин покупателя"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="gem",
+            name="name",
+            field=models.CharField(
+                help_text="Строка, представляющая название драгоценного камня",
+                max_length=255,
+                unique=True,
+                verbose_name="Наименование",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["customer", "total"], name="deal_api_deal_cust_total_idx"
+            ),
+        ),
+    ]
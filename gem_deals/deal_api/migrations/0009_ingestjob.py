@@ -0,0 +1,121 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0008_unique_names_deal_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает обработки"),
+                            ("running", "Обрабатывается"),
+                            ("done", "Обработана"),
+                            ("failed", "Завершилась с ошибкой"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[
+                            ("replace", "Замена всех данных содержимым файла"),
+                            ("append", "Добавление новых сделок к уже загруженным"),
+                        ],
+                        default="replace",
+                        max_length=16,
+                        verbose_name="Режим загрузки",
+                    ),
+                ),
+                (
+                    "delimiter",
+                    models.CharField(
+                        blank=True, max_length=1, verbose_name="Разделитель полей csv"
+                    ),
+                ),
+                (
+                    "rows_parsed",
+                    models.IntegerField(default=0, verbose_name="Прочитано строк"),
+                ),
+                (
+                    "rows_written",
+                    models.IntegerField(default=0, verbose_name="Сохранено строк"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Описание ошибки")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создана"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(null=True, verbose_name="Начало обработки"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(null=True, verbose_name="Окончание обработки"),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="IngestFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file_name",
+                    models.CharField(max_length=255, verbose_name="Название файла"),
+                ),
+                (
+                    "file_path",
+                    models.CharField(
+                        max_length=1024, verbose_name="Путь до сохранённого файла"
+                    ),
+                ),
+                (
+                    "rows_parsed",
+                    models.IntegerField(default=0, verbose_name="Прочитано строк"),
+                ),
+                (
+                    "rows_written",
+                    models.IntegerField(default=0, verbose_name="Сохранено строк"),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="files",
+                        to="deal_api.ingestjob",
+                        verbose_name="Задача загрузки",
+                    ),
+                ),
+            ],
+        ),
+    ]
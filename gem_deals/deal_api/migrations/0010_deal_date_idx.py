@@ -0,0 +1,16 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0009_ingestjob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(fields=["date"], name="deal_api_deal_date_idx"),
+        ),
+    ]
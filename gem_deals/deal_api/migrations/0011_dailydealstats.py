@@ -0,0 +1,107 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_stats(apps, schema_editor):
+    """Заполняет статистику по дням по уже сохранённым сделкам."""
+
+    DailyDealStats = apps.get_model("deal_api", "DailyDealStats")
+    Deal = apps.get_model("deal_api", "Deal")
+    stats = (
+        Deal.objects.annotate(day=TruncDate("date"))
+        .values("customer", "item", "day")
+        .annotate(
+            total_sum=Sum("total"),
+            quantity_sum=Sum("quantity"),
+            deals_count=Count("id"),
+        )
+        .order_by()
+    )
+    DailyDealStats.objects.bulk_create(
+        (
+            DailyDealStats(
+                customer_id=row["customer"],
+                item_id=row["item"],
+                day=row["day"],
+                total=row["total_sum"],
+                quantity=row["quantity_sum"],
+                deals_count=row["deals_count"],
+            )
+            for row in stats.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0010_deal_date_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyDealStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                ("total", models.BigIntegerField(verbose_name="Сумма сделок за день")),
+                (
+                    "quantity",
+                    models.BigIntegerField(verbose_name="Количество камней за день"),
+                ),
+                (
+                    "deals_count",
+                    models.IntegerField(verbose_name="Количество сделок за день"),
+                ),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="deal_api.customer",
+                        verbose_name="Клиент",
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="deal_api.gem",
+                        verbose_name="Драгоценный камень",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["day", "customer", "total"],
+                        name="deal_api_daily_day_idx",
+                    ),
+                    models.Index(
+                        fields=["item", "day", "customer", "total"],
+                        name="deal_api_daily_item_day_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailydealstats",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "item", "day"), name="deal_api_daily_key"
+            ),
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
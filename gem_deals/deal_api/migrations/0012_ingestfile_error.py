@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0011_dailydealstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestfile",
+            name="error",
+            field=models.TextField(blank=True, verbose_name="Описание ошибки"),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0012_ingestfile_error"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChunkedUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "file_name",
+                    models.CharField(max_length=255, verbose_name="Название файла"),
+                ),
+                (
+                    "file_path",
+                    models.CharField(
+                        max_length=1024, verbose_name="Путь до загружаемого файла"
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[
+                            ("replace", "Замена всех данных содержимым файла"),
+                            ("append", "Добавление новых сделок к уже загруженным"),
+                        ],
+                        default="replace",
+                        max_length=16,
+                        verbose_name="Режим загрузки",
+                    ),
+                ),
+                (
+                    "delimiter",
+                    models.CharField(
+                        blank=True, max_length=1, verbose_name="Разделитель полей csv"
+                    ),
+                ),
+                (
+                    "offset",
+                    models.BigIntegerField(default=0, verbose_name="Получено байт"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создана"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Изменена"),
+                ),
+                (
+                    "job",
+                    models.OneToOneField(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="chunked_upload",
+                        to="deal_api.ingestjob",
+                        verbose_name="Задача загрузки",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0013_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DatasetGeneration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создано"),
+                ),
+                (
+                    "retired_at",
+                    models.DateTimeField(null=True, verbose_name="Заменено"),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DatasetPointer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "generation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="deal_api.datasetgeneration",
+                        verbose_name="Текущее поколение",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="datasetpointer",
+            constraint=models.CheckConstraint(
+                check=models.Q(("id", 1)), name="deal_api_dataset_pointer_singleton"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="customerstats",
+            name="customer",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stats",
+                to="deal_api.customer",
+                verbose_name="Клиент",
+            ),
+        ),
+        migrations.AddField(
+            model_name="customerstats",
+            name="generation",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="customer_stats",
+                to="deal_api.datasetgeneration",
+                verbose_name="Поколение набора сделок",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailydealstats",
+            name="generation",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="daily_stats",
+                to="deal_api.datasetgeneration",
+                verbose_name="Поколение набора сделок",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deal",
+            name="generation",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="deals",
+                to="deal_api.datasetgeneration",
+                verbose_name="Поколение набора сделок",
+            ),
+        ),
+    ]
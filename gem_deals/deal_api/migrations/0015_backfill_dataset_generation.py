@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_current_generation(apps, schema_editor):
+    """Создаёт текущее поколение набора сделок и указатель на него,
+    относит к нему уже сохранённые сделки и статистику."""
+
+    DatasetGeneration = apps.get_model("deal_api", "DatasetGeneration")
+    DatasetPointer = apps.get_model("deal_api", "DatasetPointer")
+    generation = DatasetGeneration.objects.create()
+    DatasetPointer.objects.create(id=1, generation=generation)
+    for model_name in ("Deal", "CustomerStats", "DailyDealStats"):
+        apps.get_model("deal_api", model_name).objects.update(generation=generation)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0014_dataset_generation"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_current_generation, migrations.RunPython.noop),
+    ]
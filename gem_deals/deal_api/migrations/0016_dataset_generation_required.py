@@ -0,0 +1,122 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0015_backfill_dataset_generation"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="dailydealstats",
+            name="deal_api_daily_key",
+        ),
+        migrations.RemoveIndex(
+            model_name="customerstats",
+            name="deal_api_stats_spent_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="dailydealstats",
+            name="deal_api_daily_day_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="dailydealstats",
+            name="deal_api_daily_item_day_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="deal",
+            name="deal_api_deal_natural_key_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="deal",
+            name="deal_api_deal_cust_total_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="deal",
+            name="deal_api_deal_date_idx",
+        ),
+        migrations.AlterField(
+            model_name="customerstats",
+            name="generation",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="customer_stats",
+                to="deal_api.datasetgeneration",
+                verbose_name="Поколение набора сделок",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="dailydealstats",
+            name="generation",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="daily_stats",
+                to="deal_api.datasetgeneration",
+                verbose_name="Поколение набора сделок",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="deal",
+            name="generation",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="deals",
+                to="deal_api.datasetgeneration",
+                verbose_name="Поколение набора сделок",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customerstats",
+            index=models.Index(
+                fields=["generation", "-spent_money"], name="deal_api_stats_spent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailydealstats",
+            index=models.Index(
+                fields=["generation", "day", "customer", "total"],
+                name="deal_api_daily_day_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailydealstats",
+            index=models.Index(
+                fields=["generation", "item", "day", "customer", "total"],
+                name="deal_api_daily_item_day_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["generation", "customer", "item", "date", "total"],
+                name="deal_api_deal_natural_key_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["generation", "customer", "total"],
+                name="deal_api_deal_cust_total_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["generation", "date"], name="deal_api_deal_date_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="customerstats",
+            constraint=models.UniqueConstraint(
+                fields=("generation", "customer"), name="deal_api_stats_key"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailydealstats",
+            constraint=models.UniqueConstraint(
+                fields=("generation", "customer", "item", "day"),
+                name="deal_api_daily_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0016_dataset_generation_required"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestjob",
+            name="worker",
+            field=models.CharField(
+                blank=True,
+                max_length=255,
+                verbose_name="Рабочий процесс (хост:PID), выполняющий задачу",
+            ),
+        ),
+    ]
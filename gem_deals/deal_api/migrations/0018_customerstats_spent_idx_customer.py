@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("deal_api", "0017_ingestjob_worker"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="customerstats",
+            name="deal_api_stats_spent_idx",
+        ),
+        migrations.AddIndex(
+            model_name="customerstats",
+            index=models.Index(
+                fields=["generation", "-spent_money", "customer"],
+                name="deal_api_stats_spent_idx",
+            ),
+        ),
+    ]
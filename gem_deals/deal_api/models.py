@@ -1,11 +1,58 @@
+import uuid
+
 from django.db import models
 
 
+class IngestMode(models.TextChoices):
+    """Режимы загрузки сделок из файла."""
+
+    REPLACE = "replace", "Замена всех данных содержимым файла"
+    APPEND = "append", "Добавление новых сделок к уже загруженным"
+
+
+class DatasetGeneration(models.Model):
+    """Модель для поколений набора сделок.
+    Загрузка в режиме замены сохраняет сделки и статистику в новое поколение,
+    пока запросы читают текущее (на которое ссылается DatasetPointer), после чего
+    указатель переключается на новое поколение в той же транзакции.
+    Заменённые поколения удаляются в фоне спустя settings.DATASET_RETENTION_SECONDS
+    после замены, а также периодически (см. deal_api.jobs).
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    retired_at = models.DateTimeField(null=True, verbose_name="Заменено")
+
+    def __str__(self) -> str:
+        return f"Поколение #{self.id}"
+
+
+class DatasetPointer(models.Model):
+    """Модель для указателя на текущее поколение набора сделок (единственная запись)."""
+
+    generation = models.ForeignKey(
+        DatasetGeneration,
+        on_delete=models.PROTECT,
+        related_name="+",
+        verbose_name="Текущее поколение",
+    )
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(id=1), name="deal_api_dataset_pointer_singleton"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Текущее поколение: #{self.generation_id}"
+
+
 class Gem(models.Model):
     """Модель для драгоценных камней (предмет сделки)."""
 
     name = models.CharField(
         max_length=255,
+        unique=True,
         verbose_name="Наименование",
         help_text="Строка, представляющая название драгоценного камня",
     )
@@ -17,7 +64,9 @@ class Gem(models.Model):
 class Customer(models.Model):
     """Модель для клиентов."""
 
-    username = models.CharField(max_length=255, verbose_name="Логин покупателя")
+    username = models.CharField(
+        max_length=255, unique=True, verbose_name="Логин покупателя"
+    )
     gems = models.ManyToManyField(
         Gem,
         through="Deal",
@@ -33,6 +82,12 @@ class Customer(models.Model):
 class Deal(models.Model):
     """Модель для сделок."""
 
+    generation = models.ForeignKey(
+        DatasetGeneration,
+        on_delete=models.CASCADE,
+        related_name="deals",
+        verbose_name="Поколение набора сделок",
+    )
     customer = models.ForeignKey(
         Customer,
         on_delete=models.CASCADE,
@@ -53,5 +108,209 @@ class Deal(models.Model):
         verbose_name="Дата и время регистрации сделки",
     )
 
+    class Meta:
+        indexes = [
+            # Естественный ключ сделки: при загрузке в режиме добавления уже
+            # сохранённые сделки пропускаются (в режиме замены сохраняются все
+            # строки файла, в том числе повторяющиеся)
+            models.Index(
+                fields=["generation", "customer", "item", "date", "total"],
+                name="deal_api_deal_natural_key_idx",
+            ),
+            # Покрывающий индекс для подсчёта суммы сделок клиентов.
+            # Выборка пар (клиент, камень) использует индекс естественного ключа.
+            models.Index(
+                fields=["generation", "customer", "total"],
+                name="deal_api_deal_cust_total_idx",
+            ),
+            # Отбор сделок за период
+            models.Index(fields=["generation", "date"], name="deal_api_deal_date_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.date} : {self.customer} купил {self.item} ({self.quantity} шт.). Итог:{self.total}"
+
+
+class CustomerStats(models.Model):
+    """Модель для агрегированной статистики клиентов
+    (поддерживается в актуальном состоянии при загрузке сделок).
+    """
+
+    generation = models.ForeignKey(
+        DatasetGeneration,
+        on_delete=models.CASCADE,
+        related_name="customer_stats",
+        verbose_name="Поколение набора сделок",
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="stats",
+        verbose_name="Клиент",
+    )
+    spent_money = models.BigIntegerField(verbose_name="Сумма всех сделок клиента")
+    deals_count = models.IntegerField(verbose_name="Количество сделок клиента")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["generation", "customer"], name="deal_api_stats_key"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["generation", "-spent_money", "customer"],
+                name="deal_api_stats_spent_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.customer}: {self.spent_money} ({self.deals_count} сделок)"
+
+
+class DailyDealStats(models.Model):
+    """Модель для агрегированных по дням сделок клиента с драгоценным камнем
+    (поддерживается в актуальном состоянии при загрузке сделок).
+    """
+
+    generation = models.ForeignKey(
+        DatasetGeneration,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+        verbose_name="Поколение набора сделок",
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+        verbose_name="Клиент",
+    )
+    item = models.ForeignKey(
+        Gem,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+        verbose_name="Драгоценный камень",
+    )
+    day = models.DateField(verbose_name="День")
+    total = models.BigIntegerField(verbose_name="Сумма сделок за день")
+    quantity = models.BigIntegerField(verbose_name="Количество камней за день")
+    deals_count = models.IntegerField(verbose_name="Количество сделок за день")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["generation", "customer", "item", "day"],
+                name="deal_api_daily_key",
+            ),
+        ]
+        indexes = [
+            # Покрывающие индексы для подсчёта суммы сделок клиентов за период
+            # (в том числе по одному камню)
+            models.Index(
+                fields=["generation", "day", "customer", "total"],
+                name="deal_api_daily_day_idx",
+            ),
+            models.Index(
+                fields=["generation", "item", "day", "customer", "total"],
+                name="deal_api_daily_item_day_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} : {self.customer} - {self.item}: {self.total}"
+
+
+class IngestJobStatus(models.TextChoices):
+    """Статусы задачи загрузки сделок."""
+
+    PENDING = "pending", "Ожидает обработки"
+    RUNNING = "running", "Обрабатывается"
+    DONE = "done", "Обработана"
+    FAILED = "failed", "Завершилась с ошибкой"
+
+
+class IngestJob(models.Model):
+    """Модель для задач фоновой загрузки сделок из файлов."""
+
+    status = models.CharField(
+        max_length=16,
+        choices=IngestJobStatus.choices,
+        default=IngestJobStatus.PENDING,
+        verbose_name="Статус",
+    )
+    mode = models.CharField(
+        max_length=16,
+        choices=IngestMode.choices,
+        default=IngestMode.REPLACE,
+        verbose_name="Режим загрузки",
+    )
+    delimiter = models.CharField(
+        max_length=1, blank=True, verbose_name="Разделитель полей csv"
+    )
+    rows_parsed = models.IntegerField(default=0, verbose_name="Прочитано строк")
+    rows_written = models.IntegerField(default=0, verbose_name="Сохранено строк")
+    error = models.TextField(blank=True, verbose_name="Описание ошибки")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, verbose_name="Начало обработки")
+    finished_at = models.DateTimeField(null=True, verbose_name="Окончание обработки")
+    worker = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Рабочий процесс (хост:PID), выполняющий задачу",
+    )
+
+    def __str__(self) -> str:
+        return f"Задача загрузки #{self.id} ({self.get_status_display()})"
+
+
+class IngestFile(models.Model):
+    """Модель для файлов, загружаемых в рамках задачи."""
+
+    job = models.ForeignKey(
+        IngestJob,
+        on_delete=models.CASCADE,
+        related_name="files",
+        verbose_name="Задача загрузки",
+    )
+    file_name = models.CharField(max_length=255, verbose_name="Название файла")
+    file_path = models.CharField(
+        max_length=1024, verbose_name="Путь до сохранённого файла"
+    )
+    rows_parsed = models.IntegerField(default=0, verbose_name="Прочитано строк")
+    rows_written = models.IntegerField(default=0, verbose_name="Сохранено строк")
+    error = models.TextField(blank=True, verbose_name="Описание ошибки")
+
+    def __str__(self) -> str:
+        return self.file_name
+
+
+class ChunkedUpload(models.Model):
+    """Модель для файлов, загружаемых частями (с возможностью продолжить загрузку)."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255, verbose_name="Название файла")
+    file_path = models.CharField(
+        max_length=1024, verbose_name="Путь до загружаемого файла"
+    )
+    mode = models.CharField(
+        max_length=16,
+        choices=IngestMode.choices,
+        default=IngestMode.REPLACE,
+        verbose_name="Режим загрузки",
+    )
+    delimiter = models.CharField(
+        max_length=1, blank=True, verbose_name="Разделитель полей csv"
+    )
+    offset = models.BigIntegerField(default=0, verbose_name="Получено байт")
+    job = models.OneToOneField(
+        IngestJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="chunked_upload",
+        verbose_name="Задача загрузки",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменена")
+
+    def __str__(self) -> str:
+        return f"{self.file_name} ({self.offset} байт)"
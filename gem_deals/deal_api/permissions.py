@@ -0,0 +1,29 @@
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpRequest
+from rest_framework.permissions import BasePermission
+
+
+class IsInternalNetwork(BasePermission):
+    """Разрешает запросы только с адресов из settings.METRICS_ALLOWED_NETWORKS
+    (адрес клиента nginx передаёт в REMOTE_ADDR через uwsgi_params).
+    """
+
+    message = "Доступ разрешён только из внутренней сети."
+
+    def has_permission(self, request, view) -> bool:
+        return is_internal_request(request)
+
+
+def is_internal_request(request: HttpRequest) -> bool:
+    """Проверяет, что запрос отправлен с адреса из settings.METRICS_ALLOWED_NETWORKS."""
+
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
@@ -0,0 +1,93 @@
+import time
+from typing import Any
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .metrics import record_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Рендерер JSON на основе orjson.
+    Формирует тот же JSON, что и JSONRenderer (компактный, без экранирования
+    не-ASCII символов), но в несколько раз быстрее. Если orjson не установлен,
+    запрошен JSON с отступами или изменены настройки COMPACT_JSON/UNICODE_JSON,
+    используется JSONRenderer.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None,
+    ) -> bytes:
+        """Сериализует data в JSON. Время сериализации учитывается
+        в показателях обрабатываемого запроса (см. metrics.record_serialization).
+        Args:
+            data (Any): Данные ответа.
+            accepted_media_type (str | None): Согласованный с клиентом тип содержимого.
+            renderer_context (dict | None): Контекст рендеринга.
+        Returns:
+            bytes: Тело ответа в формате JSON.
+        """
+
+        started = time.perf_counter()
+        try:
+            return self._render(data, accepted_media_type, renderer_context)
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+    def _render(
+        self,
+        data: Any,
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None,
+    ) -> bytes:
+        """Сериализует data в JSON (см. render)."""
+
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Даты сериализуются JSONEncoder'ом DRF (формат отличается от orjson)
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранирует символы, недопустимые в строках JavaScript
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    """Рендерер метрик в текстовом формате Prometheus (данные ответа - готовый текст)."""
+
+    media_type = "text/plain"
+    format = "txt"
+    charset = "utf-8"
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None,
+    ) -> bytes:
+        """Возвращает текст data в кодировке utf-8
+        (для ошибок - текст ошибки из словаря {"detail": ...})."""
+
+        if isinstance(data, dict):
+            data = data.get("detail", "")
+        return str(data).encode(self.charset)
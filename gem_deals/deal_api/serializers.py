@@ -1,6 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from .models import Gem
+from .models import ChunkedUpload, Gem, IngestFile, IngestJob
+from .services import _get_file_extension
 
 
 class GemSerializer(serializers.ModelSerializer):
@@ -11,26 +13,86 @@ class GemSerializer(serializers.ModelSerializer):
         fields = ["name"]
 
 
-class CustomerSerializer(serializers.Serializer):
-    """Сериализатор Клиентов с дополнительной информацией
-    (количество потраченных денег и список драгоценностей).
+class TopCustomersQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса списка клиентов, потративших наибольшую сумму:
+    количество клиентов, период (даты включительно) и драгоценный камень.
     """
 
-    username = serializers.CharField(max_length=255, source="customer__username")
-    spent_money = serializers.IntegerField()
-    gems = serializers.ListField(child=serializers.CharField(), allow_empty=True)
-
-
-# Если нужно, чтобы каждая драгоценность отправлялась объектом
-# gems = serializers.ListField(child=GemSerializer(), allow_empty=True)
-#  "gems": [
-#             {
-#                 "name": "Сапфир"
-#             },
-#             {
-#                 "name": "Рубин"
-#             },
-#             {
-#                 "name": "Танзанит"
-#             }
-#         ]
+    limit = serializers.IntegerField(min_value=1, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    item = serializers.CharField(max_length=255, required=False)
+
+    def validate_limit(self, value: int) -> int:
+        """Проверяет, что запрошено не больше settings.GET_ROWS_LIMIT_MAX клиентов."""
+
+        if value > settings.GET_ROWS_LIMIT_MAX:
+            raise serializers.ValidationError(
+                f"Значение должно быть не больше {settings.GET_ROWS_LIMIT_MAX}."
+            )
+        return value
+
+    def validate(self, attrs: dict) -> dict:
+        """Проверяет, что начало периода не позже его окончания."""
+
+        date_from, date_to = attrs.get("date_from"), attrs.get("date_to")
+        if date_from is not None and date_to is not None and date_from > date_to:
+            raise serializers.ValidationError(
+                "Дата начала периода (date_from) позже даты окончания (date_to)."
+            )
+        return attrs
+
+
+class IngestFileSerializer(serializers.ModelSerializer):
+    """Сериализатор файлов задачи загрузки."""
+
+    class Meta:
+        model = IngestFile
+        fields = ["file_name", "rows_parsed", "rows_written", "error"]
+
+
+class IngestJobSerializer(serializers.ModelSerializer):
+    """Сериализатор задач загрузки."""
+
+    files = IngestFileSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = IngestJob
+        fields = [
+            "id",
+            "status",
+            "mode",
+            "rows_parsed",
+            "rows_written",
+            "error",
+            "files",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """Сериализатор файлов, загружаемых частями."""
+
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            "id",
+            "file_name",
+            "mode",
+            "delimiter",
+            "offset",
+            "job",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["id", "offset", "job", "created_at", "updated_at"]
+        extra_kwargs = {"delimiter": {"trim_whitespace": False}}
+
+    def validate_file_name(self, value: str) -> str:
+        """Проверяет, что загружается csv-файл."""
+
+        if _get_file_extension(value) != ".csv":
+            raise serializers.ValidationError("Расширение файла не csv.")
+        return value
@@ -1,15 +1,40 @@
-import copy
 import csv
 import io
 import os
+import warnings
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
-from typing import Any, Dict, List
+from array import array
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from itertools import chain, islice
+from typing import Any, Dict, List, Set, Tuple, Type
 
-from django.db import transaction
-from django.db.models import Sum
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 
-from .models import Customer, Deal, Gem
+from .models import (
+    Customer,
+    CustomerStats,
+    DailyDealStats,
+    DatasetGeneration,
+    DatasetPointer,
+    Deal,
+    Gem,
+    IngestMode,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Столбцы файла со сделками
+DEAL_COLUMNS = ("customer", "item", "total", "quantity", "date")
 
 
 class BaseReader(ABC):
@@ -24,32 +49,62 @@ class BaseReader(ABC):
 class CsvReader(BaseReader):
     """Класс для обработки csv-файлов."""
 
-    def __init__(self, source_file: bytes) -> None:
+    def __init__(self, source_file: bytes, delimiter: str | None = None) -> None:
         """Инициализация объекта.
         Args:
             source_file (bytes): Файла в байтовом виде для создания экземпляра ридера.
+            delimiter (str | None): Разделитель полей; если не задан, определяется
+            автоматически по началу файла.
         Returns:
         """
-        
-        
-        self._csvfile = io.StringIO(source_file.decode("utf-8"))
+
+        content: str = source_file.decode("utf-8")
+        self._csvfile = io.StringIO(content)
         self._reader = csv.reader(
-            self._csvfile, self._get_dialect(source_file=source_file)
+            self._csvfile,
+            self._get_dialect(
+                source_file=self._get_sample(content, settings.CSV_SNIFF_SAMPLE_SIZE),
+                delimiter=delimiter,
+            ),
         )
 
-    def _get_dialect(self, source_file: bytes|str) -> csv.Dialect | None:
+    def _get_dialect(
+        self, source_file: str, delimiter: str | None = None
+    ) -> csv.Dialect | Type[csv.Dialect]:
         """Возвращает csv.Dialect для автоматического определения delimiter и escapechar.
+        Если разделитель задан явно (аргументом или settings.CSV_DELIMITER),
+        автоматическое определение диалекта не выполняется.
         Args:
-            source_file (bytes): Файла в байтовом виде для создания экземпляра ридера.
+            source_file (str): Начало файла (несколько первых строк) для определения диалекта.
+            delimiter (str | None): Разделитель полей.
         Returns:
-            csv.Dialect | None: Диалект csv или None, если невозможно определить диалект.
+            csv.Dialect | Type[csv.Dialect]: Диалект csv.
             https://docs.python.org/3/library/csv.html#dialects-and-formatting-parameters
+        Raises:
+            csv.Error: Если невозможно определить диалект.
         """
 
-        if not isinstance(source_file, str):
-            source_file = str(source_file)
-        dialect = csv.Sniffer().sniff(source_file, delimiters=";,|")
-        return dialect
+        delimiter = delimiter or settings.CSV_DELIMITER
+        if delimiter:
+            return type("CsvDialect", (csv.excel,), {"delimiter": delimiter})
+        return csv.Sniffer().sniff(source_file, delimiters=";,|")
+
+    @staticmethod
+    def _get_sample(content: str, sample_size: int) -> str:
+        """Возвращает начало файла объёмом не более sample_size символов,
+        состоящее только из целых строк (если в нём есть хотя бы одна целая строка).
+        Args:
+            content (str): Содержимое файла.
+            sample_size (int): Максимальный объём (в символах).
+        Returns:
+            str: Начало файла.
+        """
+
+        if len(content) <= sample_size:
+            return content
+        sample = content[:sample_size]
+        last_line_end = max(sample.rfind("\n"), sample.rfind("\r"))
+        return sample[: last_line_end + 1] if last_line_end > 0 else sample
 
     def get_reader(self) -> csv.DictReader:
         """Возвращает _csv.reader из которого можно получить доступ к csv.DictReader."""
@@ -57,40 +112,415 @@ class CsvReader(BaseReader):
         return self._reader
 
 
+class StreamingCsvReader(CsvReader):
+    """Класс для потоковой обработки csv-файлов.
+    Файл читается и декодируется по частям, поэтому в памяти никогда
+    не находится его полное содержимое.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        delimiter: str | None = None,
+        encoding: str = "utf-8",
+    ) -> None:
+        """Инициализация объекта.
+        Args:
+            chunks (Iterable[bytes]): Части файла в байтовом виде (например, UploadedFile.chunks()).
+            delimiter (str | None): Разделитель полей; если не задан, определяется
+            автоматически по началу файла.
+            encoding (str): Кодировка файла.
+        Returns:
+        """
+
+        self._csvfile = io.TextIOWrapper(
+            io.BufferedReader(_ChunksStream(chunks)), encoding=encoding, newline=""
+        )
+        head: List[str] = self._read_head(settings.CSV_SNIFF_SAMPLE_SIZE)
+        self._reader = csv.reader(
+            chain(head, self._csvfile),
+            self._get_dialect(source_file="".join(head), delimiter=delimiter),
+        )
+
+    def _read_head(self, sample_size: int) -> List[str]:
+        """Читает целые строки из начала файла, пока их суммарный объём меньше sample_size.
+        Args:
+            sample_size (int): Объём начала файла (в символах).
+        Returns:
+            List[str]: Прочитанные строки.
+        """
+
+        head: List[str] = []
+        size = 0
+        while size < sample_size:
+            line = self._csvfile.readline()
+            if not line:
+                break
+            head.append(line)
+            size += len(line)
+        return head
+
+
+class _ChunksStream(io.RawIOBase):
+    """Файлоподобный объект (только чтение) поверх последовательности частей файла."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._chunk = b""
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        while self._position >= len(self._chunk):
+            self._chunk = next(self._chunks, b"")
+            self._position = 0
+            if not self._chunk:
+                return 0
+        size = min(len(buffer), len(self._chunk) - self._position)
+        buffer[:size] = self._chunk[self._position : self._position + size]
+        self._position += size
+        return size
+
+
+class NameDictionary:
+    """Словарь имён (логинов клиентов или названий камней): каждое различное имя
+    хранится один раз и получает номер в порядке первого появления.
+    Один словарь используется всеми блоками файла, поэтому номера сквозные,
+    а имена разрешаются в id БД один раз на файл (см. save_deal_columns_in_db).
+    """
+
+    __slots__ = ("names", "_codes")
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def encode(self, values: Iterable[str]) -> Sequence[int]:
+        """Кодирует значения номерами имён, добавляя в словарь новые имена.
+        Args:
+            values (Iterable[str]): Значения.
+        Returns:
+            Sequence[int]: Номера значений.
+        """
+
+        values = list(values)
+        codes = self._codes
+        for name in dict.fromkeys(values):
+            if name not in codes:
+                codes[name] = len(self.names)
+                self.names.append(name)
+        return array("i", map(codes.__getitem__, values))
+
+    def __getstate__(self) -> List[str]:
+        # Номера восстанавливаются по списку имён, словарь не передаётся между процессами
+        return self.names
+
+    def __setstate__(self, names: List[str]) -> None:
+        self.names = names
+        self._codes = {name: code for code, name in enumerate(names)}
+
+
+class DealColumns:
+    """Блок сделок в колоночном представлении.
+    Логины клиентов и названия камней хранятся в словарях имён (customers, items),
+    общих для всех блоков файла, а для каждой сделки - номер имени в словаре
+    (customer_codes, item_codes).
+    Сумма и количество хранятся в массивах int64, дата - в массиве datetime64 (UTC),
+    если установлен NumPy, иначе - в array.array и списке datetime.
+    """
+
+    __slots__ = (
+        "customers",
+        "customer_codes",
+        "items",
+        "item_codes",
+        "total",
+        "quantity",
+        "date",
+    )
+
+    def __init__(
+        self,
+        customers: NameDictionary,
+        customer_codes: Sequence[int],
+        items: NameDictionary,
+        item_codes: Sequence[int],
+        total: Sequence[int],
+        quantity: Sequence[int],
+        date: Sequence[Any],
+    ) -> None:
+        self.customers = customers
+        self.customer_codes = customer_codes
+        self.items = items
+        self.item_codes = item_codes
+        self.total = total
+        self.quantity = quantity
+        self.date = date
+
+    def __len__(self) -> int:
+        return len(self.total)
+
+    @classmethod
+    def from_rows(
+        cls,
+        header: List[str],
+        rows: List[List[str]],
+        customers: NameDictionary | None = None,
+        items: NameDictionary | None = None,
+        first_row: int = 2,
+    ) -> "DealColumns":
+        """Создаёт блок сделок из строк csv-файла (пустые строки пропускаются,
+        блок из одних пустых строк - пустой).
+        Args:
+            header (List[str]): Заголовок файла.
+            rows (List[List[str]]): Строки файла.
+            customers (NameDictionary | None): Словарь логинов клиентов (по умолчанию - новый).
+            items (NameDictionary | None): Словарь названий камней (по умолчанию - новый).
+            first_row (int): Номер первой из строк rows в файле (для сообщений об ошибках,
+            заголовок - строка 1).
+        Returns:
+            DealColumns: Блок сделок.
+        Raises:
+            csv.Error: Если в строках нет нужного столбца, количество значений строки
+            не совпадает с количеством столбцов заголовка или значение некорректно.
+        """
+
+        values = []
+        for row_number, row in enumerate(rows, first_row):
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise csv.Error(
+                    f"Строка {row_number}: количество значений ({len(row)}) "
+                    f"не совпадает с количеством столбцов ({len(header)})."
+                )
+            values.append(row)
+        columns = (
+            dict(zip(header, zip(*values))) if values else dict.fromkeys(header, ())
+        )
+        return cls.from_columns(columns, customers, items)
+
+    @classmethod
+    def from_dicts(
+        cls,
+        deals: List[Dict[str, str]],
+        customers: NameDictionary | None = None,
+        items: NameDictionary | None = None,
+    ) -> "DealColumns":
+        """Создаёт блок сделок из словарей (в формате get_data_from_reader).
+        Args:
+            deals (List[Dict[str, str]]): Сделки.
+            customers (NameDictionary | None): Словарь логинов клиентов (по умолчанию - новый).
+            items (NameDictionary | None): Словарь названий камней (по умолчанию - новый).
+        Returns:
+            DealColumns: Блок сделок.
+        Raises:
+            csv.Error: Если в сделках нет нужного поля или значение некорректно.
+        """
+
+        try:
+            columns = {name: [deal[name] for deal in deals] for name in DEAL_COLUMNS}
+        except KeyError as error:
+            raise csv.Error(f"Отсутствует столбец {error}.") from error
+        return cls.from_columns(columns, customers, items)
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: Dict[str, Sequence[str]],
+        customers: NameDictionary | None = None,
+        items: NameDictionary | None = None,
+    ) -> "DealColumns":
+        """Создаёт блок сделок из столбцов со строковыми значениями.
+        Args:
+            columns (Dict[str, Sequence[str]]): Столбцы (название -> значения).
+            customers (NameDictionary | None): Словарь логинов клиентов (по умолчанию - новый).
+            items (NameDictionary | None): Словарь названий камней (по умолчанию - новый).
+        Returns:
+            DealColumns: Блок сделок.
+        Raises:
+            csv.Error: Если нужного столбца нет или значение некорректно.
+        """
+
+        missing = [name for name in DEAL_COLUMNS if name not in columns]
+        if missing:
+            raise csv.Error(f"Отсутствуют столбцы: {', '.join(missing)}.")
+        customers = customers if customers is not None else NameDictionary()
+        items = items if items is not None else NameDictionary()
+        try:
+            return cls(
+                customers,
+                customers.encode(columns["customer"]),
+                items,
+                items.encode(columns["item"]),
+                _to_int_array(columns["total"]),
+                _to_int_array(columns["quantity"]),
+                _to_datetime_array(columns["date"]),
+            )
+        except ValueError as error:
+            raise csv.Error(f"Некорректное значение: {error}") from error
+
+    def get_dates(self) -> List[datetime]:
+        """Возвращает даты сделок блока (с часовым поясом)."""
+
+        if np is not None and isinstance(self.date, np.ndarray):
+            return [
+                value.replace(tzinfo=dt_timezone.utc) for value in self.date.tolist()
+            ]
+        return self.date
+
+    def get_iso_dates(self) -> List[str]:
+        """Возвращает даты сделок блока в формате ISO 8601 (с часовым поясом)."""
+
+        if np is not None and isinstance(self.date, np.ndarray):
+            return np.datetime_as_string(self.date, unit="us", timezone="UTC").tolist()
+        return [value.isoformat() for value in self.date]
+
+
+def _to_int_array(values: Sequence[str]) -> Sequence[int]:
+    """Преобразует строковые значения в массив целых чисел.
+    Raises:
+        ValueError: Если значение не является целым числом.
+    """
+
+    if np is not None:
+        return np.fromiter(map(int, values), np.int64, len(values))
+    return array("q", map(int, values))
+
+
+def _to_datetime_array(values: Sequence[str]) -> Sequence[Any]:
+    """Преобразует строковые значения дат (ISO 8601) в массив дат.
+    Дата без часового пояса считается датой в часовом поясе проекта
+    (как при сохранении в БД). NumPy используется, только если это UTC.
+    Raises:
+        ValueError: Если значение не является датой.
+    """
+
+    if np is not None and settings.TIME_ZONE == "UTC":
+        with warnings.catch_warnings():
+            # Даты с часовым поясом NumPy переводит в UTC с предупреждением
+            warnings.simplefilter("ignore")
+            return np.asarray(values, dtype="datetime64[us]")
+    default_timezone = timezone.get_default_timezone()
+    dates = [datetime.fromisoformat(value) for value in values]
+    return [
+        value if value.tzinfo else value.replace(tzinfo=default_timezone)
+        for value in dates
+    ]
+
+
 def get_data_from_file(
-    filename: str, file_content: bytes
+    filename: str, file_content: bytes, delimiter: str | None = None
 ) -> List[Dict[str, str]] | None:
     """Возвращает содержимое файла.
     Args:
         filename (str): Название файла.
         file_content (bytes): Файла в байтовом виде.
+        delimiter (str | None): Разделитель полей (если не задан, определяется автоматически).
     Returns:
         List[Dict[str, str]] | None: Содержимое файла или None, если файл невозможно обработать.
     """
     data = None
     reader_descriptor: BaseReader | None = _get_reader_file_descriptor(
-        filename, file_content
+        filename, file_content, delimiter
     )
     if reader_descriptor:
         data = get_data_from_reader(reader_descriptor)
     return data
 
 
-def _get_reader_file_descriptor(filename: str, file: bytes) -> BaseReader | None:
+def get_data_stream_from_file(
+    filename: str, chunks: Iterable[bytes], delimiter: str | None = None
+) -> Iterator[Dict[str, str]] | None:
+    """Возвращает содержимое файла в виде генератора строк (файл читается по частям).
+    Args:
+        filename (str): Название файла.
+        chunks (Iterable[bytes]): Части файла в байтовом виде.
+        delimiter (str | None): Разделитель полей (если не задан, определяется автоматически).
+    Returns:
+        Iterator[Dict[str, str]] | None: Строки файла или None, если файл невозможно
+        обработать или в нём нет ни одной сделки.
+    """
+
+    reader_descriptor: BaseReader | None = _get_reader_file_descriptor(
+        filename, chunks, delimiter
+    )
+    if not reader_descriptor:
+        return None
+    return _get_non_empty_stream(iter_data_from_reader(reader_descriptor))
+
+
+def get_deal_columns_stream_from_file(
+    filename: str,
+    chunks: Iterable[bytes],
+    delimiter: str | None = None,
+    block_size: int | None = None,
+) -> Iterator[DealColumns] | None:
+    """Возвращает содержимое файла в виде генератора блоков сделок в колоночном
+    представлении (файл читается по частям).
+    Args:
+        filename (str): Название файла.
+        chunks (Iterable[bytes]): Части файла в байтовом виде.
+        delimiter (str | None): Разделитель полей (если не задан, определяется автоматически).
+        block_size (int | None): Количество строк в блоке (по умолчанию settings.CSV_BLOCK_SIZE).
+    Returns:
+        Iterator[DealColumns] | None: Блоки сделок или None, если файл невозможно
+        обработать или в нём нет ни одной сделки.
+    """
+
+    reader_descriptor: BaseReader | None = _get_reader_file_descriptor(
+        filename, chunks, delimiter
+    )
+    if not reader_descriptor:
+        return None
+    return _get_non_empty_stream(
+        iter_deal_columns_from_reader(reader_descriptor, block_size)
+    )
+
+
+def _get_non_empty_stream(data: Iterator) -> Iterator | None:
+    """Возвращает data, если первый элемент удаётся прочитать.
+    Args:
+        data (Iterator): Генератор строк (блоков) файла.
+    Returns:
+        Iterator | None: Генератор или None, если он пуст либо файл невозможно обработать.
+    """
+
+    try:
+        first = next(data, None)
+    except (csv.Error, UnicodeDecodeError):
+        return None
+    if first is None:
+        return None
+    return chain([first], data)
+
+
+def _get_reader_file_descriptor(
+    filename: str, file: bytes | Iterable[bytes], delimiter: str | None = None
+) -> BaseReader | None:
     """Возвращает соответствующий формату файла ридер.
     Args:
         filename (str): Название файла.
-        file_content (bytes): Файла в байтовом виде.
+        file (bytes | Iterable[bytes]): Файл в байтовом виде или последовательность его частей.
+        delimiter (str | None): Разделитель полей (если не задан, определяется автоматически).
     Returns:
         BaseReader | None: Ридер для файла или None, если файл невозможно обработать.
     """
 
     reader_descriptor = None
-    file_extension:str = _get_file_extension(filename)
+    file_extension: str = _get_file_extension(filename)
     if file_extension == ".csv":
         try:
-            reader_descriptor = CsvReader(source_file=file)
-        except csv.Error:
+            if isinstance(file, bytes):
+                reader_descriptor = CsvReader(source_file=file, delimiter=delimiter)
+            else:
+                reader_descriptor = StreamingCsvReader(chunks=file, delimiter=delimiter)
+        except (csv.Error, UnicodeDecodeError):
             return None
     return reader_descriptor
 
@@ -115,44 +545,809 @@ def get_data_from_reader(reader_descriptor: BaseReader) -> List[Dict[str, str]]
         List[Dict[str, str]] | None: Данные из файла или None, если файл невозможно обработать.
     """
 
+    if not reader_descriptor.get_reader():
+        return None
+    return list(iter_data_from_reader(reader_descriptor))
+
+
+def iter_data_from_reader(reader_descriptor: BaseReader) -> Iterator[Dict[str, str]]:
+    """Построчно возвращает данные из загруженного файла.
+    Args:
+        reader_descriptor (BaseReader): Ридер соответствующий формату файла.
+    Returns:
+        Iterator[Dict[str, str]]: Генератор строк файла.
+    """
+
     reader = reader_descriptor.get_reader()
     if not reader:
-        return None
-    data = []
-    header: List[str] = next(reader)
+        return
+    header: List[str] | None = next(reader, None)
+    if header is None:
+        return
     for row in reader:
-        data.append({key: value for key, value in zip(header, row)})
-    return data
+        yield {key: value for key, value in zip(header, row)}
 
 
-def save_data_in_db(deals: List[Dict[str, str]]) -> None:
-    """Сохраняет данные из списка deals в базу данных.
+def iter_deal_columns_from_reader(
+    reader_descriptor: BaseReader, block_size: int | None = None
+) -> Iterator[DealColumns]:
+    """Поблочно возвращает данные из загруженного файла в колоночном представлении.
     Args:
-        deals (List[Dict[str, str]]): Список с информацией о сделках.
+        reader_descriptor (BaseReader): Ридер соответствующий формату файла.
+        block_size (int | None): Количество строк в блоке (по умолчанию settings.CSV_BLOCK_SIZE).
     Returns:
+        Iterator[DealColumns]: Генератор блоков сделок.
     """
+
+    block_size = block_size or settings.CSV_BLOCK_SIZE
+    reader = reader_descriptor.get_reader()
+    if not reader:
+        return
+    header: List[str] | None = next(reader, None)
+    if header is None:
+        return
+    customers, items = NameDictionary(), NameDictionary()
+    first_row = 2
+    while rows := list(islice(reader, block_size)):
+        block = DealColumns.from_rows(header, rows, customers, items, first_row)
+        first_row += len(rows)
+        if len(block):
+            yield block
+
+
+def save_data_in_db(
+    deals: Iterable[Dict[str, str]],
+    batch_size: int | None = None,
+    mode: str = IngestMode.REPLACE,
+    on_batch_saved: Callable[[int], None] | None = None,
+) -> int:
+    """Сохраняет данные из deals в базу данных пакетами
+    (каждый пакет преобразуется в блок DealColumns и сохраняется save_deal_columns_in_db).
+    Args:
+        deals (Iterable[Dict[str, str]]): Информация о сделках.
+        batch_size (int | None): Размер пакета (по умолчанию settings.DEAL_BATCH_SIZE).
+        mode (str): Режим загрузки: IngestMode.REPLACE - заменить все данные в БД,
+        IngestMode.APPEND - добавить сделки к уже сохранённым.
+        on_batch_saved (Callable[[int], None] | None): Вызывается после сохранения
+        каждого пакета с количеством сделок в нём (для отслеживания прогресса).
+    Returns:
+        int: Количество обработанных сделок.
+    Raises:
+        csv.Error: Если в сделках нет нужного поля или значение некорректно.
+    """
+
+    batch_size = batch_size or settings.DEAL_BATCH_SIZE
+    deals_iterator = iter(deals)
+    customers, items = NameDictionary(), NameDictionary()
+    blocks = (
+        DealColumns.from_dicts(batch, customers, items)
+        for batch in iter(lambda: list(islice(deals_iterator, batch_size)), [])
+    )
+    return save_deal_columns_in_db(blocks, batch_size, mode, on_batch_saved)
+
+
+def save_deal_columns_in_db(
+    blocks: Iterable[DealColumns],
+    batch_size: int | None = None,
+    mode: str = IngestMode.REPLACE,
+    on_batch_saved: Callable[[int], None] | None = None,
+) -> int:
+    """Сохраняет блоки сделок в базу данных одной транзакцией загрузчиком,
+    соответствующим СУБД (см. _get_deal_loader).
+    В режиме добавления сделки, уже сохранённые в БД или повторяющиеся в блоках
+    (совпадают клиент, камень, дата и сумма), пропускаются; в режиме замены
+    сохраняются все сделки блоков.
+    После сохранения обновляется статистика: в режиме добавления к статистике
+    клиентов прибавляются суммы и количество новых сделок (см. add_customer_stats),
+    статистика затронутых дней пересчитывается.
+    В режиме замены сделки и статистика сохраняются в новое поколение набора сделок,
+    а текущее поколение не изменяется: запросы читают его, не дожидаясь окончания
+    загрузки. В конце транзакции указатель переключается на новое поколение
+    (см. publish_generation), прежнее удаляется позже (см. delete_retired_generations).
+    Загрузки выполняются по одной (блокируется указатель на текущее поколение).
+    Args:
+        blocks (Iterable[DealColumns]): Блоки сделок.
+        batch_size (int | None): Размер пакета вставки (по умолчанию settings.DEAL_BATCH_SIZE).
+        mode (str): Режим загрузки: IngestMode.REPLACE - заменить все данные в БД,
+        IngestMode.APPEND - добавить сделки к уже сохранённым.
+        on_batch_saved (Callable[[int], None] | None): Вызывается после сохранения
+        каждого блока с количеством сделок в нём (для отслеживания прогресса).
+    Returns:
+        int: Количество обработанных сделок.
+    """
+
+    batch_size = batch_size or settings.DEAL_BATCH_SIZE
+    days: Set[date] = set()
+    saved = 0
     with transaction.atomic():
-        _clear_db_data()
+        pointer = _lock_dataset_pointer()
+        if mode == IngestMode.REPLACE:
+            generation = DatasetGeneration.objects.create().id
+        else:
+            generation = pointer.generation_id
+        loader = _get_deal_loader(
+            batch_size, generation, deduplicate=mode == IngestMode.APPEND
+        )
+        for block in blocks:
+            loader.save_block(block)
+            if mode != IngestMode.REPLACE:
+                days.update(
+                    timezone.localdate(deal_date) for deal_date in block.get_dates()
+                )
+            saved += len(block)
+            if on_batch_saved:
+                on_batch_saved(len(block))
+        if mode == IngestMode.REPLACE:
+            refresh_customer_stats(None, batch_size, generation)
+            refresh_daily_stats(None, batch_size, generation)
+            publish_generation(pointer, generation)
+        else:
+            add_customer_stats(loader.get_customer_totals(), batch_size, generation)
+            refresh_daily_stats(days, batch_size, generation)
+    return saved
+
+
+def get_current_generation_id() -> int | None:
+    """Возвращает ID текущего поколения набора сделок.
+    Args:
+    Returns:
+        int | None: ID поколения (None, если указатель ещё не создан).
+    """
+
+    return DatasetPointer.objects.values_list("generation", flat=True).first()
+
+
+async def aget_current_generation_id() -> int | None:
+    """Асинхронный вариант get_current_generation_id."""
+
+    return await DatasetPointer.objects.values_list("generation", flat=True).afirst()
+
+
+def _lock_dataset_pointer() -> DatasetPointer:
+    """Блокирует указатель на текущее поколение набора сделок до конца транзакции
+    (запросы на чтение не блокируются). Если указателя нет (например, таблицы
+    очищены командой flush), создаются пустое текущее поколение и указатель на него.
+    Args:
+    Returns:
+        DatasetPointer: Указатель на текущее поколение.
+    """
+
+    try:
+        return DatasetPointer.objects.select_for_update().get(id=1)
+    except DatasetPointer.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return DatasetPointer.objects.create(
+                id=1, generation=DatasetGeneration.objects.create()
+            )
+    except IntegrityError:
+        # Указатель параллельно создан другой загрузкой
+        return DatasetPointer.objects.select_for_update().get(id=1)
+
+
+def publish_generation(pointer: DatasetPointer, generation: int) -> None:
+    """Делает поколение generation текущим, а прежнее текущее поколение - заменённым.
+    Вызывается в транзакции, заблокировавшей указатель (см. _lock_dataset_pointer):
+    запросы видят новое поколение после фиксации транзакции.
+    Args:
+        pointer (DatasetPointer): Заблокированный указатель на текущее поколение.
+        generation (int): ID нового поколения.
+    Returns:
+    """
+
+    DatasetGeneration.objects.filter(id=pointer.generation_id).update(
+        retired_at=timezone.now()
+    )
+    pointer.generation_id = generation
+    pointer.save(update_fields=["generation"])
+
+
+def delete_retired_generations() -> int:
+    """Удаляет поколения набора сделок, заменённые раньше, чем
+    settings.DATASET_RETENTION_SECONDS назад (вместе с их сделками и статистикой),
+    а также клиентов и драгоценные камни, не встречающиеся в оставшихся сделках.
+    Задержка позволяет завершиться запросам, начатым до замены поколения.
+    Args:
+    Returns:
+        int: Количество удалённых поколений.
+    """
+
+    retired_before = timezone.now() - timedelta(
+        seconds=settings.DATASET_RETENTION_SECONDS
+    )
+    with transaction.atomic():
+        # Загрузки не выполняются: новые сделки не ссылаются на удаляемых клиентов
+        _lock_dataset_pointer()
+        generations = DatasetGeneration.objects.filter(retired_at__lt=retired_before)
+        deleted = generations.count()
+        if not deleted:
+            return 0
+        generations.delete()
+        Customer.objects.filter(
+            ~models.Exists(Deal.objects.filter(customer=models.OuterRef("pk")))
+        ).delete()
+        Gem.objects.filter(
+            ~models.Exists(Deal.objects.filter(item=models.OuterRef("pk")))
+        ).delete()
+    return deleted
+
+
+class BaseDealLoader(ABC):
+    """Базовый класс для загрузчиков блоков сделок в БД
+    (используются save_deal_columns_in_db внутри транзакции)."""
+
+    def __init__(
+        self, batch_size: int, generation: int, deduplicate: bool = False
+    ) -> None:
+        self.batch_size = batch_size
+        self.generation = generation
+        self.deduplicate = deduplicate
+
+    @abstractmethod
+    def save_block(self, block: DealColumns) -> None:
+        """Сохраняет сделки блока в поколение набора сделок generation, создавая
+        отсутствующих в БД клиентов и драгоценные камни.
+        Если задано deduplicate, сделки, уже сохранённые в это поколение
+        или повторяющиеся в блоке (совпадают клиент, камень, дата и сумма),
+        пропускаются. Загрузки выполняются по одной (см. save_deal_columns_in_db),
+        поэтому уникальность не проверяется ограничением БД."""
+
+    @abstractmethod
+    def get_customer_totals(self) -> Dict[int, List[int]]:
+        """Возвращает сумму и количество сделок, сохранённых из всех блоков,
+        по id клиентов (пропущенные повторы не учитываются)."""
+
+
+class OrmDealLoader(BaseDealLoader):
+    """Загрузчик сделок через ORM (для любой СУБД).
+    Имена клиентов и драгоценных камней разрешаются в id один раз для каждого словаря
+    имён: для блока запрашиваются только имена, добавленные в словарь после предыдущих
+    блоков (одним запросом), недостающие создаются через bulk_create.
+    Сделки вставляются через bulk_create прямо из столбцов блока.
+    """
+
+    def __init__(
+        self, batch_size: int, generation: int, deduplicate: bool = False
+    ) -> None:
+        super().__init__(batch_size, generation, deduplicate)
+        self.customer_ids: Dict[str, int] = {}
+        self.gem_ids: Dict[str, int] = {}
+        self.customer_totals: Dict[int, List[int]] = {}
+        # id объектов БД по номерам имён каждого из словарей имён
+        self.ids_by_dictionary: Dict[NameDictionary, List[int]] = {}
+
+    def save_block(self, block: DealColumns) -> None:
+        block_customer_ids = self._resolve_codes(
+            Customer, "username", block.customers, self.customer_ids
+        )
+        block_gem_ids = self._resolve_codes(Gem, "name", block.items, self.gem_ids)
+        deals = [
+            Deal(
+                generation_id=self.generation,
+                customer_id=block_customer_ids[customer_code],
+                item_id=block_gem_ids[item_code],
+                total=total,
+                quantity=quantity,
+                date=deal_date,
+            )
+            for customer_code, item_code, total, quantity, deal_date in zip(
+                block.customer_codes.tolist(),
+                block.item_codes.tolist(),
+                block.total.tolist(),
+                block.quantity.tolist(),
+                block.get_dates(),
+            )
+        ]
+        if self.deduplicate:
+            deals = self._exclude_saved_deals(deals)
+        Deal.objects.bulk_create(deals, batch_size=self.batch_size)
         for deal in deals:
-            customer, _ = Customer.objects.get_or_create(username=deal["customer"])
-            gem, _ = Gem.objects.get_or_create(name=deal["item"])
-            Deal.objects.create(
-                customer=customer,
-                item=gem,
-                total=deal["total"],
-                quantity=deal["quantity"],
-                date=deal["date"],
+            totals = self.customer_totals.setdefault(deal.customer_id, [0, 0])
+            totals[0] += deal.total
+            totals[1] += 1
+
+    def get_customer_totals(self) -> Dict[int, List[int]]:
+        return self.customer_totals
+
+    def _exclude_saved_deals(self, deals: List[Deal]) -> List[Deal]:
+        """Возвращает сделки, которых ещё нет в поколении generation, без повторов.
+        Сохранённые сделки запрашиваются одним запросом за период дат блока.
+        Args:
+            deals (List[Deal]): Сделки блока.
+        Returns:
+            List[Deal]: Новые сделки.
+        """
+
+        if not deals:
+            return deals
+        dates = [deal.date for deal in deals]
+        saved_keys = set(
+            Deal.objects.filter(
+                generation=self.generation, date__gte=min(dates), date__lte=max(dates)
+            ).values_list("customer", "item", "date", "total")
+        )
+        new_deals = []
+        for deal in deals:
+            key = (deal.customer_id, deal.item_id, deal.date, deal.total)
+            if key not in saved_keys:
+                saved_keys.add(key)
+                new_deals.append(deal)
+        return new_deals
+
+    def _resolve_codes(
+        self,
+        model: Type[models.Model],
+        field: str,
+        dictionary: NameDictionary,
+        known_ids: Dict[str, int],
+    ) -> List[int]:
+        """Возвращает id объектов model по номерам имён словаря dictionary,
+        разрешая только имена, добавленные в словарь после предыдущего вызова.
+        Args:
+            model (Type[models.Model]): Модель (Customer или Gem).
+            field (str): Поле модели, содержащее имя.
+            dictionary (NameDictionary): Словарь имён.
+            known_ids (Dict[str, int]): Уже разрешённые имена и их id.
+        Returns:
+            List[int]: id объектов (индекс - номер имени в словаре).
+        """
+
+        ids = self.ids_by_dictionary.setdefault(dictionary, [])
+        new_names = dictionary.names[len(ids) :]
+        if new_names:
+            _resolve_ids(model, field, new_names, known_ids)
+            ids.extend(map(known_ids.__getitem__, new_names))
+        return ids
+
+
+class CopyDealLoader(BaseDealLoader):
+    """Загрузчик сделок для PostgreSQL: блок передаётся во временную промежуточную
+    таблицу командой COPY FROM STDIN (в формате csv), после чего клиенты,
+    драгоценные камни и сделки переносятся в таблицы приложения запросами
+    INSERT ... SELECT.
+    """
+
+    staging_table = "deal_api_deal_staging"
+
+    def __init__(
+        self, batch_size: int, generation: int, deduplicate: bool = False
+    ) -> None:
+        super().__init__(batch_size, generation, deduplicate)
+        self.customer_totals: Dict[int, List[int]] = {}
+        self.staging_created = False
+
+    def save_block(self, block: DealColumns) -> None:
+        buffer = io.StringIO()
+        customers, items = block.customers.names, block.items.names
+        csv.writer(buffer).writerows(
+            zip(
+                map(customers.__getitem__, block.customer_codes),
+                map(items.__getitem__, block.item_codes),
+                block.total.tolist(),
+                block.quantity.tolist(),
+                block.get_iso_dates(),
+            )
+        )
+        buffer.seek(0)
+        staging = connection.ops.quote_name(self.staging_table)
+        with connection.cursor() as cursor:
+            if not self.staging_created:
+                self._create_staging_table(cursor)
+            cursor.copy_expert(
+                f"COPY {staging} (customer, item, total, quantity, date) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
             )
+            # Статистика для планировщика: временные таблицы не анализируются автоматически
+            cursor.execute(f"ANALYZE {staging}")
+            for statement, params in self._get_merge_statements():
+                cursor.execute(statement, params)
+            for customer_id, spent_money, deals_count in cursor.fetchall():
+                totals = self.customer_totals.setdefault(customer_id, [0, 0])
+                totals[0] += spent_money
+                totals[1] += deals_count
+            cursor.execute(f"TRUNCATE {staging}")
 
+    def get_customer_totals(self) -> Dict[int, List[int]]:
+        return self.customer_totals
+
+    def _create_staging_table(self, cursor: Any) -> None:
+        """Создаёт промежуточную таблицу (удаляется при завершении транзакции)."""
+
+        staging = connection.ops.quote_name(self.staging_table)
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {staging} ("
+            "position bigserial, customer varchar(255), item varchar(255), "
+            "total integer, quantity integer, date timestamp with time zone"
+            ") ON COMMIT DROP"
+        )
+        self.staging_created = True
+
+    def _get_merge_statements(self) -> List[Tuple[str, List[Any]]]:
+        """Возвращает запросы (с параметрами) переноса строк промежуточной таблицы
+        в таблицы приложения (последний возвращает сумму и количество вставленных
+        сделок каждого клиента).
+        Клиенты и камни создаются в порядке первого появления в блоке, как в OrmDealLoader.
+        """
 
-def _clear_db_data() -> None:
-    """Очищает содержимое базы данных
-    (объекты Deal удалятся автоматически т.к. связаны с Gem и Customer).
+        qn = connection.ops.quote_name
+        staging = qn(self.staging_table)
+        customer_table = qn(Customer._meta.db_table)
+        gem_table = qn(Gem._meta.db_table)
+        deal_table = qn(Deal._meta.db_table)
+        deal_customer = qn(Deal._meta.get_field("customer").column)
+        deal_total = qn(Deal._meta.get_field("total").column)
+        username = qn(Customer._meta.get_field("username").column)
+        name = qn(Gem._meta.get_field("name").column)
+        deal_columns = ", ".join(
+            qn(Deal._meta.get_field(field).column)
+            for field in ("generation", "customer", "item", "total", "quantity", "date")
+        )
+        deal_values = (
+            "%s, customer.id, gem.id, staging.total, staging.quantity, staging.date "
+            f"FROM {staging} staging "
+            f"JOIN {customer_table} customer ON customer.{username} = staging.customer "
+            f"JOIN {gem_table} gem ON gem.{name} = staging.item"
+        )
+        if self.deduplicate:
+            # Первая из повторяющихся в блоке сделок, если её ещё нет в поколении
+            saved = {
+                field: f"saved.{qn(Deal._meta.get_field(field).column)}"
+                for field in ("generation", "customer", "item", "date", "total")
+            }
+            deal_key = "customer.id, gem.id, staging.date, staging.total"
+            select_deals = (
+                f"SELECT DISTINCT ON ({deal_key}) {deal_values} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {deal_table} saved "
+                f"WHERE {saved['generation']} = %s "
+                f"AND {saved['customer']} = customer.id AND {saved['item']} = gem.id "
+                f"AND {saved['date']} = staging.date "
+                f"AND {saved['total']} = staging.total) "
+                f"ORDER BY {deal_key}, staging.position"
+            )
+            select_deals_params = [self.generation, self.generation]
+        else:
+            select_deals = f"SELECT {deal_values}"
+            select_deals_params = [self.generation]
+        return [
+            (
+                f"INSERT INTO {customer_table} ({username}) "
+                f"SELECT customer FROM {staging} GROUP BY customer "
+                "ORDER BY MIN(position) ON CONFLICT DO NOTHING",
+                [],
+            ),
+            (
+                f"INSERT INTO {gem_table} ({name}) "
+                f"SELECT item FROM {staging} GROUP BY item "
+                "ORDER BY MIN(position) ON CONFLICT DO NOTHING",
+                [],
+            ),
+            (
+                f"WITH inserted AS (INSERT INTO {deal_table} ({deal_columns}) "
+                f"{select_deals} RETURNING {deal_customer}, {deal_total}) "
+                f"SELECT {deal_customer}, SUM({deal_total}), COUNT(*) FROM inserted "
+                f"GROUP BY {deal_customer}",
+                select_deals_params,
+            ),
+        ]
+
+
+def _get_deal_loader(
+    batch_size: int, generation: int, deduplicate: bool = False
+) -> BaseDealLoader:
+    """Возвращает загрузчик сделок для СУБД текущего подключения:
+    для PostgreSQL - CopyDealLoader (если не отключён settings.INGEST_COPY_LOADER),
+    для остальных СУБД - OrmDealLoader.
+    Args:
+        batch_size (int): Размер пакета вставки.
+        generation (int): ID поколения набора сделок, в которое сохраняются сделки.
+        deduplicate (bool): Пропускать уже сохранённые и повторяющиеся сделки.
+    Returns:
+        BaseDealLoader: Загрузчик сделок.
+    """
+
+    if connection.vendor == "postgresql" and settings.INGEST_COPY_LOADER:
+        return CopyDealLoader(batch_size, generation, deduplicate)
+    return OrmDealLoader(batch_size, generation, deduplicate)
+
+
+def _resolve_ids(
+    model: Type[models.Model],
+    field: str,
+    names: Iterable[str],
+    known_ids: Dict[str, int],
+) -> None:
+    """Дополняет known_ids идентификаторами объектов model с указанными именами,
+    создавая отсутствующие в БД объекты (в порядке первого появления в names).
+    Args:
+        model (Type[models.Model]): Модель (Customer или Gem).
+        field (str): Поле модели, содержащее имя.
+        names (Iterable[str]): Имена, которые нужно разрешить.
+        known_ids (Dict[str, int]): Уже разрешённые имена и их id.
+    Returns:
+    """
+
+    missing: List[str] = [
+        name for name in dict.fromkeys(names) if name not in known_ids
+    ]
+    if not missing:
+        return
+    known_ids.update(
+        model.objects.filter(**{f"{field}__in": missing}).values_list(field, "id")
+    )
+    to_create: List[str] = [name for name in missing if name not in known_ids]
+    if to_create:
+        # Имена уникальны: объекты, параллельно созданные другой загрузкой, пропускаются
+        model.objects.bulk_create(
+            [model(**{field: name}) for name in to_create], ignore_conflicts=True
+        )
+        known_ids.update(
+            model.objects.filter(**{f"{field}__in": to_create}).values_list(field, "id")
+        )
+
+
+def refresh_customer_stats(
+    customers_ids: Iterable[int] | None = None,
+    batch_size: int | None = None,
+    generation: int | None = None,
+) -> None:
+    """Пересчитывает агрегированную статистику (CustomerStats) клиентов по их сделкам.
+    Args:
+        customers_ids (Iterable[int] | None): ID клиентов, статистику которых нужно
+        пересчитать (None - полностью перестроить статистику всех клиентов).
+        batch_size (int | None): Размер пакета (по умолчанию settings.DEAL_BATCH_SIZE).
+        generation (int | None): ID поколения набора сделок (по умолчанию - текущее).
+    Returns:
+    """
+
+    batch_size = batch_size or settings.DEAL_BATCH_SIZE
+    generation = _resolve_generation(generation)
+    deals = Deal.objects.filter(generation=generation)
+    if customers_ids is None:
+        CustomerStats.objects.filter(generation=generation).delete()
+        _save_customer_stats(deals, batch_size, generation)
+        return
+    customers_ids = list(customers_ids)
+    for start in range(0, len(customers_ids), batch_size):
+        _save_customer_stats(
+            deals.filter(customer__in=customers_ids[start : start + batch_size]),
+            batch_size,
+            generation,
+        )
+
+
+def add_customer_stats(
+    customer_totals: Dict[int, List[int]],
+    batch_size: int | None = None,
+    generation: int | None = None,
+) -> None:
+    """Прибавляет к статистике клиентов (CustomerStats) суммы и количество их новых
+    сделок одним запросом INSERT ... ON CONFLICT DO UPDATE на пакет клиентов:
+    в отличие от refresh_customer_stats, сделки, сохранённые ранее, не перечитываются.
     Args:
+        customer_totals (Dict[int, List[int]]): Сумма и количество новых сделок
+        по id клиентов.
+        batch_size (int | None): Размер пакета (по умолчанию settings.DEAL_BATCH_SIZE).
+        generation (int | None): ID поколения набора сделок (по умолчанию - текущее).
     Returns:
     """
-    Customer.objects.all().delete()
-    Gem.objects.all().delete()
+
+    batch_size = batch_size or settings.DEAL_BATCH_SIZE
+    generation = _resolve_generation(generation)
+    qn = connection.ops.quote_name
+    table = qn(CustomerStats._meta.db_table)
+    generation_column, customer_column, spent_money, deals_count = (
+        qn(CustomerStats._meta.get_field(field).column)
+        for field in ("generation", "customer", "spent_money", "deals_count")
+    )
+    rows = [
+        (generation, customer_id, *customer_totals[customer_id])
+        for customer_id in sorted(customer_totals)
+    ]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"({generation_column}, {customer_column}, {spent_money}, {deals_count}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({generation_column}, {customer_column}) DO UPDATE SET "
+                f"{spent_money} = {table}.{spent_money} + EXCLUDED.{spent_money}, "
+                f"{deals_count} = {table}.{deals_count} + EXCLUDED.{deals_count}",
+                [value for row in batch for value in row],
+            )
+
+
+def _resolve_generation(generation: int | None) -> int:
+    """Возвращает generation или, если оно не указано, ID текущего поколения
+    набора сделок."""
+
+    return get_current_generation_id() if generation is None else generation
+
+
+def _get_generation(generation: int | None) -> int | Subquery:
+    """Возвращает generation или, если оно не указано, подзапрос ID текущего
+    поколения набора сделок (для отбора данных без отдельного запроса к указателю)."""
+
+    if generation is not None:
+        return generation
+    return Subquery(DatasetPointer.objects.filter(id=1).values("generation"))
+
+
+def _save_customer_stats(deals: QuerySet, batch_size: int, generation: int) -> None:
+    """Сохраняет статистику клиентов, посчитанную по набору сделок deals.
+    Args:
+        deals (QuerySet): Все сделки клиентов, статистику которых нужно сохранить.
+        batch_size (int): Размер пакета.
+        generation (int): ID поколения набора сделок, которому принадлежат сделки.
+    Returns:
+    """
+
+    CustomerStats.objects.bulk_create(
+        [
+            CustomerStats(
+                generation_id=generation,
+                customer_id=row["customer"],
+                spent_money=row["spent_money"],
+                deals_count=row["deals_count"],
+            )
+            for row in _aggregate_customer_stats(deals)
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["generation", "customer"],
+        update_fields=["spent_money", "deals_count"],
+    )
+
+
+def _aggregate_customer_stats(
+    deals: QuerySet,
+) -> "ValuesQuerySet[Deal, Dict[str, Any]]":
+    """Возвращает сумму и количество сделок каждого клиента из набора deals.
+    Args:
+        deals (QuerySet): Набор сделок.
+    Returns:
+        ValuesQuerySet[Deal, Dict[str, Any]]: Словари с ключами customer, spent_money, deals_count.
+    """
+
+    return (
+        deals.values("customer")
+        .annotate(spent_money=Sum("total"), deals_count=Count("id"))
+        .order_by()
+    )
+
+
+def refresh_daily_stats(
+    days: Iterable[date] | None = None,
+    batch_size: int | None = None,
+    generation: int | None = None,
+) -> None:
+    """Пересчитывает агрегированную по дням статистику сделок (DailyDealStats).
+    Args:
+        days (Iterable[date] | None): Дни, статистику которых нужно пересчитать
+        (None - полностью перестроить статистику).
+        batch_size (int | None): Размер пакета (по умолчанию settings.DEAL_BATCH_SIZE).
+        generation (int | None): ID поколения набора сделок (по умолчанию - текущее).
+    Returns:
+    """
+
+    batch_size = batch_size or settings.DEAL_BATCH_SIZE
+    generation = _resolve_generation(generation)
+    deals = Deal.objects.filter(generation=generation)
+    daily_stats = DailyDealStats.objects.filter(generation=generation)
+    if days is None:
+        daily_stats.delete()
+        _save_daily_stats(deals)
+        return
+    days = sorted(days)
+    for start in range(0, len(days), batch_size):
+        days_batch = days[start : start + batch_size]
+        daily_stats.filter(day__in=days_batch).delete()
+        _save_daily_stats(deals.filter(_get_days_condition(days_batch)))
+
+
+def _get_days_condition(days: List[date]) -> Q:
+    """Возвращает условие отбора сделок, совершённых в дни days: подряд идущие дни
+    объединяются в один диапазон дат, чтобы можно было использовать индекс по дате.
+    Args:
+        days (List[date]): Упорядоченный список дней.
+    Returns:
+        Q: Условие отбора сделок.
+    """
+
+    ranges: List[List[date]] = []
+    for day in days:
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    condition = Q()
+    for first_day, last_day in ranges:
+        condition |= Q(
+            date__gte=_get_day_start(first_day),
+            date__lt=_get_day_start(last_day + timedelta(days=1)),
+        )
+    return condition
+
+
+def _save_daily_stats(deals: QuerySet) -> None:
+    """Сохраняет статистику по дням, посчитанную по набору сделок deals.
+    Строк статистики почти столько же, сколько сделок, поэтому они вставляются
+    одним запросом INSERT ... SELECT, без передачи в приложение.
+    Args:
+        deals (QuerySet): Все сделки дней, статистику которых нужно сохранить.
+    Returns:
+    """
+
+    _insert_from_queryset(
+        DailyDealStats,
+        ["generation", "customer", "item", "day", "total", "quantity", "deals_count"],
+        deals.annotate(day=TruncDate("date"))
+        .values("generation", "customer", "item", "day")
+        .annotate(
+            total_sum=Sum("total"),
+            quantity_sum=Sum("quantity"),
+            deals_count=Count("id"),
+        )
+        .order_by(),
+    )
+
+
+def _insert_from_queryset(
+    model: Type[models.Model], fields: List[str], queryset: QuerySet
+) -> None:
+    """Вставляет в таблицу model строки, возвращаемые queryset (INSERT ... SELECT).
+    Args:
+        model (Type[models.Model]): Модель, в таблицу которой вставляются строки.
+        fields (List[str]): Поля модели в порядке столбцов queryset.
+        queryset (QuerySet): Запрос, возвращающий значения полей.
+    Returns:
+    """
+
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(model._meta.get_field(field).column) for field in fields)
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(model._meta.db_table)} ({columns}) {sql}", params
+        )
+
+
+def check_customer_stats(generation: int | None = None) -> List[Dict[str, Any]]:
+    """Сверяет сохранённую статистику клиентов со статистикой, посчитанной по сделкам.
+    Args:
+        generation (int | None): ID поколения набора сделок (по умолчанию - текущее).
+    Returns:
+        List[Dict[str, Any]]: Расхождения: ID клиента, ожидаемые (expected) и
+        сохранённые (stored) значения (spent_money, deals_count).
+    """
+
+    generation = _resolve_generation(generation)
+    expected = {
+        row["customer"]: (row["spent_money"], row["deals_count"])
+        for row in _aggregate_customer_stats(
+            Deal.objects.filter(generation=generation)
+        ).iterator()
+    }
+    stored = {
+        customer_id: (spent_money, deals_count)
+        for customer_id, spent_money, deals_count in CustomerStats.objects.filter(
+            generation=generation
+        )
+        .values_list("customer", "spent_money", "deals_count")
+        .iterator()
+    }
+    return [
+        {
+            "customer": customer_id,
+            "expected": expected.get(customer_id),
+            "stored": stored.get(customer_id),
+        }
+        for customer_id in sorted(expected.keys() | stored.keys())
+        if expected.get(customer_id) != stored.get(customer_id)
+    ]
 
 
 def get_customer_data(customers: List[Dict[str, str]], field: str) -> List[str]:
@@ -163,78 +1358,216 @@ def get_customer_data(customers: List[Dict[str, str]], field: str) -> List[str]:
     Returns:
         List[str] | None: Список значений ключа field или None, если файл невозможно обработать.
     """
-    
-    
+
     field_values = []
     for customer in customers:
         field_values.append(customer[field])
     return field_values
 
 
-def get_largest_amount_customers(limit: int) -> List[Dict[str, Any]]:
-    """Возвращает список клиентов, потративших наибольшую сумму за весь период.
+def get_largest_amount_customers(
+    limit: int,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    item: str | None = None,
+    generation: int | None = None,
+) -> List[Dict[str, Any]]:
+    """Возвращает список клиентов, потративших наибольшую сумму за период
+    (по умолчанию - за весь период).
+    Без фильтров данные берутся из агрегированной статистики клиентов (CustomerStats),
+    поэтому запрос читает только limit записей индекса по потраченной сумме.
+    С фильтрами суммы считаются по агрегированной по дням статистике (DailyDealStats)
+    за период и (или) по камню item.
      Args:
         limit (int): Количество клиентов, которые нужно получить из БД.
+        date_from (date | None): Первый день периода (включительно).
+        date_to (date | None): Последний день периода (включительно).
+        item (str | None): Название драгоценного камня.
+        generation (int | None): ID поколения набора сделок (по умолчанию - текущее).
     Returns:
         List[Dict[str, Any]]: Список клиентов в виде словарей.
     """
 
-    largest_amount_customers = (
-        Deal.objects.values("customer", "customer__username")
-        .annotate(spent_money=Sum("total"))
-        .order_by("-spent_money")[:limit]
+    return list(
+        _get_largest_amount_customers_queryset(
+            limit, date_from, date_to, item, generation
+        )
     )
-    return list(largest_amount_customers)
 
 
-def get_customer_gems(customer_id: str) -> "ValuesQuerySet[Gem, Any]":
-    """Возвращает список драгоценных камней, принадлежащих определённому клиенту.
-     Args:
-        customer_id (str): ID клиента.
-    Returns:
-        ValuesQuerySet[Gem, Any]: Набор драгоценных камней клиента.
-    """
+async def aget_largest_amount_customers(
+    limit: int,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    item: str | None = None,
+    generation: int | None = None,
+) -> List[Dict[str, Any]]:
+    """Асинхронный вариант get_largest_amount_customers."""
 
+    return [
+        customer
+        async for customer in _get_largest_amount_customers_queryset(
+            limit, date_from, date_to, item, generation
+        )
+    ]
+
+
+def _get_largest_amount_customers_queryset(
+    limit: int,
+    date_from: date | None,
+    date_to: date | None,
+    item: str | None,
+    generation: int | None,
+) -> "ValuesQuerySet[Any, Dict[str, Any]]":
+    """Возвращает запрос списка клиентов, потративших наибольшую сумму
+    (см. get_largest_amount_customers)."""
+
+    generation = _get_generation(generation)
+    if date_from is None and date_to is None and item is None:
+        return (
+            CustomerStats.objects.filter(generation=generation)
+            .values("customer", "customer__username", "spent_money")
+            .order_by("-spent_money", "customer")[:limit]
+        )
     return (
-        Gem.objects.prefetch_related("gem_customers")
-        .filter(customers=customer_id)
-        .values_list("name", flat=True)
-        .distinct()
+        filter_daily_stats(
+            DailyDealStats.objects.filter(generation=generation),
+            date_from,
+            date_to,
+            item,
+        )
+        .values("customer", "customer__username")
+        .annotate(spent_money=Sum("total"))
+        .order_by("-spent_money", "customer")[:limit]
     )
 
 
-def get_same_customer_gems(
-    customers_ids: List[str], find_gems: "ValuesQuerySet[Gem, Any]"
-) -> List[Gem]:
-    """Возвращает драгоценные камни из определённого перечня.
+def filter_daily_stats(
+    daily_stats: QuerySet,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    item: str | None = None,
+) -> QuerySet:
+    """Отбирает статистику сделок за дни с date_from по date_to (включительно)
+    и (или) по драгоценному камню item.
      Args:
-        customers_ids (List[str]): ID клиентов, которым принадлежат камни.
-        find_gems (ValuesQuerySet[Gem, Any]): Набор камней, названия которых должны быть в результирующей выборке.
+        daily_stats (QuerySet): Набор статистики по дням.
+        date_from (date | None): Первый день периода.
+        date_to (date | None): Последний день периода.
+        item (str | None): Название драгоценного камня.
     Returns:
-        List[Gem]: Драгоценные камни, которые есть у покупателей из списка customers_ids и названия которых пересекаются
-        со списком камней в find_gems.
+        QuerySet: Отфильтрованный набор статистики по дням.
     """
-    return list(
-        Gem.objects.prefetch_related("gem_customers")
-        .filter(customers__in=customers_ids, name__in=find_gems)
-        .distinct()
-    )
 
+    if date_from is not None:
+        daily_stats = daily_stats.filter(day__gte=date_from)
+    if date_to is not None:
+        daily_stats = daily_stats.filter(day__lte=date_to)
+    if item is not None:
+        daily_stats = daily_stats.filter(item__name=item)
+    return daily_stats
 
-def add_gems_field_to_customers_data(customers: List[Dict[str, Any]]) -> None:
+
+def _get_day_start(day: date) -> datetime:
+    """Возвращает начало дня day в текущем часовом поясе."""
+
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def add_gems_field_to_customers_data(
+    customers: List[Dict[str, Any]],
+    date_from: date | None = None,
+    date_to: date | None = None,
+    item: str | None = None,
+    generation: int | None = None,
+) -> None:
     """Добавляет в информацию о клиенте - данные, о купленных им камнях, которые также есть
     у других клиентов из списка "Потративших наибольшую сумму за весь период".
+    Пары (клиент, камень) для всех клиентов списка получаются одним запросом,
+    общие камни определяются по построенному в памяти индексу "камень -> покупатели".
+    С фильтрами пары берутся из агрегированной по дням статистики (DailyDealStats)
+    с теми же фильтрами, что и список клиентов.
      Args:
         customers: List[Dict[str, Any]]: Данные о клиентах из списка "Потративших наибольшую сумму за весь период".
+        date_from (date | None): Первый день периода (включительно).
+        date_to (date | None): Последний день периода (включительно).
+        item (str | None): Название драгоценного камня.
+        generation (int | None): ID поколения набора сделок (по умолчанию - текущее).
     Returns:
     """
 
-    customers_ids:List[str] = get_customer_data(customers, "customer")
-    for id in customers_ids:
-        tmp_ids = copy.copy(customers_ids)
-        tmp_ids.remove(id)
-        current_customer_gems:"ValuesQuerySet[Gem, Any]" = get_customer_gems(id)
-        gems_other_customers_have:List[Gem] = get_same_customer_gems(tmp_ids, current_customer_gems)
-        for customer in customers:
-            if customer["customer"] == id:
-                customer["gems"] = gems_other_customers_have
+    _set_customers_gems(
+        customers,
+        _get_customers_gems_pairs(customers, date_from, date_to, item, generation),
+    )
+
+
+async def aadd_gems_field_to_customers_data(
+    customers: List[Dict[str, Any]],
+    date_from: date | None = None,
+    date_to: date | None = None,
+    item: str | None = None,
+    generation: int | None = None,
+) -> None:
+    """Асинхронный вариант add_gems_field_to_customers_data."""
+
+    _set_customers_gems(
+        customers,
+        [
+            pair
+            async for pair in _get_customers_gems_pairs(
+                customers, date_from, date_to, item, generation
+            )
+        ],
+    )
+
+
+def _get_customers_gems_pairs(
+    customers: List[Dict[str, Any]],
+    date_from: date | None,
+    date_to: date | None,
+    item: str | None,
+    generation: int | None,
+) -> "ValuesQuerySet[Any, Tuple[Any, str]]":
+    """Возвращает запрос пар (клиент, камень) для клиентов из списка customers
+    (см. add_gems_field_to_customers_data)."""
+
+    customers_ids: List[str] = get_customer_data(customers, "customer")
+    generation = _get_generation(generation)
+    if date_from is None and date_to is None and item is None:
+        deals = Deal.objects.filter(generation=generation, customer__in=customers_ids)
+    else:
+        deals = filter_daily_stats(
+            DailyDealStats.objects.filter(
+                generation=generation, customer__in=customers_ids
+            ),
+            date_from,
+            date_to,
+            item,
+        )
+    return (
+        deals.values_list("customer", "item__name")
+        .order_by("item", "customer")
+        .distinct()
+    )
+
+
+def _set_customers_gems(
+    customers: List[Dict[str, Any]], customers_gems_pairs: Iterable[Tuple[Any, str]]
+) -> None:
+    """Добавляет клиентам из списка customers камни из пар (клиент, камень),
+    которые есть и у других клиентов списка."""
+
+    customer_gems: Dict[Any, List[str]] = {
+        customer["customer"]: [] for customer in customers
+    }
+    gem_owners: Dict[str, Set[Any]] = defaultdict(set)
+    for customer_id, gem_name in customers_gems_pairs:
+        customer_gems[customer_id].append(gem_name)
+        gem_owners[gem_name].add(customer_id)
+    for customer in customers:
+        customer["gems"] = [
+            gem_name
+            for gem_name in customer_gems[customer["customer"]]
+            if len(gem_owners[gem_name]) > 1
+        ]
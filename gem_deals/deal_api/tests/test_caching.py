@@ -0,0 +1,194 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..caching import (
+    LocalPayloadCache,
+    _get_data_version_cache_key,
+    _set_top_customers_payload,
+    cache_stats,
+    clear_local_cache,
+    get_data_version,
+    get_top_customers_cache_key,
+    get_top_customers_payload,
+    invalidate_top_customers_cache,
+)
+
+
+class TestTopCustomersCache(TestCase):
+    """Тестирование кэширования ответа со списком клиентов."""
+
+    def setUp(self) -> None:
+        """Очищает кэш (общий и в памяти процесса) перед тестом."""
+
+        cache.clear()
+        clear_local_cache()
+        cache_stats.reset()
+
+    def test_invalidate_keeps_other_cache_keys(self) -> None:
+        """Тест инвалидации ответа без удаления остальных ключей кэша."""
+
+        cache.set("throttle_anon_127.0.0.1", [1])
+        get_top_customers_payload()
+        old_key = get_top_customers_cache_key()
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_top_customers_cache()
+        new_key = get_top_customers_cache_key()
+        self.assertNotEqual(old_key, new_key)
+        self.assertEqual(cache.get("throttle_anon_127.0.0.1"), [1])
+        self.assertIsNotNone(cache.get(new_key))
+        with self.assertNumQueries(0):
+            get_top_customers_payload()
+
+    def test_query_cache_keys_are_canonical(self) -> None:
+        """Тест: порядок параметров и limit по умолчанию не влияют на ключ кэша."""
+
+        self.assertEqual(
+            get_top_customers_cache_key(1, {"limit": 5, "item": None}),
+            get_top_customers_cache_key(1),
+        )
+        self.assertEqual(
+            get_top_customers_cache_key(1, {"item": "Рубин", "limit": 10}),
+            get_top_customers_cache_key(1, {"limit": 10, "item": "Рубин"}),
+        )
+        self.assertNotEqual(
+            get_top_customers_cache_key(1, {"limit": 10}),
+            get_top_customers_cache_key(1),
+        )
+
+    @override_settings(CACHE_MAX_QUERIES=2)
+    def test_query_cache_entries_are_bounded(self) -> None:
+        """Тест вытеснения давно пересчитанных ответов на запросы с параметрами."""
+
+        for limit in (1, 2, 3):
+            get_top_customers_payload({"limit": limit})
+        cached = [
+            cache.get(get_top_customers_cache_key(params={"limit": limit})) is not None
+            for limit in (1, 2, 3)
+        ]
+        self.assertEqual(cached, [False, True, True])
+        get_top_customers_payload()
+        self.assertIsNotNone(cache.get(get_top_customers_cache_key()))
+
+    def test_evicted_data_version_is_recreated(self) -> None:
+        """Тест создания новой версии данных, если прежняя вытеснена из кэша."""
+
+        data_version = get_data_version()
+        self.assertEqual(get_data_version(), data_version)
+        cache.delete(_get_data_version_cache_key())
+        self.assertNotEqual(get_data_version(), data_version)
+
+    def test_local_cache_hit_skips_shared_cache(self) -> None:
+        """Тест: повторный ответ отдаётся из памяти процесса без обращения к общему кэшу."""
+
+        payload = get_top_customers_payload()
+        clear_local_cache()
+        self.assertEqual(get_top_customers_payload(), payload)
+        with mock.patch(
+            "deal_api.caching.cache"
+        ) as shared_cache, self.assertNumQueries(0):
+            self.assertEqual(get_top_customers_payload(), payload)
+        shared_cache.get.assert_not_called()
+        stats = cache_stats.snapshot()
+        self.assertEqual(stats["counts"], {"l1_hit": 1, "l2_hit": 1, "miss": 1})
+        self.assertAlmostEqual(stats["hit_ratio"], 2 / 3)
+
+    def test_local_cache_follows_data_version(self) -> None:
+        """Тест: новая версия данных, начатая другим процессом, становится видна
+        после проверки версии в общем кэше."""
+
+        get_top_customers_payload()
+        cache.set(_get_data_version_cache_key(), 1, None)
+        _set_top_customers_payload(get_top_customers_cache_key(1), b"new")
+        clear_local_cache()
+        self.assertEqual(get_top_customers_payload(), b"new")
+        cache.set(_get_data_version_cache_key(), 2, None)
+        _set_top_customers_payload(get_top_customers_cache_key(2), b"newer")
+        self.assertEqual(get_top_customers_payload(), b"new")
+        with override_settings(CACHE_L1_DATA_VERSION_CHECK_SECONDS=0):
+            self.assertEqual(get_top_customers_payload(), b"newer")
+
+    def test_local_cache_is_bounded(self) -> None:
+        """Тест вытеснения давно запрошенных ответов при превышении размера кэша
+        и истечения времени хранения ответа."""
+
+        local_cache = LocalPayloadCache()
+        fresh_until = time.time() + 60
+        with override_settings(CACHE_L1_MAX_BYTES=10):
+            local_cache.set("a", b"1234", fresh_until)
+            local_cache.set("b", b"1234", fresh_until)
+            self.assertEqual(local_cache.get("a"), b"1234")
+            local_cache.set("c", b"1234", fresh_until)
+            local_cache.set("d", b"12345678901", fresh_until)
+        self.assertEqual(
+            [local_cache.get(key) for key in "abcd"], [b"1234", None, b"1234", None]
+        )
+        self.assertEqual(local_cache.size, 8)
+        local_cache.set("e", b"1", time.time() - 1)
+        self.assertIsNone(local_cache.get("e"))
+
+
+class TestTopCustomersCacheStampede(TestCase):
+    """Тестирование защиты от одновременного пересчёта ответа несколькими процессами."""
+
+    REQUESTS = 20
+
+    def setUp(self) -> None:
+        """Очищает кэш и подменяет получение данных из БД медленной заглушкой."""
+
+        cache.clear()
+        clear_local_cache()
+        self.aggregations = 0
+        self.aggregations_lock = threading.Lock()
+        patchers = [
+            mock.patch(
+                "deal_api.caching.get_largest_amount_customers",
+                side_effect=self.slow_largest_amount_customers,
+            ),
+            mock.patch("deal_api.caching.add_gems_field_to_customers_data"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def slow_largest_amount_customers(self, limit, **filters):
+        """Заглушка агрегирующего запроса: подсчитывает вызовы и выполняется долго."""
+
+        with self.aggregations_lock:
+            self.aggregations += 1
+        time.sleep(0.2)
+        return [{"customer__username": "new", "spent_money": 1, "gems": []}]
+
+    def get_payloads_concurrently(self):
+        """Выполняет REQUESTS одновременных получений ответа."""
+
+        barrier = threading.Barrier(self.REQUESTS)
+
+        def get_payload():
+            barrier.wait()
+            return get_top_customers_payload()
+
+        with ThreadPoolExecutor(max_workers=self.REQUESTS) as executor:
+            futures = [executor.submit(get_payload) for _ in range(self.REQUESTS)]
+            return [future.result() for future in futures]
+
+    def test_expired_payload_is_rebuilt_once(self) -> None:
+        """Тест: устаревший ответ пересчитывается один раз, остальные получают прежний."""
+
+        with override_settings(CACHE_TTL_SECONDS=-1):
+            _set_top_customers_payload(get_top_customers_cache_key(), b"old")
+        payloads = self.get_payloads_concurrently()
+        self.assertEqual(self.aggregations, 1)
+        self.assertEqual(payloads.count(b"old"), self.REQUESTS - 1)
+        self.assertIn(b'"username":"new"', get_top_customers_payload())
+
+    def test_missing_payload_is_built_once(self) -> None:
+        """Тест: отсутствующий ответ формируется один раз, остальные ждут его."""
+
+        payloads = self.get_payloads_concurrently()
+        self.assertEqual(self.aggregations, 1)
+        self.assertEqual(len(set(payloads)), 1)
@@ -0,0 +1,328 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from types import ModuleType
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .. import jobs
+from ..jobs import (
+    _delete_retired_generations_in_background,
+    STALE_JOB_ERROR,
+    _run_ingest_job_in_background,
+    create_ingest_job,
+    get_job_progress_cache_key,
+    run_ingest_job,
+    submit_ingest_job,
+)
+from ..models import (
+    Customer,
+    DatasetPointer,
+    Deal,
+    IngestFile,
+    IngestJob,
+    IngestJobStatus,
+    IngestMode,
+)
+
+
+@override_settings(INGEST_BACKGROUND=False, INGEST_UPLOAD_DIR=tempfile.gettempdir())
+class TestIngestJobs(TestCase):
+    """Тестирование фоновой загрузки сделок."""
+
+    def setUp(self) -> None:
+        """Создаёт входные данные для тестов."""
+
+        self.client = Client()
+        self.API_URL = "http://127.0.0.1:8000/api/v1/"
+        with open("deals.csv", "rb") as file:
+            self.content = file.read()
+
+    def test_post_returns_job_status_url(self) -> None:
+        """Тест на получение ссылки на статус задачи загрузки и статуса выполненной задачи."""
+
+        file = SimpleUploadedFile("deals.csv", self.content)
+        response = self.client.post(self.API_URL, {"deals": file}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.json()["job_id"]
+        self.assertEqual(response.json()["job_url"], f"/api/v1/jobs/{job_id}/")
+        response = self.client.get(response.json()["job_url"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        job = response.json()
+        self.assertEqual(job["status"], IngestJobStatus.DONE)
+        self.assertEqual(job["rows_parsed"], 767)
+        self.assertEqual(job["rows_written"], 767)
+        self.assertEqual(
+            job["files"],
+            [
+                {
+                    "file_name": "deals.csv",
+                    "rows_parsed": 767,
+                    "rows_written": 767,
+                    "error": "",
+                }
+            ],
+        )
+        for file_path in IngestFile.objects.values_list("file_path", flat=True):
+            self.assertFalse(os.path.exists(file_path))
+
+    def test_job_after_dataset_pointer_deleted(self) -> None:
+        """Тест: загрузка выполняется и после удаления указателя на текущее
+        поколение (например, командой flush), указатель создаётся заново."""
+
+        DatasetPointer.objects.all().delete()
+        job = create_ingest_job(
+            [SimpleUploadedFile("deals.csv", self.content)], IngestMode.REPLACE
+        )
+        job = run_ingest_job(job.id)
+        self.assertEqual(job.status, IngestJobStatus.DONE)
+        self.assertTrue(DatasetPointer.objects.exists())
+        response = self.client.get(self.API_URL)
+        self.assertEqual(len(response.json()["response"]), 5)
+
+    def test_get_unknown_job(self) -> None:
+        """Тест на получение ошибки при запросе статуса несуществующей задачи."""
+
+        response = self.client.get(reverse("deal_api:job", args=[404]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_failed_job_keeps_previous_data(self) -> None:
+        """Тест задачи, файл которой оказался невалидным после проверенного начала."""
+
+        job = create_ingest_job(
+            [SimpleUploadedFile("deals.csv", self.content)], IngestMode.REPLACE
+        )
+        run_ingest_job(job.id)
+        broken = self.content + b"user,\xff\xfe,1,1,2023-08-01 12:00:00\r\n"
+        job = create_ingest_job(
+            [SimpleUploadedFile("deals.csv", broken)], IngestMode.REPLACE
+        )
+        job = run_ingest_job(job.id)
+        self.assertEqual(job.status, IngestJobStatus.FAILED)
+        self.assertIn("deals.csv", job.error)
+        self.assertEqual(job.rows_written, 0)
+        self.assertEqual(Deal.objects.count(), 767)
+        for file_path in job.files.values_list("file_path", flat=True):
+            self.assertFalse(os.path.exists(file_path))
+
+    def test_job_done_when_cache_invalidation_fails(self) -> None:
+        """Тест: ошибка сброса кэша после сохранения сделок не оставляет задачу
+        в статусе выполнения."""
+
+        job = create_ingest_job(
+            [SimpleUploadedFile("deals.csv", self.content)], IngestMode.REPLACE
+        )
+        with mock.patch(
+            "deal_api.jobs.invalidate_top_customers_cache",
+            side_effect=ConnectionError("Redis недоступен"),
+        ), self.assertLogs("deal_api.jobs", "ERROR"):
+            run_ingest_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJobStatus.DONE)
+        self.assertEqual(job.rows_written, 767)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(INGEST_PARSE_WORKERS=2)
+    def test_multiple_files_are_saved_together(self) -> None:
+        """Тест загрузки нескольких файлов: файлы разбираются в пуле процессов,
+        сделки всех файлов сохраняются вместе, кэш инвалидируется один раз.
+        """
+
+        header, *rows = self.content.splitlines(keepends=True)
+        files = [
+            SimpleUploadedFile("deals1.csv", header + b"".join(rows[:500])),
+            SimpleUploadedFile("deals2.csv", header + b"".join(rows[500:])),
+        ]
+        job = create_ingest_job(files, IngestMode.REPLACE)
+        with mock.patch("deal_api.jobs.invalidate_top_customers_cache") as invalidate:
+            job = run_ingest_job(job.id)
+        self.assertEqual(job.status, IngestJobStatus.DONE)
+        invalidate.assert_called_once_with()
+        self.assertEqual(Deal.objects.count(), 767)
+        self.assertEqual(
+            list(job.files.values_list("file_name", "rows_parsed", "rows_written")),
+            [("deals1.csv", 500, 500), ("deals2.csv", 267, 267)],
+        )
+
+    @override_settings(INGEST_PARSE_WORKERS=2)
+    def test_multiple_files_with_invalid_file(self) -> None:
+        """Тест: при ошибке в одном из файлов не сохраняется ни один,
+        ошибка указывается для файла, в котором она найдена.
+        """
+
+        files = [
+            SimpleUploadedFile("deals.csv", self.content),
+            SimpleUploadedFile("broken.csv", self.content + b"user,\xff,1,1,2023\r\n"),
+        ]
+        job = run_ingest_job(create_ingest_job(files, IngestMode.REPLACE).id)
+        self.assertEqual(job.status, IngestJobStatus.FAILED)
+        self.assertFalse(Deal.objects.exists())
+        errors = dict(job.files.values_list("file_name", "error"))
+        self.assertEqual(errors["deals.csv"], "")
+        self.assertIn("не является валидным csv", errors["broken.csv"])
+        self.assertEqual(job.error, errors["broken.csv"])
+
+    @override_settings(INGEST_PARSE_WORKERS=2, INGEST_PARSE_EXECUTABLE=None)
+    def test_multiple_files_under_uwsgi_are_parsed_in_thread(self) -> None:
+        """Тест: под uWSGI без указанного интерпретатора Python (sys.executable -
+        бинарный файл uwsgi) файлы разбираются в потоке задачи, без пула процессов.
+        """
+
+        header, *rows = self.content.splitlines(keepends=True)
+        files = [
+            SimpleUploadedFile("deals1.csv", header + b"".join(rows[:500])),
+            SimpleUploadedFile("deals2.csv", header + b"".join(rows[500:])),
+        ]
+        job = create_ingest_job(files, IngestMode.REPLACE)
+        with mock.patch.dict(sys.modules, {"uwsgi": ModuleType("uwsgi")}), mock.patch(
+            "deal_api.jobs.ProcessPoolExecutor"
+        ) as executor_class:
+            job = run_ingest_job(job.id)
+        executor_class.assert_not_called()
+        self.assertEqual(job.status, IngestJobStatus.DONE)
+        self.assertEqual(Deal.objects.count(), 767)
+
+    @override_settings(
+        INGEST_PARSE_WORKERS=2, INGEST_PARSE_EXECUTABLE="/usr/bin/python3"
+    )
+    def test_parse_executor_is_shared_by_jobs(self) -> None:
+        """Тест: пул процессов разбора файлов создаётся один раз на процесс,
+        под uWSGI процессы запускаются указанным интерпретатором Python.
+        """
+
+        with mock.patch.dict(sys.modules, {"uwsgi": ModuleType("uwsgi")}), mock.patch(
+            "deal_api.jobs.ProcessPoolExecutor"
+        ) as executor_class, mock.patch.object(
+            jobs, "_parse_executor", None
+        ), mock.patch(
+            "multiprocessing.spawn.set_executable"
+        ) as set_executable:
+            executor = jobs._get_parse_executor()
+            self.assertIs(jobs._get_parse_executor(), executor)
+        executor_class.assert_called_once()
+        set_executable.assert_called_once_with("/usr/bin/python3")
+
+    def test_running_job_progress_from_cache(self) -> None:
+        """Тест получения прогресса выполняющейся задачи из кэша."""
+
+        job = IngestJob.objects.create(status=IngestJobStatus.RUNNING)
+        cache.set(
+            get_job_progress_cache_key(job.id), {"rows_parsed": 10, "rows_written": 5}
+        )
+        response = self.client.get(reverse("deal_api:job", args=[job.id]))
+        self.assertEqual(response.json()["rows_parsed"], 10)
+        self.assertEqual(response.json()["rows_written"], 5)
+
+    @override_settings(INGEST_BACKGROUND=True)
+    def test_submit_job_to_background_after_commit(self) -> None:
+        """Тест постановки задачи в очередь фоновой обработки после фиксации транзакции."""
+
+        job = IngestJob.objects.create()
+        executor = mock.Mock()
+        with mock.patch("deal_api.jobs._get_executor", return_value=executor):
+            with self.captureOnCommitCallbacks(execute=True):
+                submit_ingest_job(job)
+                executor.submit.assert_not_called()
+        executor.submit.assert_called_once_with(_run_ingest_job_in_background, job.id)
+        self.assertFalse(Customer.objects.exists())
+
+    @override_settings(INGEST_BACKGROUND=True, DATASET_RETENTION_SECONDS=60)
+    def test_replace_job_schedules_retired_generations_cleanup(self) -> None:
+        """Тест: после замены данных удаление заменённого поколения планируется
+        в пуле фоновой обработки спустя DATASET_RETENTION_SECONDS."""
+
+        job = create_ingest_job(
+            [SimpleUploadedFile("deals.csv", self.content)], IngestMode.REPLACE
+        )
+        with mock.patch("deal_api.jobs.threading.Timer") as timer:
+            run_ingest_job(job.id)
+        timer.assert_called_once()
+        self.assertEqual(timer.call_args.args[0], 61)
+        timer.return_value.start.assert_called_once_with()
+        executor = mock.Mock()
+        with mock.patch("deal_api.jobs._get_executor", return_value=executor):
+            timer.call_args.args[1]()
+        executor.submit.assert_called_once_with(
+            _delete_retired_generations_in_background
+        )
+
+    @override_settings(INGEST_JOB_TIMEOUT_SECONDS=60 * 60)
+    def test_recover_stale_jobs(self) -> None:
+        """Тест завершения потерянных задач: выполнявшихся завершившимся процессом
+        и ожидающих дольше INGEST_JOB_TIMEOUT_SECONDS; их файлы удаляются."""
+
+        def create_job(**fields) -> IngestJob:
+            job = create_ingest_job(
+                [SimpleUploadedFile("deals.csv", self.content)], IngestMode.REPLACE
+            )
+            IngestJob.objects.filter(id=job.id).update(**fields)
+            return job
+
+        finished_process = subprocess.Popen([sys.executable, "-c", ""])
+        finished_process.wait()
+        now = timezone.now()
+        lost_running = create_job(
+            status=IngestJobStatus.RUNNING,
+            started_at=now,
+            worker=f"{socket.gethostname()}:{finished_process.pid}",
+        )
+        lost_pending = create_job(created_at=now - timedelta(hours=2))
+        running = create_job(
+            status=IngestJobStatus.RUNNING,
+            started_at=now,
+            worker=f"{socket.gethostname()}:{os.getpid()}",
+        )
+        pending = create_job()
+
+        stdout = io.StringIO()
+        with self.assertLogs("deal_api.jobs", "WARNING"):
+            call_command("recover_ingest_jobs", stdout=stdout)
+        self.assertIn("2", stdout.getvalue())
+        for job in [lost_running, lost_pending]:
+            job.refresh_from_db()
+            self.assertEqual(job.status, IngestJobStatus.FAILED)
+            self.assertEqual(job.error, STALE_JOB_ERROR)
+            self.assertIsNotNone(job.finished_at)
+            for file_path in job.files.values_list("file_path", flat=True):
+                self.assertFalse(os.path.exists(file_path))
+        running.refresh_from_db()
+        self.assertEqual(running.status, IngestJobStatus.RUNNING)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, IngestJobStatus.PENDING)
+
+        # Завершённая задача, оставшаяся в очереди, не выполняется
+        with self.assertLogs("deal_api.jobs", "WARNING"):
+            job = run_ingest_job(lost_pending.id)
+        self.assertEqual(job.status, IngestJobStatus.FAILED)
+        self.assertFalse(Deal.objects.exists())
+        for job in [running, pending]:
+            for file_path in job.files.values_list("file_path", flat=True):
+                os.remove(file_path)
+
+    def test_job_recovered_while_running_does_not_save_deals(self) -> None:
+        """Тест: задача, завершённая как потерянная во время выполнения,
+        не сохраняет сделки."""
+
+        job = create_ingest_job(
+            [SimpleUploadedFile("deals.csv", self.content)], IngestMode.REPLACE
+        )
+
+        def recover(rows: int) -> None:
+            IngestJob.objects.filter(id=job.id).update(status=IngestJobStatus.FAILED)
+
+        with mock.patch("deal_api.jobs.JobProgress.add_written", side_effect=recover):
+            job = run_ingest_job(job.id)
+        self.assertEqual(job.status, IngestJobStatus.FAILED)
+        self.assertEqual(job.error, STALE_JOB_ERROR)
+        self.assertFalse(Deal.objects.exists())
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+
+from ..caching import clear_local_cache
+from ..metrics import (
+    Counter,
+    Histogram,
+    observe_ingest_job,
+    render_metrics,
+    reset_metrics,
+)
+
+
+class TestMetrics(SimpleTestCase):
+    """Тестирование метрик в текстовом формате Prometheus."""
+
+    def test_histogram_render(self) -> None:
+        """Тест: интервалы гистограммы накопительные, есть сумма и количество."""
+
+        histogram = Histogram("test_seconds", "Тест.", (0.1, 1), ("view",))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, view='a"b')
+        self.assertEqual(
+            list(histogram.render()),
+            [
+                "# HELP test_seconds Тест.",
+                "# TYPE test_seconds histogram",
+                'test_seconds_bucket{view="a\\"b",le="0.1"} 2',
+                'test_seconds_bucket{view="a\\"b",le="1"} 3',
+                'test_seconds_bucket{view="a\\"b",le="+Inf"} 4',
+                'test_seconds_sum{view="a\\"b"} 2.65',
+                'test_seconds_count{view="a\\"b"} 4',
+            ],
+        )
+
+    def test_counter_render(self) -> None:
+        """Тест: значения счётчика выводятся по наборам значений меток."""
+
+        counter = Counter("test_total", "Тест.", ("stage",))
+        counter.inc(stage="written")
+        counter.inc(5, stage="parsed")
+        counter.inc(stage="written")
+        self.assertEqual(
+            list(counter.render())[2:],
+            ['test_total{stage="parsed"} 5', 'test_total{stage="written"} 2'],
+        )
+
+    def test_metrics_of_all_processes(self) -> None:
+        """Тест: при общем каталоге метрик выдаются суммы метрик всех процессов,
+        для текущего значения - значение, установленное последним."""
+
+        reset_metrics()
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            METRICS_MULTIPROCESS_DIR=directory
+        ):
+            with open(os.path.join(directory, "metrics-1-a.json"), "w") as file:
+                json.dump(
+                    {
+                        "gem_deals_ingest_jobs_total": [[["replace", "done"], 2]],
+                        "gem_deals_ingest_last_rows_per_second": [[[], [50.0, 0.0]]],
+                    },
+                    file,
+                )
+            observe_ingest_job("replace", "done", 10, 10, {"total": 0.1})
+            metrics = render_metrics()
+            self.assertIn(
+                'gem_deals_ingest_jobs_total{mode="replace",status="done"} 3', metrics
+            )
+            self.assertIn(
+                'gem_deals_ingest_phase_duration_seconds_count{phase="total"} 1',
+                metrics,
+            )
+            self.assertIn("gem_deals_ingest_last_rows_per_second 100.0", metrics)
+            self.assertEqual(len(os.listdir(directory)), 2)
+        reset_metrics()
+
+
+@override_settings(INGEST_BACKGROUND=False, INGEST_UPLOAD_DIR=tempfile.gettempdir())
+class TestRequestMetrics(TestCase):
+    """Тестирование сбора показателей обработки запросов и задач загрузки."""
+
+    def setUp(self) -> None:
+        """Создаёт входные данные для тестов."""
+
+        cache.clear()
+        clear_local_cache()
+        reset_metrics()
+        self.client = Client()
+        self.API_URL = "http://127.0.0.1:8000/api/v1/"
+
+    def test_server_timing_header(self) -> None:
+        """Тест: ответ содержит показатели обработки запроса в заголовке Server-Timing."""
+
+        response = self.client.get(self.API_URL)
+        server_timing = response["Server-Timing"]
+        self.assertRegex(server_timing, r"^total;dur=[\d.]+, db;dur=[\d.]+;desc=")
+        self.assertIn("cache;dur=", server_timing)
+        self.assertIn('desc="miss"', server_timing)
+        self.assertIn("serialization;dur=", server_timing)
+
+        response = self.client.get(self.API_URL)
+        self.assertIn('db;dur=0.000;desc="0 queries"', response["Server-Timing"])
+        self.assertIn('desc="l1_hit"', response["Server-Timing"])
+
+    def test_server_timing_header_only_for_internal_clients(self) -> None:
+        """Тест: заголовок Server-Timing не передаётся клиентам вне внутренней сети."""
+
+        response = self.client.get(self.API_URL, REMOTE_ADDR="203.0.113.5")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_disabled(self) -> None:
+        """Тест: заголовок Server-Timing не передаётся, если это отключено."""
+
+        response = self.client.get(self.API_URL)
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_metrics_endpoint(self) -> None:
+        """Тест: метрики запросов, кэша ответов и задач загрузки
+        доступны в текстовом формате Prometheus."""
+
+        with open("deals.csv", "rb") as file:
+            deals = SimpleUploadedFile("deals.csv", file.read())
+        self.client.post(self.API_URL, {"deals": deals}, format="multipart")
+        self.client.get(self.API_URL)
+        self.client.get(self.API_URL)
+
+        response = self.client.get(
+            f"{self.API_URL}metrics/",
+            HTTP_ACCEPT="application/openmetrics-text;version=1.0.0;q=0.5,"
+            "text/plain;version=0.0.4;q=0.3,*/*;q=0.2",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+        metrics = response.content.decode()
+        self.assertIn(
+            "gem_deals_http_request_duration_seconds_count"
+            '{view="deal_api:deals",method="GET",status="200"} 2',
+            metrics,
+        )
+        self.assertIn(
+            "gem_deals_http_request_duration_seconds_count"
+            '{view="deal_api:deals",method="POST",status="202"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'gem_deals_http_request_db_queries_bucket{view="deal_api:deals",le="0"}',
+            metrics,
+        )
+        for outcome in ("l1_hit", "miss"):
+            self.assertIn(
+                "gem_deals_payload_cache_lookup_duration_seconds_count"
+                f'{{outcome="{outcome}"}} 1',
+                metrics,
+            )
+        self.assertIn(
+            'gem_deals_ingest_jobs_total{mode="replace",status="done"} 1', metrics
+        )
+        self.assertIn('gem_deals_ingest_rows_total{stage="written"} 767', metrics)
+        for phase in ("parse", "save", "invalidate_cache", "cleanup", "total"):
+            self.assertIn(
+                f'gem_deals_ingest_phase_duration_seconds_count{{phase="{phase}"}} 1',
+                metrics,
+            )
+        self.assertRegex(metrics, r"\ngem_deals_ingest_last_rows_per_second [\d.]+\n")
+
+    def test_metrics_endpoint_is_internal(self) -> None:
+        """Тест: метрики недоступны с адресов вне внутренней сети."""
+
+        response = self.client.get(f"{self.API_URL}metrics/", REMOTE_ADDR="203.0.113.5")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn("gem_deals_", response.content.decode())
+        response = self.client.get(f"{self.API_URL}metrics/", REMOTE_ADDR="172.18.0.5")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
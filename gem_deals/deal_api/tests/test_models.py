@@ -0,0 +1,131 @@
+from datetime import date
+from itertools import product
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+
+from ..models import Customer, CustomerStats, DailyDealStats, Deal, Gem
+from ..services import (
+    _get_generation,
+    filter_daily_stats,
+    get_current_generation_id,
+)
+
+
+class TestIndexes(TestCase):
+    """Проверка (по плану выполнения запросов SQLite), что запросы используют индексы."""
+
+    def setUp(self) -> None:
+        """Создаёт входные данные для тестов."""
+
+        if connection.vendor != "sqlite":
+            self.skipTest("Планы запросов проверяются только для SQLite.")
+        customer = Customer.objects.create(username="test")
+        gem = Gem.objects.create(name="test_gem")
+        generation = get_current_generation_id()
+        Deal.objects.create(
+            generation_id=generation,
+            customer=customer,
+            item=gem,
+            total=100,
+            quantity=1,
+            date="2023-08-01 12:00:00+00:00",
+        )
+        CustomerStats.objects.create(
+            generation_id=generation, customer=customer, spent_money=100, deals_count=1
+        )
+        # Сервисы отбирают данные текущего поколения по ID или подзапросом
+        self.generations = (generation, _get_generation(None))
+
+    def assertUsesIndex(self, queryset, *plan_parts: str) -> None:
+        """Проверяет, что план выполнения запроса (EXPLAIN QUERY PLAN)
+        содержит строку, включающую все plan_parts.
+        """
+
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(
+            any(all(part in line for part in plan_parts) for line in plan),
+            "\n".join(plan),
+        )
+
+    def test_customer_username_lookup_uses_unique_index(self) -> None:
+        """Тест поиска клиентов по логину (разрешение имён при загрузке)."""
+
+        self.assertUsesIndex(
+            Customer.objects.filter(username__in=["test", "test2"]),
+            "SEARCH deal_api_customer USING COVERING INDEX",
+            "(username=?)",
+        )
+
+    def test_gem_name_lookup_uses_unique_index(self) -> None:
+        """Тест поиска драгоценных камней по названию."""
+
+        self.assertUsesIndex(
+            Gem.objects.filter(name__in=["test_gem"]),
+            "SEARCH deal_api_gem USING COVERING INDEX",
+            "(name=?)",
+        )
+
+    def test_top_customers_uses_spent_money_index(self) -> None:
+        """Тест выборки клиентов, потративших наибольшую сумму."""
+
+        for generation in self.generations:
+            self.assertUsesIndex(
+                CustomerStats.objects.filter(generation=generation).order_by(
+                    "-spent_money"
+                )[:5],
+                "SEARCH deal_api_customerstats USING INDEX deal_api_stats_spent_idx",
+            )
+
+    def test_customer_spent_money_aggregation_uses_covering_index(self) -> None:
+        """Тест подсчёта суммы сделок клиентов."""
+
+        for generation in self.generations:
+            self.assertUsesIndex(
+                Deal.objects.filter(generation=generation, customer__in=[1, 2])
+                .values("customer")
+                .annotate(spent_money=Sum("total"))
+                .order_by(),
+                "SEARCH deal_api_deal USING COVERING INDEX "
+                "deal_api_deal_cust_total_idx",
+            )
+
+    def test_customers_gems_pairs_use_natural_key_index(self) -> None:
+        """Тест выборки пар (клиент, камень) для поиска общих камней клиентов."""
+
+        for generation in self.generations:
+            self.assertUsesIndex(
+                Deal.objects.filter(generation=generation, customer__in=[1, 2])
+                .values_list("customer", "item__name")
+                .order_by("item", "customer")
+                .distinct(),
+                "SEARCH deal_api_deal USING COVERING INDEX",
+                "(generation_id=? AND customer_id=?)",
+            )
+
+    def test_windowed_aggregation_uses_daily_stats_indexes(self) -> None:
+        """Тест подсчёта суммы сделок клиентов за период (и по камню)."""
+
+        for generation, (item, index) in product(
+            self.generations,
+            (
+                (None, "deal_api_daily_day_idx"),
+                ("test_gem", "deal_api_daily_item_day_idx"),
+            ),
+        ):
+            self.assertUsesIndex(
+                filter_daily_stats(
+                    DailyDealStats.objects.filter(generation=generation),
+                    date(2023, 8, 1),
+                    date(2023, 8, 31),
+                    item,
+                )
+                .values("customer")
+                .annotate(spent_money=Sum("total"))
+                .order_by(),
+                f"USING COVERING INDEX {index}",
+            )
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from ..renderers import ORJSONRenderer
+
+
+class TestORJSONRenderer(SimpleTestCase):
+    """Тестирование рендерера JSON на основе orjson."""
+
+    def setUp(self) -> None:
+        """Создаёт входные данные для тестов."""
+
+        self.data = {
+            "response": [
+                {"username": "resplendent", "spent_money": 451731, "gems": ["Сапфир"]},
+            ],
+            "created_at": datetime(2023, 8, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+            "text": "line\u2028separator",
+            1: None,
+        }
+
+    def test_render_matches_json_renderer(self) -> None:
+        """Тест: результат совпадает с результатом JSONRenderer."""
+
+        self.assertEqual(
+            ORJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+        )
+
+    def test_render_with_indent_falls_back_to_json_renderer(self) -> None:
+        """Тест: JSON с отступами формирует JSONRenderer."""
+
+        media_type = "application/json; indent=4"
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_render_without_orjson(self) -> None:
+        """Тест: без orjson используется JSONRenderer."""
+
+        with mock.patch("deal_api.renderers.orjson", None):
+            self.assertEqual(
+                ORJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+            )
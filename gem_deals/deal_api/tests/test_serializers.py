@@ -1,30 +1,28 @@
-from django.test import TestCase
+from datetime import date
 
-from ..models import Gem
-from ..serializers import CustomerSerializer
+from django.test import TestCase, override_settings
+
+from ..serializers import TopCustomersQuerySerializer
 
 
 class TestSerializers(TestCase):
-    """Тестирование сериализатора для результирующего набора клиентов."""
+    """Тестирование сериализатора параметров запроса списка клиентов."""
 
-    def setUp(self):
-        """Создаёт входные данные для тестов."""
-        
-        
-        self.serialized_obj = {
-            "username": "resplendent",
-            "spent_money": 451731,
-            "gems": ["Сапфир", "Рубин", "Танзанит"],
-        }
+    @override_settings(GET_ROWS_LIMIT_MAX=10)
+    def test_top_customers_query_serializer(self):
+        """Тест на проверку параметров запроса: количества клиентов и периода."""
 
-    def test_result_customer_serializers(self):
-        """Тест на корректную сериализацию результирующей информации о клиенте."""
-        
-        
-        customer = {
-            "customer": "38",
-            "customer__username": "resplendent",
-            "spent_money": 451731,
-            "gems": [Gem(name="Сапфир"), Gem(name="Рубин"), Gem(name="Танзанит")],
-        }
-        self.assertEqual(self.serialized_obj, CustomerSerializer(customer).data)
+        serializer = TopCustomersQuerySerializer(
+            data={"limit": "10", "date_from": "2023-08-01", "date_to": "2023-08-01"}
+        )
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            serializer.validated_data,
+            {"limit": 10, "date_from": date(2023, 8, 1), "date_to": date(2023, 8, 1)},
+        )
+        for data in (
+            {"limit": "11"},
+            {"date_from": "2023-08-02", "date_to": "2023-08-01"},
+        ):
+            with self.subTest(data=data):
+                self.assertFalse(TopCustomersQuerySerializer(data=data).is_valid())
@@ -1,8 +1,32 @@
-from django.test import TestCase
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from unittest import mock
 
-from ..models import Customer, Deal, Gem
-from ..services import (_get_file_extension, add_gems_field_to_customers_data,
-                        get_customer_gems, get_largest_amount_customers)
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import services
+from ..caching import get_data_version
+from ..models import (Customer, CustomerStats, DailyDealStats,
+                      DatasetGeneration, Deal, Gem, IngestMode)
+from ..services import (CopyDealLoader, CsvReader, DealColumns,
+                        OrmDealLoader, _get_deal_loader, _get_file_extension,
+                        add_gems_field_to_customers_data, check_customer_stats,
+                        delete_retired_generations,
+                        get_data_from_file,
+                        get_current_generation_id,
+                        get_data_stream_from_file, get_deal_columns_stream_from_file,
+                        get_largest_amount_customers,
+                        refresh_customer_stats, refresh_daily_stats,
+                        save_data_in_db, save_deal_columns_in_db)
 
 
 class TestServices(TestCase):
@@ -17,6 +41,7 @@ class TestServices(TestCase):
         self.gem1 = Gem.objects.create(name="test_gem1")
         self.gem2 = Gem.objects.create(name="test_gem2")
         self.deal1 = Deal.objects.create(
+            generation_id=get_current_generation_id(),
             customer=self.customer,
             item=self.gem1,
             total=5000,
@@ -24,6 +49,7 @@ class TestServices(TestCase):
             date="2023-08-01 12:00:00",
         )
         self.deal2 = Deal.objects.create(
+            generation_id=get_current_generation_id(),
             customer=self.customer,
             item=self.gem2,
             total=7000,
@@ -31,12 +57,15 @@ class TestServices(TestCase):
             date="2023-08-01 12:01:00",
         )
         self.deal3 = Deal.objects.create(
+            generation_id=get_current_generation_id(),
             customer=self.customer2,
             item=self.gem2,
             total=1000,
             quantity=3,
             date="2023-08-01 12:03:00",
         )
+        refresh_customer_stats()
+        refresh_daily_stats()
 
     def test_get_file_extension(self) -> None:
         """Тест определения расширения файла."""
@@ -49,15 +78,6 @@ class TestServices(TestCase):
         self.assertEqual(extension2, ".csv")
         self.assertEqual(extension3, "")
 
-    def test_get_customer_gems(self) -> None:
-        """Тест получение камней клиента."""
-        
-        
-        gems = get_customer_gems(self.customer.id)
-        self.assertEqual(len(gems), 2)
-        self.assertEqual(str(gems[0]), "test_gem1")
-        self.assertEqual(str(gems[1]), "test_gem2")
-
     def test_get_largest_amount_customers(self) -> None:
         """Тест получение списка клиентов, потративших наибольшее количество денег."""
         
@@ -74,3 +94,617 @@ class TestServices(TestCase):
         customers = get_largest_amount_customers(limit=2)
         add_gems_field_to_customers_data(customers)
         self.assertEqual(len(customers[0]["gems"]), 1)
+
+    def test_add_gems_field_to_customers_data_single_query(self) -> None:
+        """Тест на получение общих камней клиентов одним запросом к БД."""
+
+        customer3 = Customer.objects.create(username="test3")
+        Deal.objects.create(
+            generation_id=get_current_generation_id(),
+            customer=customer3,
+            item=self.gem1,
+            total=100,
+            quantity=1,
+            date="2023-08-01 12:04:00",
+        )
+        refresh_customer_stats([customer3.id])
+        customers = get_largest_amount_customers(limit=3)
+        with self.assertNumQueries(1):
+            add_gems_field_to_customers_data(customers)
+        gems = {
+            customer["customer__username"]: customer["gems"] for customer in customers
+        }
+        self.assertEqual(
+            gems,
+            {
+                "test": ["test_gem1", "test_gem2"],
+                "test2": ["test_gem2"],
+                "test3": ["test_gem1"],
+            },
+        )
+
+    def test_get_largest_amount_customers_with_filters(self) -> None:
+        """Тест получения клиентов, потративших наибольшую сумму за период и по камню."""
+
+        Deal.objects.create(
+            generation_id=get_current_generation_id(),
+            customer=self.customer2,
+            item=self.gem1,
+            total=20000,
+            quantity=1,
+            date="2023-08-02 00:00:00",
+        )
+        refresh_daily_stats([date(2023, 8, 2)])
+
+        def spent(customers):
+            return [
+                (customer["customer__username"], customer["spent_money"])
+                for customer in customers
+            ]
+
+        self.assertEqual(
+            spent(get_largest_amount_customers(5, date_from=date(2023, 8, 2))),
+            [("test2", 20000)],
+        )
+        self.assertEqual(
+            spent(get_largest_amount_customers(5, date_to=date(2023, 8, 1))),
+            [("test", 12000), ("test2", 1000)],
+        )
+        self.assertEqual(
+            spent(get_largest_amount_customers(5, item="test_gem2")),
+            [("test", 7000), ("test2", 1000)],
+        )
+        customers = get_largest_amount_customers(5, date_to=date(2023, 8, 1))
+        add_gems_field_to_customers_data(customers, date_to=date(2023, 8, 1))
+        self.assertEqual(
+            [customer["gems"] for customer in customers], [["test_gem2"]] * 2
+        )
+
+    def test_save_data_in_db(self) -> None:
+        """Тест пакетного сохранения сделок (старые данные заменяются новыми)."""
+
+        deals = [
+            {
+                "customer": f"customer{i % 3}",
+                "item": f"gem{i % 4}",
+                "total": str(100 + i),
+                "quantity": "1",
+                "date": "2023-08-01 12:00:00",
+            }
+            for i in range(50)
+        ]
+        saved = save_data_in_db(deals, batch_size=20)
+        self.assertEqual(saved, 50)
+        self.assertEqual(
+            Deal.objects.filter(generation=get_current_generation_id()).count(), 50
+        )
+        with override_settings(DATASET_RETENTION_SECONDS=0):
+            delete_retired_generations()
+        self.assertEqual(Deal.objects.count(), 50)
+        self.assertEqual(Customer.objects.count(), 3)
+        self.assertEqual(
+            list(Gem.objects.order_by("id").values_list("name", flat=True)),
+            ["gem0", "gem1", "gem2", "gem3"],
+        )
+
+    def test_save_data_in_db_queries_do_not_depend_on_rows(self) -> None:
+        """Тест количества запросов при сохранении: не зависит от числа строк в пакете."""
+
+        def make_deals(count):
+            return [
+                {
+                    "customer": f"customer{i % 5}",
+                    "item": f"gem{i % 5}",
+                    "total": "10",
+                    "quantity": "1",
+                    "date": "2023-08-01 12:00:00",
+                }
+                for i in range(count)
+            ]
+
+        save_data_in_db(make_deals(10))
+        with CaptureQueriesContext(connection) as small:
+            save_data_in_db(make_deals(10), batch_size=1000)
+        with CaptureQueriesContext(connection) as large:
+            save_data_in_db(make_deals(100), batch_size=1000)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_get_data_stream_from_file(self) -> None:
+        """Тест потокового чтения csv-файла: результат совпадает с чтением файла целиком."""
+
+        with open("deals.csv", "rb") as file:
+            content = file.read()
+        chunks = (content[i : i + 7] for i in range(0, len(content), 7))
+        deals = get_data_stream_from_file("deals.csv", chunks)
+        self.assertEqual(list(deals), get_data_from_file("deals.csv", content))
+
+    def test_get_data_stream_from_file_without_deals(self) -> None:
+        """Тест потокового чтения csv-файла, в котором есть только заголовок."""
+
+        deals = get_data_stream_from_file(
+            "deals.csv", [b"customer,item,total,quantity,date\r\n"]
+        )
+        self.assertIsNone(deals)
+
+    def test_get_deal_columns_stream_from_file(self) -> None:
+        """Тест колоночного чтения csv-файла (с NumPy и без него):
+        значения совпадают с построчным чтением файла."""
+
+        with open("deals.csv", "rb") as file:
+            content = file.read()
+        expected = [
+            (
+                deal["customer"],
+                deal["item"],
+                int(deal["total"]),
+                int(deal["quantity"]),
+                timezone.make_aware(datetime.fromisoformat(deal["date"])),
+            )
+            for deal in get_data_from_file("deals.csv", content)
+        ]
+        for numpy_module in (services.np, None):
+            with self.subTest(numpy=numpy_module is not None), mock.patch.object(
+                services, "np", numpy_module
+            ):
+                blocks = list(
+                    get_deal_columns_stream_from_file(
+                        "deals.csv", [content], block_size=100
+                    )
+                )
+                rows = [
+                    (
+                        block.customers.names[customer_code],
+                        block.items.names[item_code],
+                        total,
+                        quantity,
+                        deal_date,
+                    )
+                    for block in blocks
+                    for customer_code, item_code, total, quantity, deal_date in zip(
+                        block.customer_codes.tolist(),
+                        block.item_codes.tolist(),
+                        block.total.tolist(),
+                        block.quantity.tolist(),
+                        block.get_dates(),
+                    )
+                ]
+                self.assertEqual([len(block) for block in blocks], [100] * 7 + [67])
+                self.assertEqual(rows, expected)
+                self.assertEqual(blocks[0].customers.names[0], expected[0][0])
+
+    @override_settings(INGEST_COPY_LOADER=False)
+    def test_deal_columns_share_name_dictionaries(self) -> None:
+        """Тест словарного кодирования имён: словари общие для всех блоков файла,
+        а имена разрешаются в id БД один раз, а не для каждого блока."""
+
+        content = "customer,item,total,quantity,date\r\n" + "".join(
+            f"customer{i % 5},gem{i % 3},{100 + i},1,2023-08-01 12:00:00\r\n"
+            for i in range(300)
+        )
+        blocks = list(
+            get_deal_columns_stream_from_file(
+                "deals.csv", [content.encode()], block_size=50
+            )
+        )
+        self.assertEqual(len(blocks), 6)
+        self.assertTrue(all(block.customers is blocks[0].customers for block in blocks))
+        self.assertEqual(len(blocks[0].customers), 5)
+        self.assertEqual(blocks[-1].customer_codes.tolist()[:6], [0, 1, 2, 3, 4, 0])
+        with CaptureQueriesContext(connection) as queries:
+            saved = save_deal_columns_in_db(blocks, batch_size=1000)
+        name_queries = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "deal_api_customer"' in query["sql"]
+            and '"deal_api_customer"."username" IN' in query["sql"]
+        ]
+        self.assertEqual(saved, 300)
+        self.assertEqual(len(name_queries), 2)
+        self.assertEqual(Customer.objects.filter(username__startswith="customer").count(), 5)
+        self.assertEqual(
+            Deal.objects.filter(generation=get_current_generation_id()).count(), 300
+        )
+
+    def test_deal_columns_invalid_value(self) -> None:
+        """Тест колоночного разбора некорректных строк (с NumPy и без него)."""
+
+        header = ["customer", "item", "total", "quantity", "date"]
+        for numpy_module in (services.np, None):
+            with self.subTest(numpy=numpy_module is not None), mock.patch.object(
+                services, "np", numpy_module
+            ):
+                with self.assertRaises(csv.Error):
+                    DealColumns.from_rows(
+                        header, [["user", "Рубин", "много", "1", "2023-08-01"]]
+                    )
+                with self.assertRaises(csv.Error):
+                    DealColumns.from_rows(header, [["user", "Рубин", "100", "1"]])
+                with self.assertRaises(csv.Error):
+                    save_data_in_db([{"customer": "user", "item": "Рубин"}])
+
+    def test_deal_columns_row_length(self) -> None:
+        """Тест: строка с количеством значений, не совпадающим с заголовком, вызывает
+        ошибку с номером строки; блок из пустых строк - пустой."""
+
+        content = (
+            "customer,item,total,quantity,date\n"
+            "user,Рубин,100,1,2023-08-01\n"
+            "\n"
+            "\n"
+            "user,Рубин,100\n"
+        ).encode()
+        blocks = get_deal_columns_stream_from_file(
+            "deals.csv", [content], delimiter=",", block_size=2
+        )
+        self.assertEqual(len(next(blocks)), 1)
+        with self.assertRaisesRegex(csv.Error, "Строка 5"):
+            next(blocks)
+        header = ["customer", "item", "total", "quantity", "date"]
+        with self.assertRaisesRegex(csv.Error, "Строка 2"):
+            DealColumns.from_rows(header, [["user", "Рубин", "100", "1", "2023-08-01", "лишнее"]])
+        self.assertEqual(len(DealColumns.from_rows(header, [[], []])), 0)
+
+    def test_get_deal_loader(self) -> None:
+        """Тест выбора загрузчика сделок по СУБД подключения."""
+
+        with mock.patch.object(services.connection, "vendor", "sqlite"):
+            self.assertIsInstance(_get_deal_loader(100, 1), OrmDealLoader)
+        with mock.patch.object(services.connection, "vendor", "postgresql"):
+            self.assertIsInstance(_get_deal_loader(100, 1), CopyDealLoader)
+            with override_settings(INGEST_COPY_LOADER=False):
+                self.assertIsInstance(_get_deal_loader(100, 1), OrmDealLoader)
+
+    def test_copy_deal_loader(self) -> None:
+        """Тест загрузчика для PostgreSQL: блок передаётся командой COPY в формате csv,
+        затем переносится в таблицы приложения запросами INSERT ... SELECT."""
+
+        header = ["customer", "item", "total", "quantity", "date"]
+        block = DealColumns.from_rows(
+            header,
+            [
+                ["user", "Рубин", "100", "1", "2023-08-01 12:00:00"],
+                ['user "2"', "Сапфир, синий", "200", "2", "2023-08-02 00:00:00+03:00"],
+            ],
+        )
+        loader = CopyDealLoader(100, 7)
+        with mock.patch.object(services.connection, "cursor") as cursor_factory:
+            cursor = cursor_factory.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [(1, 100, 1), (2, 200, 1)]
+            loader.save_block(block)
+        (copy_sql, buffer), _ = cursor.copy_expert.call_args
+        self.assertIn("FROM STDIN WITH (FORMAT csv)", copy_sql)
+        rows = list(csv.reader(buffer.getvalue().splitlines()))
+        self.assertEqual(
+            [row[:4] for row in rows],
+            [["user", "Рубин", "100", "1"], ['user "2"', "Сапфир, синий", "200", "2"]],
+        )
+        self.assertEqual(
+            [datetime.fromisoformat(row[4]) for row in rows],
+            [
+                timezone.make_aware(datetime(2023, 8, 1, 12)),
+                timezone.make_aware(datetime(2023, 8, 1, 21)),
+            ],
+        )
+        statements = [call.args for call in cursor.execute.call_args_list]
+        self.assertTrue(statements[0][0].startswith('DROP TABLE IF EXISTS "deal_api_deal_staging"'))
+        self.assertIn(
+            [7],
+            [params for sql, *params in statements if 'INSERT INTO "deal_api_deal" (' in sql][0],
+        )
+        self.assertEqual(loader.get_customer_totals(), {1: [100, 1], 2: [200, 1]})
+
+    @override_settings(CSV_SNIFF_SAMPLE_SIZE=1024)
+    def test_csv_reader_sniffs_bounded_sample(self) -> None:
+        """Тест определения диалекта по ограниченному декодированному началу файла."""
+
+        with open("deals.csv", "rb") as file:
+            content = file.read()
+        sniff = csv.Sniffer.sniff
+        samples = []
+
+        def sniff_spy(sniffer, sample, delimiters=None):
+            samples.append(sample)
+            return sniff(sniffer, sample, delimiters)
+
+        with mock.patch.object(csv.Sniffer, "sniff", sniff_spy):
+            deals = get_data_from_file("deals.csv", content)
+        self.assertEqual(len(deals), 767)
+        self.assertEqual(len(samples), 1)
+        self.assertLessEqual(len(samples[0]), 1024)
+        self.assertTrue(samples[0].endswith("\n"))
+        self.assertIn("Сапфир", samples[0])
+
+    def test_csv_reader_delimiter_override(self) -> None:
+        """Тест явно заданного разделителя полей: диалект не определяется автоматически."""
+
+        content = "customer;item;total;quantity;date\nuser;Рубин;100;1;2023-08-01\n"
+        with mock.patch.object(csv.Sniffer, "sniff", side_effect=csv.Error):
+            deals = get_data_from_file("deals.csv", content.encode(), delimiter=";")
+            with override_settings(CSV_DELIMITER=";"):
+                stream = get_data_stream_from_file("deals.csv", [content.encode()])
+                reader = CsvReader(content.encode())
+        self.assertEqual(deals[0]["item"], "Рубин")
+        self.assertEqual(list(stream), deals)
+        self.assertEqual(next(reader.get_reader()), content.splitlines()[0].split(";"))
+
+    def test_save_data_in_db_append_mode(self) -> None:
+        """Тест добавления сделок к уже сохранённым (дубликаты пропускаются)."""
+
+        deals = [
+            {
+                "customer": "test",
+                "item": "test_gem1",
+                "total": "5000",
+                "quantity": "2",
+                "date": "2023-08-01 12:00:00+00:00",
+            },
+            {
+                "customer": "test3",
+                "item": "test_gem3",
+                "total": "300",
+                "quantity": "1",
+                "date": "2023-08-02 12:00:00+00:00",
+            },
+        ]
+        save_data_in_db(deals + deals, mode=IngestMode.APPEND)
+        self.assertEqual(Deal.objects.count(), 4)
+        self.assertEqual(Customer.objects.count(), 3)
+        self.assertEqual(Gem.objects.count(), 3)
+        self.assertTrue(
+            Deal.objects.filter(customer__username="test3", total=300).exists()
+        )
+
+    def test_save_data_in_db_replace_mode_keeps_repeated_deals(self) -> None:
+        """Тест загрузки в режиме замены: повторяющиеся в файле сделки сохраняются
+        и учитываются в суммах клиентов."""
+
+        deal = {
+            "customer": "test3",
+            "item": "test_gem1",
+            "total": "300",
+            "quantity": "1",
+            "date": "2023-08-02 12:00:00+00:00",
+        }
+        save_data_in_db([deal, deal, dict(deal, customer="test4")], batch_size=2)
+        self.assertEqual(
+            Deal.objects.filter(
+                generation=get_current_generation_id(), customer__username="test3"
+            ).count(),
+            2,
+        )
+        customers = get_largest_amount_customers(limit=2)
+        self.assertEqual(
+            [(customer["customer__username"], customer["spent_money"]) for customer in customers],
+            [("test3", 600), ("test4", 300)],
+        )
+
+    def test_largest_amount_customers_with_equal_totals(self) -> None:
+        """Тест: клиенты с одинаковой суммой упорядочиваются по id
+        (с фильтрами и без них)."""
+
+        deal = {
+            "customer": "test_b",
+            "item": "test_gem1",
+            "total": "300",
+            "quantity": "1",
+            "date": "2023-08-02 12:00:00+00:00",
+        }
+        save_data_in_db([deal, dict(deal, customer="test_a"), dict(deal, customer="test_c")])
+        expected = list(
+            Customer.objects.filter(username__in=["test_a", "test_b", "test_c"])
+            .order_by("id")
+            .values_list("username", flat=True)
+        )
+        for filters in ({}, {"item": "test_gem1"}):
+            with self.subTest(filters=filters):
+                customers = get_largest_amount_customers(limit=3, **filters)
+                self.assertEqual(
+                    [customer["customer__username"] for customer in customers], expected
+                )
+
+    def test_save_data_in_db_updates_customer_stats(self) -> None:
+        """Тест обновления статистики клиентов при загрузке сделок."""
+
+        deals = [
+            {
+                "customer": "test2",
+                "item": "test_gem1",
+                "total": "20000",
+                "quantity": "1",
+                "date": "2023-08-02 12:00:00+00:00",
+            },
+        ]
+        save_data_in_db(deals, mode=IngestMode.APPEND)
+        customers = get_largest_amount_customers(limit=2)
+        self.assertEqual(customers[0]["customer__username"], "test2")
+        self.assertEqual(customers[0]["spent_money"], 21000)
+        self.assertEqual(customers[1]["spent_money"], 12000)
+        stats = CustomerStats.objects.get(customer=self.customer2)
+        self.assertEqual(stats.deals_count, 2)
+
+    def test_save_data_in_db_append_mode_adds_to_customer_stats(self) -> None:
+        """Тест: в режиме добавления к статистике клиентов прибавляются только
+        новые сделки (пропущенные повторы не учитываются), сохранённые ранее
+        сделки клиентов не перечитываются."""
+
+        deals = [
+            {
+                "customer": "test2",
+                "item": "test_gem1",
+                "total": "200",
+                "quantity": "1",
+                "date": "2023-08-03 12:00:00+00:00",
+            },
+            {
+                "customer": "new_customer",
+                "item": "test_gem1",
+                "total": "100",
+                "quantity": "1",
+                "date": "2023-08-03 12:00:00+00:00",
+            },
+        ]
+        with mock.patch.object(
+            services, "_aggregate_customer_stats", wraps=services._aggregate_customer_stats
+        ) as aggregate:
+            save_data_in_db(deals + deals, mode=IngestMode.APPEND, batch_size=1)
+            save_data_in_db(deals, mode=IngestMode.APPEND)
+        aggregate.assert_not_called()
+        stats = CustomerStats.objects.filter(generation=get_current_generation_id())
+        self.assertEqual(stats.get(customer=self.customer2).spent_money, 1200)
+        self.assertEqual(stats.get(customer=self.customer2).deals_count, 2)
+        self.assertEqual(
+            stats.filter(customer__username="new_customer").values_list(
+                "spent_money", "deals_count"
+            ).get(),
+            (100, 1),
+        )
+        self.assertEqual(check_customer_stats(), [])
+
+    def test_save_data_in_db_updates_daily_stats(self) -> None:
+        """Тест обновления статистики по дням при загрузке сделок."""
+
+        deals = [
+            {
+                "customer": "test2",
+                "item": "test_gem2",
+                "total": "500",
+                "quantity": "1",
+                "date": "2023-08-01 23:00:00+00:00",
+            },
+            {
+                "customer": "test2",
+                "item": "test_gem2",
+                "total": "300",
+                "quantity": "2",
+                "date": "2023-08-02 01:00:00+03:00",
+            },
+        ]
+        save_data_in_db(deals, mode=IngestMode.APPEND)
+        stats = DailyDealStats.objects.filter(customer=self.customer2).values_list(
+            "day", "total", "quantity", "deals_count"
+        )
+        self.assertEqual(
+            sorted(stats),
+            [(date(2023, 8, 1), 1800, 6, 3)],
+        )
+        save_data_in_db(deals, mode=IngestMode.REPLACE)
+        daily_stats = DailyDealStats.objects.filter(generation=get_current_generation_id())
+        self.assertEqual(daily_stats.count(), 1)
+        self.assertEqual(daily_stats.values_list("total", flat=True).get(), 800)
+
+    def test_replace_publishes_new_generation(self) -> None:
+        """Тест загрузки в режиме замены: пока сделки сохраняются в новое поколение,
+        запросы читают прежнее, после загрузки - новое; прежнее поколение удаляется
+        по истечении DATASET_RETENTION_SECONDS."""
+
+        previous_generation = get_current_generation_id()
+        previous_top = get_largest_amount_customers(5)
+        top_during_load = []
+        deals = [
+            {
+                "customer": "new_customer",
+                "item": "test_gem1",
+                "total": "100",
+                "quantity": "1",
+                "date": "2023-08-02 12:00:00",
+            }
+        ]
+        save_data_in_db(
+            deals,
+            on_batch_saved=lambda _: top_during_load.append(
+                get_largest_amount_customers(5)
+            ),
+        )
+        self.assertEqual(top_during_load, [previous_top])
+        generation = get_current_generation_id()
+        self.assertNotEqual(generation, previous_generation)
+        customers = get_largest_amount_customers(5)
+        add_gems_field_to_customers_data(customers)
+        self.assertEqual(
+            [(customer["customer__username"], customer["spent_money"]) for customer in customers],
+            [("new_customer", 100)],
+        )
+        self.assertFalse(Deal.objects.filter(generation=generation, customer=self.customer).exists())
+        self.assertIsNotNone(DatasetGeneration.objects.get(id=previous_generation).retired_at)
+
+        self.assertEqual(delete_retired_generations(), 0)
+        with override_settings(DATASET_RETENTION_SECONDS=0):
+            stdout = io.StringIO()
+            call_command("delete_retired_datasets", stdout=stdout)
+        self.assertIn("1", stdout.getvalue())
+        self.assertEqual(
+            list(DatasetGeneration.objects.values_list("id", flat=True)), [generation]
+        )
+        self.assertEqual(Deal.objects.count(), 1)
+        self.assertEqual(
+            sorted(Customer.objects.values_list("username", flat=True)), ["new_customer"]
+        )
+        self.assertEqual(
+            sorted(Gem.objects.values_list("name", flat=True)), ["test_gem1"]
+        )
+
+    def test_rebuild_customer_stats_command(self) -> None:
+        """Тест команды перестроения и проверки статистики клиентов."""
+
+        CustomerStats.objects.filter(customer=self.customer).update(spent_money=1)
+        with self.assertRaises(CommandError):
+            call_command(
+                "rebuild_customer_stats",
+                "--check",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+        call_command("rebuild_customer_stats", stdout=io.StringIO())
+        stats = CustomerStats.objects.get(customer=self.customer)
+        self.assertEqual(stats.spent_money, 12000)
+
+    def test_bench_deals_command(self) -> None:
+        """Тест команды замера производительности на синтетических данных
+        и сравнения результатов с базовыми."""
+
+        data_version = get_data_version()
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "deal_api.management.commands.bench_deals.benchmark_database",
+            contextlib.nullcontext,
+        ):
+            output = os.path.join(directory, "results.json")
+            options = ["--rows", "200", "--customers", "20", "--warm-requests", "3"]
+            call_command("bench_deals", *options, "--output", output, stdout=io.StringIO())
+            with open(output, encoding="utf-8") as file:
+                results = json.load(file)
+            # Замеры выполняются с кэшем в памяти процесса, кэш проекта не меняется
+            self.assertEqual(
+                results["environment"]["cache"],
+                "django.core.cache.backends.locmem.LocMemCache",
+            )
+            self.assertEqual(get_data_version(), data_version)
+            self.assertEqual(
+                list(results["phases"]),
+                ["generate", "sniff", "parse", "save", "cold_get", "warm_get"],
+            )
+            self.assertEqual(results["phases"]["parse"]["queries"], 0)
+            self.assertGreater(results["phases"]["cold_get"]["queries"], 0)
+            self.assertEqual(results["phases"]["warm_get"]["queries"], 0)
+            self.assertEqual(
+                Deal.objects.filter(generation=get_current_generation_id()).count(), 200
+            )
+
+            results["phases"]["save"]["seconds"] /= 100
+            results["phases"]["warm_get"]["queries"] = -1
+            with open(output, "w", encoding="utf-8") as file:
+                json.dump(results, file)
+            stderr = io.StringIO()
+            with self.assertRaises(CommandError):
+                call_command(
+                    "bench_deals",
+                    *options,
+                    "--compare",
+                    output,
+                    "--min-seconds",
+                    "0",
+                    stdout=io.StringIO(),
+                    stderr=stderr,
+                )
+        self.assertIn("save:", stderr.getvalue())
+        self.assertIn("warm_get:", stderr.getvalue())
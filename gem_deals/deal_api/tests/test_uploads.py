@@ -0,0 +1,195 @@
+import io
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from ..models import ChunkedUpload, Deal, IngestJobStatus
+from ..uploads import UploadOffsetError, delete_expired_uploads, write_upload_chunk
+
+
+@override_settings(INGEST_BACKGROUND=False, INGEST_UPLOAD_DIR=tempfile.gettempdir())
+class TestChunkedUploads(TestCase):
+    """Тестирование загрузки файлов частями."""
+
+    def setUp(self) -> None:
+        """Создаёт входные данные для тестов."""
+
+        self.client = Client()
+        self.UPLOADS_URL = reverse("deal_api:uploads")
+        with open("deals.csv", "rb") as file:
+            self.content = file.read()
+
+    def tearDown(self) -> None:
+        """Удаляет временные файлы загрузок."""
+
+        for file_path in ChunkedUpload.objects.values_list("file_path", flat=True):
+            Path(file_path).unlink(missing_ok=True)
+
+    def start_upload(self, **data) -> dict:
+        """Начинает загрузку файла частями."""
+
+        response = self.client.post(
+            self.UPLOADS_URL, {"file_name": "deals.csv", **data}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()
+
+    def put_chunk(self, upload: dict, offset: int, chunk: bytes):
+        """Отправляет часть файла."""
+
+        return self.client.put(
+            f"{upload['upload_url']}?offset={offset}",
+            chunk,
+            content_type="application/octet-stream",
+        )
+
+    def test_upload_file_in_chunks(self) -> None:
+        """Тест загрузки файла частями и его обработки после завершения загрузки."""
+
+        upload = self.start_upload()
+        self.assertEqual(upload["offset"], 0)
+        chunk_size = 10000
+        for offset in range(0, len(self.content), chunk_size):
+            response = self.put_chunk(
+                upload, offset, self.content[offset : offset + chunk_size]
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(upload["upload_url"])
+        self.assertEqual(response.json()["offset"], len(self.content))
+        response = self.client.post(
+            f"{upload['upload_url']}finalize/?size={len(self.content)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = self.client.get(response.json()["job_url"]).json()
+        self.assertEqual(job["status"], IngestJobStatus.DONE)
+        self.assertEqual(job["rows_written"], 767)
+        self.assertEqual(Deal.objects.count(), 767)
+        upload = ChunkedUpload.objects.get(id=upload["id"])
+        self.assertFalse(os.path.exists(upload.file_path))
+
+    def test_resume_upload_after_wrong_offset(self) -> None:
+        """Тест: часть с неверным смещением отклоняется, загрузку можно продолжить."""
+
+        upload = self.start_upload()
+        self.put_chunk(upload, 0, self.content[:100])
+        response = self.put_chunk(upload, 200, self.content[200:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()["offset"], 100)
+        response = self.put_chunk(upload, 100, self.content[100:])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with open(ChunkedUpload.objects.get(id=upload["id"]).file_path, "rb") as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_finalize_incomplete_upload(self) -> None:
+        """Тест на получение ошибки при завершении загрузки, если получены не все байты."""
+
+        upload = self.start_upload()
+        self.put_chunk(upload, 0, self.content[:100])
+        response = self.client.post(
+            f"{upload['upload_url']}finalize/?size={len(self.content)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()["offset"], 100)
+        self.assertFalse(Deal.objects.exists())
+
+    def test_finalize_is_idempotent(self) -> None:
+        """Тест: повторное завершение загрузки возвращает ту же задачу."""
+
+        upload = self.start_upload()
+        self.put_chunk(upload, 0, self.content)
+        first = self.client.post(f"{upload['upload_url']}finalize/")
+        second = self.client.post(f"{upload['upload_url']}finalize/")
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(first.json()["job_id"], second.json()["job_id"])
+        response = self.put_chunk(upload, len(self.content), b"more")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_finalize_invalid_csv(self) -> None:
+        """Тест на получение ошибки при завершении загрузки невалидного файла."""
+
+        upload = self.start_upload()
+        self.put_chunk(upload, 0, b"customer,item,total,quantity,date\n")
+        response = self.client.post(f"{upload['upload_url']}finalize/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CHUNKED_UPLOAD_MAX_CHUNK_SIZE=100)
+    def test_chunk_too_large(self) -> None:
+        """Тест на получение ошибки, если часть файла слишком большая."""
+
+        upload = self.start_upload()
+        response = self.put_chunk(upload, 0, self.content[:101])
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self.client.get(upload["upload_url"]).json()["offset"], 0)
+
+    def test_chunk_without_content_length(self) -> None:
+        """Тест на получение ошибки, если не указан или некорректен Content-Length."""
+
+        upload = self.start_upload()
+        response = self.client.generic("PUT", f"{upload['upload_url']}?offset=0")
+        self.assertEqual(response.status_code, status.HTTP_411_LENGTH_REQUIRED)
+        response = self.client.put(
+            f"{upload['upload_url']}?offset=0",
+            self.content[:100],
+            content_type="application/octet-stream",
+            CONTENT_LENGTH="abc",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(upload["upload_url"]).json()["offset"], 0)
+
+    def test_chunk_is_not_written_if_offset_changed(self) -> None:
+        """Тест: часть, для которой смещение изменилось за время её передачи,
+        отклоняется и не перезаписывает полученные байты, временный файл удаляется.
+        """
+
+        upload = self.start_upload()
+        instance = ChunkedUpload.objects.get(id=upload["id"])
+
+        class Stream(io.BytesIO):
+            def read(self, *args) -> bytes:
+                # Другой запрос дописывает часть файла, пока читается эта часть
+                if not self.tell():
+                    write_upload_chunk(instance.id, 0, io.BytesIO(b"first"))
+                return super().read(*args)
+
+        with self.assertRaises(UploadOffsetError):
+            write_upload_chunk(instance.id, 0, Stream(b"second"))
+        with open(instance.file_path, "rb") as file:
+            self.assertEqual(file.read(), b"first")
+        self.assertEqual(
+            list(
+                Path(instance.file_path).parent.glob(
+                    f"{Path(instance.file_path).name}.*"
+                )
+            ),
+            [],
+        )
+
+    def test_start_upload_with_incorrect_parameters(self) -> None:
+        """Тест на получение ошибки при некорректных параметрах загрузки."""
+
+        for data in (
+            {"file_name": "deals.cpp"},
+            {"file_name": "deals.csv", "mode": "merge"},
+            {"file_name": "deals.csv", "delimiter": ";;"},
+        ):
+            response = self.client.post(self.UPLOADS_URL, data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_expired_uploads(self) -> None:
+        """Тест удаления незавершённых загрузок вместе с временными файлами."""
+
+        expired = self.start_upload()
+        active = self.start_upload()
+        ChunkedUpload.objects.filter(id=expired["id"]).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+        file_path = ChunkedUpload.objects.get(id=expired["id"]).file_path
+        self.assertEqual(delete_expired_uploads(), 1)
+        self.assertFalse(os.path.exists(file_path))
+        self.assertTrue(ChunkedUpload.objects.filter(id=active["id"]).exists())
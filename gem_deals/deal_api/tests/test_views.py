@@ -1,9 +1,18 @@
 import json
+import tempfile
+from unittest import mock
 
-from django.test import Client, TestCase
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, Client, TestCase, override_settings
 from rest_framework import status
+from rest_framework.throttling import AnonRateThrottle
 
+from ..caching import clear_local_cache
 
+
+@override_settings(INGEST_BACKGROUND=False, INGEST_UPLOAD_DIR=tempfile.gettempdir())
 class TestDealViewApi(TestCase):
     """Набор тестов для views."""
 
@@ -70,7 +79,7 @@ class TestDealViewApi(TestCase):
         
         data = {"deals": self.file}
         response = self.client.post(self.API_URL, data, format="multipart")
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
     def test_upload_csvfile_json_format(self):
         """Тест на получение корректного ответа формат отправки данных json."""
@@ -78,7 +87,7 @@ class TestDealViewApi(TestCase):
         
         data = {"deals": self.file}
         response = self.client.post(self.API_URL, data, format="json")
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
     def test_upload_csvfile_urlencode_format(self):
         """Тест на получение корректного ответа формат отправки данных x-www-urlencode."""
@@ -88,7 +97,7 @@ class TestDealViewApi(TestCase):
         response = self.client.post(
             self.API_URL, data, format="application/x-www-form-urlencoded"
         )
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
     def test_get_correct_result(self):
         """Тест на получение корректного ответа если данные загружены."""
@@ -100,6 +109,215 @@ class TestDealViewApi(TestCase):
         )
         response2 = self.client.get(self.API_URL)
         json_data_response = json.loads(response2.content)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(response2.status_code, status.HTTP_200_OK)
         self.assertEqual(json_data_response, self.correct_result)
+
+    def test_upload_csvfile_without_deals(self):
+        """Тест на получение ошибки и сохранение прежних данных, если в csv-файле нет сделок."""
+
+        self.client.post(self.API_URL, {"deals": self.file}, format="multipart")
+        empty_file = SimpleUploadedFile(
+            "deals.csv", "customer,item,total,quantity,date\n".encode("utf-8")
+        )
+        response = self.client.post(
+            self.API_URL, {"deals": empty_file}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.API_URL)
+        self.assertEqual(json.loads(response.content), self.correct_result)
+
+    def test_upload_csvfile_with_delimiter(self):
+        """Тест загрузки csv-файла с явно заданным разделителем полей."""
+
+        file = SimpleUploadedFile(
+            "deals.csv",
+            "customer;item;total;quantity;date\nuser;Рубин;100;1;2023-08-01\n".encode(),
+        )
+        response = self.client.post(
+            self.API_URL + "?delimiter=;", {"deals": file}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_upload_csvfile_with_incorrect_delimiter(self):
+        """Тест на получение ошибки, если разделитель полей длиннее одного символа."""
+
+        response = self.client.post(
+            self.API_URL, {"deals": self.file, "delimiter": ";;"}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_request_from_warm_cache_without_queries(self):
+        """Тест на отсутствие запросов к БД при выдаче ответа из кэша."""
+
+        self.client.post(self.API_URL, {"deals": self.file}, format="multipart")
+        self.client.get(self.API_URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.API_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), self.correct_result)
+
+    def test_upload_csvfile_append_mode(self):
+        """Тест повторной загрузки того же файла в режиме добавления: дубликаты пропускаются."""
+
+        self.client.post(self.API_URL, {"deals": self.file}, format="multipart")
+        self.file.seek(0)
+        response = self.client.post(
+            self.API_URL + "?mode=append", {"deals": self.file}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.get(self.API_URL)
+        self.assertEqual(json.loads(response.content), self.correct_result)
+
+    def test_upload_csvfile_incorrect_mode(self):
+        """Тест на получение ошибки при неизвестном режиме загрузки."""
+
+        response = self.client.post(
+            self.API_URL + "?mode=merge", {"deals": self.file}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_request_with_parameters(self):
+        """Тест получения клиентов с параметрами limit, периодом и камнем."""
+
+        self.client.post(self.API_URL, {"deals": self.file}, format="multipart")
+        response = self.client.get(self.API_URL, {"limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response.content)["response"],
+            [
+                {"username": "resplendent", "spent_money": 451731, "gems": ["Сапфир"]},
+                {"username": "bellwether", "spent_money": 217794, "gems": ["Сапфир"]},
+            ],
+        )
+        response = self.client.get(
+            self.API_URL,
+            {"date_from": "2018-12-14", "date_to": "2018-12-14", "item": "Сапфир"},
+        )
+        self.assertEqual(
+            json.loads(response.content)["response"],
+            [{"username": "resplendent", "spent_money": 8502, "gems": []}],
+        )
+        self.client.get(self.API_URL)
+        with self.assertNumQueries(0):
+            self.client.get(self.API_URL, {"limit": 2})
+            self.client.get(self.API_URL, {"limit": 5})
+
+    def test_get_request_with_incorrect_parameters(self):
+        """Тест на получение ошибки при некорректных параметрах запроса."""
+
+        for params in (
+            {"limit": 0},
+            {"limit": 100000},
+            {"date_from": "2019-13-01"},
+            {"date_from": "2019-02-01", "date_to": "2019-01-01"},
+        ):
+            response = self.client.get(self.API_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_request_not_modified_without_queries(self):
+        """Тест условного GET-запроса: при совпадении If-None-Match возвращается
+        статус 304 без обращения к БД и к кэшу ответов, ETag меняется после загрузки."""
+
+        self.client.post(self.API_URL, {"deals": self.file}, format="multipart")
+        response = self.client.get(self.API_URL)
+        etag = response["ETag"]
+        self.assertRegex(etag, r'^"[0-9a-f]{32}"$')
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(
+            sorted(response["Cache-Control"].split(", ")),
+            ["max-age=0", "public", "s-maxage=1"],
+        )
+        self.assertNotEqual(self.client.get(self.API_URL, {"limit": 2})["ETag"], etag)
+        with mock.patch(
+            "deal_api.views.get_top_customers_payload"
+        ) as get_payload, self.assertNumQueries(0):
+            response = self.client.get(self.API_URL, HTTP_IF_NONE_MATCH=etag)
+        get_payload.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        self.file.seek(0)
+        self.client.post(
+            self.API_URL + "?mode=append", {"deals": self.file}, format="multipart"
+        )
+        response = self.client.get(self.API_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(json.loads(response.content), self.correct_result)
+
+
+@override_settings(INGEST_BACKGROUND=False, INGEST_UPLOAD_DIR=tempfile.gettempdir())
+class TestAsyncDealViewApi(TestCase):
+    """Набор тестов для асинхронного представления списка клиентов."""
+
+    def setUp(self) -> None:
+        """Загружает сделки и создаёт асинхронный клиент."""
+
+        cache.clear()
+        clear_local_cache()
+        self.API_URL = "http://127.0.0.1:8000/api/v1/"
+        self.ASYNC_API_URL = self.API_URL + "async/"
+        with open("deals.csv", "rb") as file:
+            deals = SimpleUploadedFile("deals.csv", file.read())
+        Client().post(self.API_URL, {"deals": deals}, format="multipart")
+        self.client = AsyncClient()
+
+    async def test_get_matches_sync_view(self):
+        """Тест: ответ асинхронного представления совпадает с ответом DealAPIView."""
+
+        for params in (
+            {},
+            {"limit": 2},
+            {"date_from": "2018-12-14", "date_to": "2018-12-14", "item": "Сапфир"},
+        ):
+            clear_local_cache()
+            cache.clear()
+            response = await self.client.get(self.ASYNC_API_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertIn("ETag", response)
+            clear_local_cache()
+            cache.clear()
+            sync_response = await sync_to_async(Client().get)(self.API_URL, params)
+            self.assertEqual(response.content, sync_response.content)
+
+    async def test_get_request_queries(self):
+        """Тест: ответ формируется тремя запросами к БД, повторный запрос
+        и условный запрос с совпадающим ETag выполняются без запросов к БД."""
+
+        response = await self.client.get(self.ASYNC_API_URL)
+        self.assertIn('desc="3 queries"', response["Server-Timing"])
+        self.assertIn('desc="miss"', response["Server-Timing"])
+        response = await self.client.get(self.ASYNC_API_URL)
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+        self.assertIn('desc="l1_hit"', response["Server-Timing"])
+        response = await self.client.get(
+            self.ASYNC_API_URL, headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+
+    async def test_get_request_with_incorrect_parameters(self):
+        """Тест на получение ошибки при некорректных параметрах запроса."""
+
+        response = await self.client.get(self.ASYNC_API_URL, {"limit": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content)["Status"], "Error")
+        self.assertIn("limit", json.loads(response.content)["Desc"])
+
+    async def test_get_request_throttled(self):
+        """Тест: к асинхронному представлению применяются ограничения частоты запросов."""
+
+        # История запросов (в т.ч. загрузки сделок в setUp) хранится в кэше
+        cache.clear()
+        with mock.patch.object(
+            AnonRateThrottle, "THROTTLE_RATES", {"anon": "1/day", "user": "1/day"}
+        ):
+            response = await self.client.get(self.ASYNC_API_URL)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = await self.client.get(self.ASYNC_API_URL)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
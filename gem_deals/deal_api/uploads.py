@@ -0,0 +1,191 @@
+import logging
+import shutil
+import uuid
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import create_ingest_job_for_file, submit_ingest_job
+from .models import ChunkedUpload, IngestJob, IngestMode
+from .services import get_data_stream_from_file
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    """Ошибка загрузки файла частями."""
+
+
+class UploadOffsetError(UploadError):
+    """Часть файла передана не с того смещения, на котором остановилась загрузка."""
+
+    def __init__(self, offset: int) -> None:
+        self.offset = offset
+        super().__init__(f"Ожидается часть файла, начинающаяся с байта {offset}.")
+
+
+class UploadChunkTooLargeError(UploadError):
+    """Размер части файла превышает settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            "Размер части файла превышает "
+            f"{settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} байт."
+        )
+
+
+def create_chunked_upload(
+    file_name: str, mode: str = IngestMode.REPLACE, delimiter: str | None = None
+) -> ChunkedUpload:
+    """Начинает загрузку файла частями: создаёт пустой временный файл на диске.
+    Args:
+        file_name (str): Название загружаемого файла.
+        mode (str): Режим загрузки (IngestMode).
+        delimiter (str | None): Разделитель полей csv.
+    Returns:
+        ChunkedUpload: Загрузка файла частями.
+    """
+
+    upload_dir = Path(settings.INGEST_UPLOAD_DIR)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid.uuid4()
+    file_path = upload_dir / f"{upload_id.hex}.part"
+    file_path.touch()
+    return ChunkedUpload.objects.create(
+        id=upload_id,
+        file_name=file_name,
+        file_path=str(file_path),
+        mode=mode,
+        delimiter=delimiter or "",
+    )
+
+
+def write_upload_chunk(
+    upload_id: uuid.UUID, offset: int, stream: BinaryIO
+) -> ChunkedUpload:
+    """Дописывает в файл загрузки часть, читаемую из stream (тело запроса читается
+    по частям и не хранится в памяти целиком).
+    Часть должна начинаться с уже полученного количества байт (offset загрузки).
+    Если передача части прервалась, offset загрузки не меняется, и часть можно
+    отправить повторно: байты после offset перезаписываются.
+    Часть сначала читается во временный файл без блокировки загрузки (медленный
+    клиент не задерживает другие запросы к ней), под блокировкой только проверяется
+    offset и часть дописывается в файл загрузки.
+    Args:
+        upload_id (uuid.UUID): ID загрузки.
+        offset (int): Смещение части от начала файла.
+        stream (BinaryIO): Поток с содержимым части.
+    Returns:
+        ChunkedUpload: Загрузка с обновлённым количеством полученных байт.
+    Raises:
+        ChunkedUpload.DoesNotExist: Если загрузка не найдена.
+        UploadOffsetError: Если offset не совпадает с количеством полученных байт.
+        UploadChunkTooLargeError: Если часть слишком большая.
+        UploadError: Если загрузка уже завершена.
+    """
+
+    upload = ChunkedUpload.objects.get(id=upload_id)
+    _check_upload_offset(upload, offset)
+    chunk_path = Path(f"{upload.file_path}.{uuid.uuid4().hex}")
+    try:
+        written = 0
+        with open(chunk_path, "wb") as chunk_file:
+            for chunk in iter(partial(stream.read, settings.CSV_READ_CHUNK_SIZE), b""):
+                written += len(chunk)
+                if written > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+                    raise UploadChunkTooLargeError()
+                chunk_file.write(chunk)
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(id=upload_id)
+            _check_upload_offset(upload, offset)
+            with open(upload.file_path, "r+b") as file, open(
+                chunk_path, "rb"
+            ) as chunk_file:
+                file.seek(offset)
+                shutil.copyfileobj(chunk_file, file, settings.CSV_READ_CHUNK_SIZE)
+                file.truncate()
+            upload.offset += written
+            upload.save(update_fields=["offset", "updated_at"])
+    finally:
+        chunk_path.unlink(missing_ok=True)
+    return upload
+
+
+def _check_upload_offset(upload: ChunkedUpload, offset: int) -> None:
+    """Проверяет, что загрузка не завершена и часть файла начинается
+    с уже полученного количества байт.
+    Raises:
+        UploadOffsetError: Если offset не совпадает с количеством полученных байт.
+        UploadError: Если загрузка уже завершена.
+    """
+
+    if upload.job_id is not None:
+        raise UploadError("Загрузка файла уже завершена.")
+    if offset != upload.offset:
+        raise UploadOffsetError(upload.offset)
+
+
+def finalize_upload(upload_id: uuid.UUID, size: int | None = None) -> IngestJob:
+    """Завершает загрузку файла частями и ставит файл в очередь обработки.
+    Повторный вызов возвращает уже созданную задачу загрузки.
+    Args:
+        upload_id (uuid.UUID): ID загрузки.
+        size (int | None): Ожидаемый размер файла (если передан, проверяется,
+        что получены все байты).
+    Returns:
+        IngestJob: Задача загрузки сделок из файла.
+    Raises:
+        ChunkedUpload.DoesNotExist: Если загрузка не найдена.
+        UploadOffsetError: Если получены не все байты файла.
+        UploadError: Если файл не является валидным csv.
+    """
+
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(id=upload_id)
+        if upload.job_id is not None:
+            return upload.job
+        if size is not None and size != upload.offset:
+            raise UploadOffsetError(upload.offset)
+        with open(upload.file_path, "rb") as file:
+            if not get_data_stream_from_file(
+                filename=upload.file_name,
+                chunks=iter(partial(file.read, settings.CSV_READ_CHUNK_SIZE), b""),
+                delimiter=upload.delimiter or None,
+            ):
+                raise UploadError(
+                    "Расширение файла не csv либо содержимое файла не является валидным csv."
+                )
+        job = create_ingest_job_for_file(
+            upload.file_name, upload.file_path, upload.mode, upload.delimiter
+        )
+        upload.job = job
+        upload.save(update_fields=["job", "updated_at"])
+    submit_ingest_job(job)
+    return job
+
+
+def delete_expired_uploads() -> int:
+    """Удаляет незавершённые загрузки, не изменявшиеся дольше
+    settings.CHUNKED_UPLOAD_TTL_SECONDS, вместе с их временными файлами.
+    Args:
+    Returns:
+        int: Количество удалённых загрузок.
+    """
+
+    expired = ChunkedUpload.objects.filter(
+        job__isnull=True,
+        updated_at__lt=timezone.now()
+        - timedelta(seconds=settings.CHUNKED_UPLOAD_TTL_SECONDS),
+    )
+    deleted = 0
+    for upload in expired:
+        Path(upload.file_path).unlink(missing_ok=True)
+        upload.delete()
+        deleted += 1
+    logger.info(f"Удалено незавершённых загрузок файлов частями: {deleted}.")
+    return deleted
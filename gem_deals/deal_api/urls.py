@@ -7,4 +7,16 @@ app_name = "deal_api"
 
 urlpatterns = [
     path("", views.DealAPIView.as_view(), name="deals"),
+    path("async/", views.AsyncDealAPIView.as_view(), name="deals_async"),
+    path("jobs/<int:pk>/", views.IngestJobAPIView.as_view(), name="job"),
+    path("metrics/", views.MetricsAPIView.as_view(), name="metrics"),
+    path("uploads/", views.ChunkedUploadAPIView.as_view(), name="uploads"),
+    path(
+        "uploads/<uuid:pk>/", views.ChunkedUploadDetailAPIView.as_view(), name="upload"
+    ),
+    path(
+        "uploads/<uuid:pk>/finalize/",
+        views.ChunkedUploadFinalizeAPIView.as_view(),
+        name="upload_finalize",
+    ),
 ]
@@ -1,12 +1,48 @@
+import json
 import logging
+from typing import Any, Dict, Tuple
 
 from django.conf import settings
-from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views import View
+from rest_framework.exceptions import Throttled
+from rest_framework.generics import RetrieveAPIView
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
-from .serializers import CustomerSerializer
+from .caching import (
+    acache,
+    aget_local_data_version,
+    aget_top_customers_payload,
+    get_local_data_version,
+    get_top_customers_etag,
+    get_top_customers_payload,
+)
+from .jobs import create_ingest_job, get_job_progress, submit_ingest_job
+from .metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+from .models import ChunkedUpload, IngestJob, IngestMode
+from .permissions import IsInternalNetwork
+from .renderers import ORJSONRenderer, PrometheusTextRenderer
+from .serializers import (
+    ChunkedUploadSerializer,
+    IngestJobSerializer,
+    TopCustomersQuerySerializer,
+)
 from .services import *
+from .uploads import (
+    UploadChunkTooLargeError,
+    UploadError,
+    UploadOffsetError,
+    create_chunked_upload,
+    finalize_upload,
+    write_upload_chunk,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -14,41 +50,102 @@ logger = logging.getLogger(__name__)
 class DealAPIView(APIView):
     """Представление для обработки входящих запросов."""
 
-    def get(self, request, format=None) -> Response:
+    def get(self, request, format=None) -> Response | HttpResponse:
         """Обрабатывает входящий GET-запрос на выдачу обработанных данных.
+        Параметры запроса (необязательные): limit - количество клиентов
+        (не больше settings.GET_ROWS_LIMIT_MAX), date_from и date_to - первый
+        и последний день периода в формате ГГГГ-ММ-ДД, item - название камня.
+        Ответ на каждый набор параметров кэшируется целиком (в виде готового JSON),
+        поэтому при попадании в кэш запросы к БД и сериализация не выполняются.
+        JSON-ответ содержит ETag и Last-Modified, вычисленные по версии данных
+        (меняется при каждой загрузке сделок): на запрос с совпадающим
+        If-None-Match (или If-Modified-Since) возвращается статус 304 без обращения
+        к БД и к кэшу ответов. Cache-Control разрешает общим кэшам (nginx) хранить
+        ответ settings.HTTP_CACHE_SHARED_MAX_AGE_SECONDS секунд, клиенты проверяют
+        актуальность ответа при каждом запросе.
 
         Returns:
-            Response: Объект Response, содержащий поле "response"
-            со списком из 5 клиентов, потративших наибольшую сумму за весь период.
+            Response | HttpResponse: Ответ, содержащий поле "response"
+            со списком из 5 (или limit) клиентов, потративших наибольшую сумму
+            за весь период (или за указанный период и по указанному камню);
+            Status: Error, Desc: <Описание ошибки> - если параметры некорректны.
+            Статус 304 (без тела) - если у клиента актуальная версия ответа.
         """
 
-        customers = cache.get(settings.CACHE_PREFIX)
-        if customers is None:
-            customers = get_largest_amount_customers(settings.GET_ROWS_LIMIT)
-            cache.set(settings.CACHE_PREFIX, customers, settings.CACHE_TTL_SECONDS)
-        add_gems_field_to_customers_data(customers)
-        serializer = CustomerSerializer(data=customers, many=True)
-        if serializer.is_valid():
-            serializer.save()
-        return Response({"response": serializer.data}, status=200)
+        query_serializer = TopCustomersQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            logger.warning(f"Запрос содержит некорректные параметры.")
+            return Response(
+                {"Status": "Error", "Desc": query_serializer.errors}, status=400
+            )
+        params = query_serializer.validated_data
+        if request.accepted_renderer.format != "json":
+            return Response(json.loads(get_top_customers_payload(params)), status=200)
+        data_version = get_local_data_version()
+        etag, last_modified = _get_top_customers_validators(data_version, params)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(
+                get_top_customers_payload(params, data_version),
+                content_type="application/json",
+                status=200,
+            )
+        return _patch_top_customers_response(response, etag, last_modified)
 
     def post(self, request, format=None) -> Response:
         """Обрабатывает входящий POST-запрос,
         принимает из POST-запроса .csv файл для дальнейшей обработки.
+        Разделитель полей можно явно передать в параметре delimiter
+        (тогда он не определяется автоматически).
+        Параметр mode задаёт режим загрузки: replace (по умолчанию) - заменить
+        все данные содержимым файла, append - добавить к уже загруженным сделкам
+        только новые (дубликаты по клиенту, камню, дате и сумме пропускаются).
+
+        Файлы сохраняются на диск и обрабатываются в фоне, в запросе проверяется
+        только начало каждого файла.
 
         Returns:
             Response: Объект Response, содержащий:
-            Status: OK - если файл был обработан без ошибок;
-            Status: Error, Desc: <Описание ошибки> - если в процессе обработки файла произошла ошибка.
+            Status: Accepted, job_id, job_url - если файл принят в обработку
+            (статус обработки доступен по адресу job_url);
+            Status: Error, Desc: <Описание ошибки> - если файл невозможно обработать.
         """
 
+        delimiter = request.query_params.get("delimiter") or request.data.get(
+            "delimiter"
+        )
+        if delimiter and len(delimiter) != 1:
+            logger.warning(f"Запрос содержит некорректный разделитель полей csv-файла.")
+            return Response(
+                {
+                    "Status": "Error",
+                    "Desc": "Разделитель полей должен состоять из одного символа.",
+                },
+                status=400,
+            )
+        mode = (
+            request.query_params.get("mode")
+            or request.data.get("mode")
+            or IngestMode.REPLACE
+        )
+        if mode not in IngestMode.values:
+            logger.warning(f"Запрос содержит некорректный режим загрузки.")
+            return Response(
+                {
+                    "Status": "Error",
+                    "Desc": f"Режим загрузки должен быть одним из: {', '.join(IngestMode.values)}.",
+                },
+                status=400,
+            )
         if request.FILES:
             for _, file in request.FILES.items():
-                deals = get_data_from_file(filename=str(file), file_content=file.read())
-                if deals:
-                    save_data_in_db(deals)
-                    cache.clear()
-                else:
+                if not get_data_stream_from_file(
+                    filename=str(file),
+                    chunks=file.chunks(settings.CSV_READ_CHUNK_SIZE),
+                    delimiter=delimiter,
+                ):
                     logger.warning(f"Попытка обработки некорректного csv-файла.")
                     return Response(
                         {
@@ -57,7 +154,340 @@ class DealAPIView(APIView):
                         },
                         status=400,
                     )
+            job = create_ingest_job(request.FILES.values(), mode, delimiter)
+            submit_ingest_job(job)
         else:
             logger.warning(f"Запрос не содержит файл.")
             return Response({"Status": "Error", "Desc": "Отсутствует файл"}, status=400)
-        return Response({"Status": "OK"}, status=200)
+        return Response(
+            {
+                "Status": "Accepted",
+                "job_id": job.id,
+                "job_url": reverse("deal_api:job", args=[job.id]),
+            },
+            status=202,
+        )
+
+
+class AsyncDealAPIView(View):
+    """Асинхронное представление для выдачи списка клиентов, потративших
+    наибольшую сумму (под ASGI): пока один запрос ждёт общий кэш,
+    процесс обслуживает остальные, а ответы из кэша в памяти процесса
+    отдаются без переключения потоков.
+    """
+
+    # Ограничения частоты запросов - те же, что у DealAPIView
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    async def get(self, request) -> HttpResponse:
+        """Обрабатывает входящий GET-запрос на выдачу обработанных данных
+        (параметры, ответ и заголовки - как у DealAPIView.get, ответ - только JSON).
+
+        Returns:
+            HttpResponse: Ответ, содержащий поле "response" со списком клиентов;
+            Status: Error, Desc: <Описание ошибки> - если параметры некорректны.
+            Статус 304 (без тела) - если у клиента актуальная версия ответа.
+            Статус 429 - если превышена частота запросов.
+        """
+
+        # Ограничения частоты запросов хранятся в общем кэше
+        throttled = await acache(self.check_throttles)(request)
+        if throttled is not None:
+            response = _render_json_response({"detail": throttled.detail}, 429)
+            if throttled.wait is not None:
+                response["Retry-After"] = "%d" % throttled.wait
+            return response
+        query_serializer = TopCustomersQuerySerializer(data=request.GET)
+        if not query_serializer.is_valid():
+            logger.warning(f"Запрос содержит некорректные параметры.")
+            return _render_json_response(
+                {"Status": "Error", "Desc": query_serializer.errors}, 400
+            )
+        params = query_serializer.validated_data
+        data_version = await aget_local_data_version()
+        etag, last_modified = _get_top_customers_validators(data_version, params)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(
+                await aget_top_customers_payload(params, data_version),
+                content_type="application/json",
+                status=200,
+            )
+        return _patch_top_customers_response(response, etag, last_modified)
+
+    def check_throttles(self, request) -> Throttled | None:
+        """Проверяет ограничения частоты запросов (как APIView.check_throttles).
+        Args:
+            request (HttpRequest): Запрос.
+        Returns:
+            Throttled | None: Исключение с временем ожидания, если частота
+            запросов превышена, иначе None.
+        """
+
+        durations = [
+            throttle.wait()
+            for throttle in (
+                throttle_class() for throttle_class in self.throttle_classes
+            )
+            if not throttle.allow_request(request, self)
+        ]
+        if not durations:
+            return None
+        return Throttled(
+            wait=max(
+                (duration for duration in durations if duration is not None),
+                default=None,
+            )
+        )
+
+
+def _get_top_customers_validators(
+    data_version: int, params: Dict[str, Any]
+) -> Tuple[str, int]:
+    """Возвращает ETag и время изменения (в секундах) ответа со списком клиентов,
+    вычисленные по версии данных (время загрузки сделок в наносекундах)
+    и параметрам запроса.
+    Args:
+        data_version (int): Версия данных.
+        params (Dict[str, Any]): Параметры запроса.
+    Returns:
+        Tuple[str, int]: ETag и время изменения.
+    """
+
+    return get_top_customers_etag(data_version, params), data_version // 10**9
+
+
+def _patch_top_customers_response(
+    response: HttpResponse, etag: str, last_modified: int
+) -> HttpResponse:
+    """Добавляет в ответ со списком клиентов ETag, Last-Modified и Cache-Control
+    (общие кэши хранят ответ settings.HTTP_CACHE_SHARED_MAX_AGE_SECONDS секунд).
+    Args:
+        response (HttpResponse): Ответ.
+        etag (str): ETag ответа.
+        last_modified (int): Время изменения данных (в секундах).
+    Returns:
+        HttpResponse: Ответ.
+    """
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=0,
+        s_maxage=settings.HTTP_CACHE_SHARED_MAX_AGE_SECONDS,
+    )
+    return response
+
+
+def _render_json_response(data: Dict[str, Any], status: int) -> HttpResponse:
+    """Возвращает ответ с данными data в формате JSON."""
+
+    return HttpResponse(
+        ORJSONRenderer().render(data), content_type="application/json", status=status
+    )
+
+
+class IngestJobAPIView(RetrieveAPIView):
+    """Представление для получения статуса задачи загрузки сделок."""
+
+    queryset = IngestJob.objects.prefetch_related("files")
+    serializer_class = IngestJobSerializer
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        """Возвращает статус задачи загрузки и количество прочитанных
+        и сохранённых строк (для выполняющейся задачи - текущий прогресс).
+        """
+
+        job = self.get_object()
+        data = self.get_serializer(job).data
+        data.update(get_job_progress(job))
+        return Response(data)
+
+
+class MetricsAPIView(APIView):
+    """Представление для выдачи метрик (в текстовом формате Prometheus).
+    Метрики раскрывают внутренние показатели сервиса, поэтому доступны только
+    из внутренней сети (settings.METRICS_ALLOWED_NETWORKS).
+    """
+
+    permission_classes = [IsInternalNetwork]
+    # Метрики периодически запрашиваются системой мониторинга
+    throttle_classes = []
+    renderer_classes = [PrometheusTextRenderer]
+
+    def get(self, request, format=None) -> Response:
+        """Возвращает метрики процесса: гистограммы времени обработки запросов,
+        количества и времени запросов к БД, времени сериализации ответов
+        и обращений к кэшу ответов, а также показатели задач загрузки сделок
+        (количество строк, длительность этапов, скорость сохранения).
+        """
+
+        return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class ChunkedUploadAPIView(APIView):
+    """Представление для начала загрузки файла частями."""
+
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "uploads"
+
+    def post(self, request, format=None) -> Response:
+        """Начинает загрузку файла частями.
+        Принимает название файла (file_name) и, как и DealAPIView.post,
+        режим загрузки (mode) и разделитель полей (delimiter).
+
+        Returns:
+            Response: Объект Response, содержащий id, upload_url загрузки
+            и количество полученных байт (offset); части файла отправляются
+            PUT-запросами на upload_url.
+            Status: Error, Desc: <Описание ошибки> - если параметры некорректны.
+        """
+
+        serializer = ChunkedUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Запрос содержит некорректные параметры загрузки файла.")
+            return Response({"Status": "Error", "Desc": serializer.errors}, status=400)
+        upload = create_chunked_upload(**serializer.validated_data)
+        data = ChunkedUploadSerializer(upload).data
+        data["upload_url"] = reverse("deal_api:upload", args=[upload.id])
+        return Response(data, status=201)
+
+
+class ChunkedUploadDetailAPIView(APIView):
+    """Представление для получения состояния загрузки файла частями
+    и для отправки частей файла.
+    """
+
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "uploads"
+
+    def get(self, request, pk, format=None) -> Response:
+        """Возвращает состояние загрузки: offset - количество уже полученных байт,
+        с которого нужно продолжить загрузку после обрыва соединения.
+        """
+
+        upload = get_object_or_404(ChunkedUpload, pk=pk)
+        return Response(ChunkedUploadSerializer(upload).data)
+
+    def put(self, request, pk, format=None) -> Response:
+        """Принимает часть файла (тело запроса) со смещением offset
+        (параметр строки запроса), равным количеству уже полученных байт.
+
+        Returns:
+            Response: Состояние загрузки с обновлённым offset;
+            Status: Error, Desc: <Описание ошибки>, offset - если смещение
+            не совпадает с количеством полученных байт (статус 409);
+            Status: Error, Desc: <Описание ошибки> - если не указан
+            Content-Length (статус 411) или он некорректен (статус 400).
+        """
+
+        try:
+            offset = int(request.query_params["offset"])
+        except (KeyError, ValueError):
+            return Response(
+                {
+                    "Status": "Error",
+                    "Desc": "Не указано смещение части файла (offset).",
+                },
+                status=400,
+            )
+        content_length = request.META.get("CONTENT_LENGTH")
+        if not content_length:
+            return Response(
+                {
+                    "Status": "Error",
+                    "Desc": "Не указан размер части файла (Content-Length).",
+                },
+                status=411,
+            )
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            return Response(
+                {
+                    "Status": "Error",
+                    "Desc": "Некорректный размер части файла (Content-Length).",
+                },
+                status=400,
+            )
+        if request.stream is None:
+            return Response(
+                {
+                    "Status": "Error",
+                    "Desc": "Отсутствует часть файла (пустое тело запроса).",
+                },
+                status=400,
+            )
+        if content_length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                {"Status": "Error", "Desc": str(UploadChunkTooLargeError())},
+                status=413,
+            )
+        try:
+            upload = write_upload_chunk(pk, offset, request.stream)
+        except ChunkedUpload.DoesNotExist:
+            raise Http404
+        except UploadOffsetError as error:
+            return Response(
+                {"Status": "Error", "Desc": str(error), "offset": error.offset},
+                status=409,
+            )
+        except UploadChunkTooLargeError as error:
+            return Response({"Status": "Error", "Desc": str(error)}, status=413)
+        except UploadError as error:
+            return Response({"Status": "Error", "Desc": str(error)}, status=409)
+        return Response(ChunkedUploadSerializer(upload).data)
+
+
+class ChunkedUploadFinalizeAPIView(APIView):
+    """Представление для завершения загрузки файла частями."""
+
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "uploads"
+
+    def post(self, request, pk, format=None) -> Response:
+        """Завершает загрузку файла частями и ставит файл в очередь обработки.
+        Необязательный параметр size - ожидаемый размер файла в байтах.
+
+        Returns:
+            Response: Объект Response, содержащий:
+            Status: Accepted, job_id, job_url - если файл принят в обработку;
+            Status: Error, Desc: <Описание ошибки> - если получены не все байты
+            файла (статус 409, offset - количество полученных байт) или файл
+            невозможно обработать (статус 400).
+        """
+
+        size = request.query_params.get("size") or request.data.get("size")
+        try:
+            size = int(size) if size is not None else None
+        except (TypeError, ValueError):
+            return Response(
+                {"Status": "Error", "Desc": "Некорректный размер файла (size)."},
+                status=400,
+            )
+        try:
+            job = finalize_upload(pk, size)
+        except ChunkedUpload.DoesNotExist:
+            raise Http404
+        except UploadOffsetError as error:
+            return Response(
+                {"Status": "Error", "Desc": str(error), "offset": error.offset},
+                status=409,
+            )
+        except UploadError as error:
+            logger.warning(f"Попытка обработки некорректного csv-файла.")
+            return Response({"Status": "Error", "Desc": str(error)}, status=400)
+        return Response(
+            {
+                "Status": "Accepted",
+                "job_id": job.id,
+                "job_url": reverse("deal_api:job", args=[job.id]),
+            },
+            status=202,
+        )
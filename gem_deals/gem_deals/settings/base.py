@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "deal_api.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -109,11 +110,101 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 GET_ROWS_LIMIT = 5
+# Максимальное количество клиентов, которое можно запросить параметром limit
+GET_ROWS_LIMIT_MAX = 1000
+
+# Количество сделок, сохраняемых в БД одним bulk_create
+DEAL_BATCH_SIZE = 500
+# Загрузка сделок в PostgreSQL через COPY (для остальных СУБД - через ORM)
+INGEST_COPY_LOADER = True
+# Время, в течение которого хранится поколение набора сделок после его замены
+# (чтобы завершились запросы, начатые до замены)
+DATASET_RETENTION_SECONDS = 60
+
+# Размер части загружаемого файла, читаемой за один раз (байт)
+CSV_READ_CHUNK_SIZE = 64 * 1024
+
+# Объём начала csv-файла (символов), по которому определяется диалект
+CSV_SNIFF_SAMPLE_SIZE = 16 * 1024
+# Разделитель полей csv-файлов; если задан, диалект не определяется автоматически
+CSV_DELIMITER = None
+# Количество строк csv-файла в блоке при колоночном разборе
+CSV_BLOCK_SIZE = 10_000
+
+# Каталог для загруженных файлов, ожидающих фоновой обработки
+INGEST_UPLOAD_DIR = BASE_DIR / "uploads"
+# Обрабатывать загруженные файлы в фоне (иначе - в рамках запроса)
+INGEST_BACKGROUND = True
+# Количество потоков фоновой обработки загруженных файлов в каждом процессе
+INGEST_WORKERS = 2
+# Количество процессов, в которых параллельно разбираются файлы одной задачи загрузки
+INGEST_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+# Интерпретатор Python для процессов разбора файлов (None - sys.executable).
+# Под uWSGI sys.executable - бинарный файл uwsgi: без этой настройки
+# файлы задачи разбираются в потоке задачи, без пула процессов
+INGEST_PARSE_EXECUTABLE = None
+# Время хранения в кэше прогресса выполнения задачи загрузки
+INGEST_PROGRESS_TTL_SECONDS = 60 * 60
+# Время, после которого задача загрузки, не завершённая за него, считается потерянной
+# (например, при перезапуске рабочего процесса) и завершается с ошибкой
+# (см. команду recover_ingest_jobs)
+INGEST_JOB_TIMEOUT_SECONDS = 60 * 60
+# Максимальный размер части файла, загружаемого частями
+# (должен соответствовать client_max_body_size в настройках nginx)
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+# Время, после которого незавершённая загрузка файла частями удаляется
+CHUNKED_UPLOAD_TTL_SECONDS = 24 * 60 * 60
 
 CACHE_TTL_SECONDS = 60
+# Время после истечения CACHE_TTL_SECONDS, в течение которого отдаётся устаревший
+# ответ, пока один из процессов пересчитывает новый
+CACHE_STALE_SECONDS = 60
+# Время жизни блокировки пересчёта ответа
+CACHE_REBUILD_LOCK_SECONDS = 30
+# Максимальное время ожидания ответа, пересчитываемого другим процессом
+CACHE_REBUILD_WAIT_SECONDS = 5
+CACHE_REBUILD_POLL_SECONDS = 0.05
 CACHE_PREFIX = "LATEST_CUSTOMERS"
+# Версия формата кэшируемого ответа (увеличивается при изменении формата)
+CACHE_PAYLOAD_VERSION = 2
+# Максимальное количество ответов на запросы с параметрами (limit, период, камень),
+# одновременно хранящихся в кэше; при превышении вытесняются давно не пересчитанные
+CACHE_MAX_QUERIES = 100
+# Кэш готовых ответов в памяти каждого процесса (L1) перед общим кэшем:
+# максимальный суммарный размер ответов (0 - не использовать), время их хранения
+# и период проверки версии данных в общем кэше (задержка, с которой процесс
+# узнаёт о загрузке сделок другим процессом)
+CACHE_L1_MAX_BYTES = 4 * 1024 * 1024
+CACHE_L1_TTL_SECONDS = 10
+CACHE_L1_DATA_VERSION_CHECK_SECONDS = 1
+# Время, в течение которого общие кэши (nginx) могут отдавать ответ со списком
+# клиентов без обращения к приложению (Cache-Control: s-maxage)
+HTTP_CACHE_SHARED_MAX_AGE_SECONDS = 1
+
+# Передавать клиентам из внутренней сети (METRICS_ALLOWED_NETWORKS) показатели
+# обработки запроса (время, запросы к БД, кэш) в заголовке Server-Timing
+METRICS_SERVER_TIMING = True
+# Каталог, в который процессы записывают свои метрики (метрики выдаются суммарно
+# по всем процессам uWSGI; None - каждый процесс выдаёт только свои метрики),
+# и период записи метрик процесса после обработки запросов
+METRICS_MULTIPROCESS_DIR = None
+METRICS_DUMP_INTERVAL_SECONDS = 5
+# Сети, из которых доступны метрики (/api/v1/metrics/): локальные адреса
+# и частные сети (система мониторинга, контейнеры docker compose)
+METRICS_ALLOWED_NETWORKS = [
+    "127.0.0.0/8",
+    "::1/128",
+    "10.0.0.0/8",
+    "172.16.0.0/12",
+    "192.168.0.0/16",
+]
 
 REST_FRAMEWORK = {
+    # JSON формируется с помощью orjson (если он установлен)
+    "DEFAULT_RENDERER_CLASSES": [
+        "deal_api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PARSER_CLASSES": [
         "rest_framework.parsers.JSONParser",
         "rest_framework.parsers.MultiPartParser",
@@ -126,6 +217,8 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_RATES": {
         "anon": "1000/day",
         "user": "1000/day",
+        # Загрузка файла частями: по запросу на каждую часть
+        "uploads": "100000/day",
     },
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 25,
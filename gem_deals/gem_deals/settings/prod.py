@@ -11,6 +11,10 @@ DEBUG = int(os.getenv("DEBUG"))
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS").split(" ")
 
+INGEST_PARSE_EXECUTABLE = os.getenv("INGEST_PARSE_EXECUTABLE")
+
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR")
+
 
 DATABASES = {
     "default": {